@@ -2,7 +2,7 @@ import os
 import json
 import warnings
 
-from sqlalchemy import create_engine, MetaData, event, exc
+from sqlalchemy import create_engine, MetaData, Table, event, exc
 from sqlalchemy.pool import Pool, NullPool, SingletonThreadPool, QueuePool
 from sqlalchemy.exc import SAWarning
 from sqlalchemy.orm import scoped_session, sessionmaker
@@ -53,10 +53,20 @@ pool_kwargs = {'poolclass': pool_map.get(config['connection'].pop('poolclass', '
 if pool_kwargs['poolclass'] is not NullPool:
     pool_kwargs['pool_size'] = config['connection'].pop('pool_size', 5)
 
-url      = URL(**config['connection'])
-engine   = create_engine(url, echo=config['debug']['SQL'],
-                         connect_args={'sslmode': 'disable'},
-                         **pool_kwargs)
+# bind to a local SQLite mirror of a CREDO subset instead of the server
+if config.get('mirror'):
+    from credoscript.util.sqlite import create_mirror_engine
+
+    engine = create_mirror_engine(config['mirror'],
+                                  [config['schema'][key]['name'] for key in config['schema']],
+                                  echo=config['debug']['SQL'])
+
+else:
+    url      = URL(**config['connection'])
+    engine   = create_engine(url, echo=config['debug']['SQL'],
+                             connect_args={'sslmode': 'disable'},
+                             **pool_kwargs)
+
 metadata = MetaData(bind=engine)
 
 # suppress warnings concerning postgresql-specific types and indexes
@@ -69,6 +79,11 @@ schema['pdb'] = config['schema']['pdb']['name']
 schema['variations'] = config['schema']['variations']['name']
 
 
+# optionally decode cube and float array columns straight into NumPy arrays
+if config['extras'].get('numpy-casters'):
+    credoscript.util.psycopg2.register_numpy_casters()
+    event.listen(Table, 'column_reflect', credoscript.util.psycopg2.reflect_ndarray_column)
+
 # reflect all the required schemas
 metadata.reflect(schema=schema['credo'], only=lambda t,m: t in config['schema']['credo']['reflect'])
 metadata.reflect(schema=schema['pdbchem'], only=lambda t,m: t in config['schema']['pdbchem']['reflect'])
@@ -114,3 +129,11 @@ except ImportError:
     if config['extras']['rdkit']:
         warnings.warn("Failed to import RDKit package", UserWarning)
         config['extras']['rdkit'] = False
+
+try:
+    import pyarrow
+    config['extras']['pyarrow'] = True
+except ImportError:
+    if config['extras'].get('pyarrow'):
+        warnings.warn("Failed to import pyarrow package", UserWarning)
+    config['extras']['pyarrow'] = False
@@ -26,3 +26,4 @@ from .ligandfragmentadaptor import LigandFragmentAdaptor
 from .ligliginteractionadaptor import LigLigInteractionAdaptor
 from .lignucinteractionadaptor import LigNucInteractionAdaptor
 from .domainadaptor import DomainAdaptor
+from .waterbridgeadaptor import WaterBridgeAdaptor
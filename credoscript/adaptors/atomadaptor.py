@@ -1,8 +1,19 @@
+from collections import defaultdict
+
+import numpy as np
+from sqlalchemy import Integer
 from sqlalchemy.orm import aliased
-from sqlalchemy.sql.expression import and_, func
+from sqlalchemy.sql.expression import and_, cast, func
 
+from credoscript import Session
 from credoscript.mixins.base import paginate
 
+# record layout of the columnar atom arrays returned by fetch_atom_arrays()
+ATOM_ARRAY_DTYPE = np.dtype([('atom_id', np.int64), ('residue_id', np.int64),
+                             ('coords', np.float32, (3,)), ('element', 'S2'),
+                             ('b_factor', np.float32), ('occupancy', np.float32),
+                             ('type_bm', np.int32)])
+
 class AtomAdaptor(object):
     """
     Class to fetch atoms from CREDO.
@@ -35,6 +46,52 @@ class AtomAdaptor(object):
 
         return query.first()
 
+    def fetch_atom_arrays(self, biomolecule_id, *expr):
+        """
+        Returns the atoms of a biomolecule as NumPy structured array that can be
+        used for vectorised geometric analyses. The rows are decoded directly
+        from the cursor without creating any `Atom` objects.
+
+        Parameters
+        ----------
+        biomolecule_id : int
+            `Biomolecule` identifier.
+        *expr : BinaryExpressions, optional
+            SQLAlchemy BinaryExpressions that will be used to filter the query.
+
+        Queried Entities
+        ----------------
+        Atom
+
+        Returns
+        -------
+        atoms : numpy.ndarray
+            Structured array with the fields atom_id, residue_id, coords (float32,
+            shape (3,)), element, b_factor, occupancy and type_bm, ordered by
+            atom_id. type_bm packs the is_* atom type flags in the same way as
+            Atom.type_bm.
+
+        Examples
+        --------
+        >>> atoms = AtomAdaptor().fetch_atom_arrays(1)
+        >>> atoms['coords'].mean(axis=0)
+        array([ 13.71,  22.09,  -1.52], dtype=float32)
+        """
+        type_bm = sum(cast(getattr(Atom, prop), Integer) * (1 << i)
+                      for i, prop in enumerate(ATOM_TYPES))
+
+        query = self.query.with_entities(Atom.atom_id, Atom.residue_id, Atom.coords,
+                                         Atom.element, Atom.b_factor, Atom.occupancy,
+                                         type_bm.label('type_bm'))
+
+        query = query.filter(and_(Atom.biomolecule_id==biomolecule_id, *expr))
+        query = query.order_by(Atom.atom_id)
+
+        # execute the statement directly to bypass the ORM
+        rows = Session().execute(query.statement).fetchall()
+
+        return np.array([tuple(row) for row in rows], dtype=ATOM_ARRAY_DTYPE)
+
     @paginate
     def fetch_all_by_ligand_id(self, ligand_id, biomolecule_id, *expr, **kwargs):
         """
@@ -219,6 +276,76 @@ class AtomAdaptor(object):
 
         return query
 
+    def _ligand_partitions(self, ligands):
+        """
+        Returns the ligand identifiers grouped by biomolecule_id, i.e. by the
+        partition of the atoms and contacts tables.
+        """
+        partitions = defaultdict(set)
+
+        for ligand in ligands:
+            if isinstance(ligand, Ligand): ligand = ligand.ligand_id, ligand.biomolecule_id
+            partitions[ligand[1]].add(ligand[0])
+
+        return partitions
+
+    def fetch_all_in_contact_with_ligand_ids(self, ligands, *expr, **kwargs):
+        """
+        Returns all atoms that are in contact with many ligands at once. Only one
+        query is issued per biomolecule (partition) instead of one per ligand.
+
+        Parameters
+        ----------
+        ligands : list
+            List of (ligand_id, biomolecule_id) tuples or `Ligand` objects.
+        *expr : BinaryExpressions, optional
+            SQLAlchemy BinaryExpressions that will be used to filter the query.
+
+        Joins
+        -----
+        Atom, Contact, Hetatm
+
+        Returns
+        -------
+        atoms : dict
+            Mapping ligand_id -> list of `Atom` objects.
+
+        Examples
+        --------
+        >>> AtomAdaptor().fetch_all_in_contact_with_ligand_ids([(652, 790), (1051, 1202)])
+        {652: [<Atom(...)>, ...], 1051: [...]}
+        """
+        partitions = self._ligand_partitions(ligands)
+        atoms = dict((ligand_id, []) for ligand_ids in partitions.values()
+                     for ligand_id in ligand_ids)
+
+        for biomolecule_id, ligand_ids in partitions.items():
+            where = and_(Hetatm.ligand_id.in_(ligand_ids),
+                         Contact.biomolecule_id==biomolecule_id, *expr)
+
+            query = self.query.add_columns(Hetatm.ligand_id)
+
+            bgn = query.join('ContactsBgn')
+            bgn = bgn.join(Hetatm, Hetatm.atom_id==Contact.atom_end_id)
+            bgn = bgn.filter(where)
+
+            end = query.join('ContactsEnd')
+            end = end.join(Hetatm, Hetatm.atom_id==Contact.atom_bgn_id)
+            end = end.filter(where)
+
+            for atom, ligand_id in bgn.union(end):
+                atoms[ligand_id].append(atom)
+
+        return atoms
+
+    def fetch_all_water_in_contact_with_ligand_ids(self, ligands, *expr, **kwargs):
+        """
+        Returns all water atoms that are in contact with many ligands at once,
+        see fetch_all_in_contact_with_ligand_ids().
+        """
+        return self.fetch_all_in_contact_with_ligand_ids(ligands, Contact.is_any_wat,
+                                                         *expr, **kwargs)
+
     @paginate
     def fetch_all_in_contact_with_ligand_fragment_id(self, ligand_fragment_id,
                                                      biomolecule_id, *expr, **kwargs):
@@ -329,8 +456,9 @@ class AtomAdaptor(object):
 from ..models.contact import Contact
 from ..models.aromaticringatom import AromaticRingAtom
 from ..models.pigroup import PiGroupAtom
-from ..models.atom import Atom
+from ..models.atom import Atom, ATOM_TYPES
 from ..models.hetatm import Hetatm
+from ..models.ligand import Ligand
 from ..models.residue import Residue
 from ..models.ligandfragmentatom import LigandFragmentAtom
 from ..models.interface import InterfacePeptidePair
@@ -1,17 +1,28 @@
+from sqlalchemy.orm import subqueryload
 from sqlalchemy.sql.expression import and_
 
 from credoscript.mixins import PathAdaptorMixin
-from credoscript.mixins.base import paginate
+from credoscript.mixins.base import loader_profile, paginate
 
 class BiomoleculeAdaptor(PathAdaptorMixin):
     """
     """
-    def __init__(self, dynamic=False, paginate=False, per_page=100):
+    # named loader profiles for common traversals, e.g. BiomoleculeAdaptor(profile='chains')
+    profiles = {'chains': (subqueryload('ChainMap'),),
+                'chain_xrefs': (subqueryload('ChainMap'), subqueryload('ChainMap.XRefMap'))}
+
+    def __init__(self, dynamic=False, paginate=False, per_page=100, options=(),
+                 profile=None):
         self.query = Biomolecule.query
         self.dynamic = dynamic
         self.paginate = paginate
         self.per_page = per_page
 
+        if profile: options = tuple(options) + loader_profile(self, profile)
+
+        # add options to this query: can be joinedload, undefer etc.
+        for option in options: self.query = self.query.options(option)
+
     def fetch_by_biomolecule_id(self, biomolecule_id):
         """
         """
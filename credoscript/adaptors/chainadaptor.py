@@ -1,18 +1,30 @@
+from sqlalchemy.orm import subqueryload
 from sqlalchemy.sql.expression import and_
 
 from credoscript import phenotype_to_chain
 from credoscript.mixins import PathAdaptorMixin
-from credoscript.mixins.base import paginate
+from credoscript.mixins.base import loader_profile, paginate
 
 class ChainAdaptor(PathAdaptorMixin):
     """
     """
-    def __init__(self, dynamic=False, paginate=False, per_page=100):
+    # named loader profiles for common traversals, e.g. ChainAdaptor(profile='chain_residues')
+    profiles = {'chain_residues': (subqueryload('ResidueMap'),),
+                'chain_peptides': (subqueryload('PeptideMap'),),
+                'chain_xrefs': (subqueryload('XRefMap'),)}
+
+    def __init__(self, dynamic=False, paginate=False, per_page=100, options=(),
+                 profile=None):
         self.query = Chain.query
         self.dynamic = dynamic
         self.paginate = paginate
         self.per_page = per_page
 
+        if profile: options = tuple(options) + loader_profile(self, profile)
+
+        # add options to this query: can be joinedload, undefer etc.
+        for option in options: self.query = self.query.options(option)
+
     def fetch_by_chain_id(self, chain_id):
         """
         Returns the Chain with the given CREDO chain_id.
@@ -510,7 +510,8 @@ class ChemCompAdaptor(object):
         usr_moments = kwargs.get('usr_moments',[])
         threshold = kwargs.get('threshold', 0.5)
 
-        usr_space, usr_moments = list(usr_space), list(usr_moments)
+        # plain floats, the moments can also be NumPy arrays
+        usr_space, usr_moments = map(float, usr_space), map(float, usr_moments)
 
         # factor by which the usr shape moments will be enlarged in user space
         probe_radius = kwargs.get('probe_radius', 0.75)
@@ -540,6 +541,10 @@ class ChemCompAdaptor(object):
         # USRCAT search against conformers in subquery
         query = ChemCompConformer.query.with_entities(ChemCompConformer.het_id, similarity)
 
+        # only consider the top N conformers, the conformers are numbered from 1
+        if kwargs.get('max_confs'):
+            query = query.filter(ChemCompConformer.conformer <= kwargs['max_confs'])
+
         # cube distance GIST index and similarity threshold
         query = query.filter(ChemCompConformer.contained_in(probe))
         query = query.group_by(ChemCompConformer.het_id)
@@ -1,22 +1,37 @@
+from sqlalchemy.orm import joinedload, subqueryload
 from sqlalchemy.sql.expression import and_, func
 
 from credoscript import phenotype_to_ligand
 from credoscript.mixins import PathAdaptorMixin
-from credoscript.mixins.base import paginate
+from credoscript.mixins.base import loader_profile, paginate
 
 class LigandAdaptor(PathAdaptorMixin):
     """
     Adaptor to fetch ligands from CREDO with different criteria.
     """
-    def __init__(self, dynamic=False, paginate=False, per_page=100, options=()):
+    # named loader profiles for common traversals, e.g. LigandAdaptor(profile='binding_site')
+    profiles = {'ligand_summary': (joinedload('MolString'), joinedload('LigandUSR'),
+                                   subqueryload('ChemComp'), subqueryload('Effs')),
+                'binding_site': (joinedload('BindingSite'),
+                                 subqueryload('BindingSite.residues'),
+                                 subqueryload('BindingSite.residues.Residue'),
+                                 subqueryload('DomainList')),
+                'ligand_atoms': (subqueryload('AtomMap'),)}
+
+    def __init__(self, dynamic=False, paginate=False, per_page=100, options=(),
+                 profile=None):
         """
         An example for joinedload could be (Ligand.MolString, Ligand.LigandUSR).
+        A named profile from LigandAdaptor.profiles can be used instead or in
+        addition.
         """
         self.query = Ligand.query
         self.dynamic = dynamic
         self.paginate = paginate
         self.per_page = per_page
 
+        if profile: options = tuple(options) + loader_profile(self, profile)
+
         # add options to this query: can be joinedload, undefer etc.
         for option in options: self.query = self.query.options(option)
 
@@ -377,7 +392,8 @@ class LigandAdaptor(PathAdaptorMixin):
         threshold = kwargs.get('threshold', 0.5)
         limit = kwargs.get('limit', 100)
 
-        usr_space, usr_moments = list(usr_space), list(usr_moments)
+        # plain floats, the moments can also be NumPy arrays
+        usr_space, usr_moments = map(float, usr_space), map(float, usr_moments)
 
         # get the moments from a CREDO ligand id an identifier was provided
         if ligand_id:
@@ -389,10 +405,12 @@ class LigandAdaptor(PathAdaptorMixin):
 
             usr_space, usr_moments = ligand.usr_space, ligand.usr_moments
 
-            if not usr_moments:
+            if usr_moments is None or not len(usr_moments):
                 raise ValueError('Ligand with ligand_id {} does not have USRCAT moments.'
                                  .format(ligand_id))
 
+            usr_space, usr_moments = map(float, usr_space), map(float, usr_moments)
+
         # raise an error if neither a cube nor the USR moments have been provided
         if not usr_moments or len(usr_moments) != 60:
             raise ValueError('The 60 USR shape descriptors are required.')
@@ -1,4 +1,7 @@
-from sqlalchemy.sql.expression import and_, func
+from collections import defaultdict
+
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql.expression import and_, func, literal, or_, select, union_all
 
 class LigandMatchAdaptor(object):
     """
@@ -33,7 +36,230 @@ class LigandMatchAdaptor(object):
         """
         return self._fetch_matches('matches', pattern, *expr)
 
+    def fetch_all_pattern_matches(self, patterns, *expr, **kwargs):
+        """
+        Returns the ligand matches of all the given patterns, evaluated together
+        in a single query.
+
+        The patterns are turned into RDKit query molecules only once and matched
+        against the chemical components first, so that the (expensive) substructure
+        test is done once per chemical component and pattern rather than once
+        per ligand. Only ligands whose chemical component matched are then
+        mapped onto atom names.
+
+        Parameters
+        ----------
+        patterns : list
+            SMARTS patterns or SMILES substructures.
+        *expr : BinaryExpressions, optional
+            SQLAlchemy BinaryExpressions that will be used to filter the query.
+        smarts : bool, default=True
+            Treat the patterns as SMARTS patterns, otherwise as SMILES substructures.
+
+        Queried Entities
+        ----------------
+        Ligand, LigandMolString, ChemCompRDMol
+
+        Returns
+        -------
+        matches : list
+            List of `LigandMatch` objects ordered by pattern and ligand_id.
+
+        Examples
+        --------
+        >>> LigandMatchAdaptor().fetch_all_pattern_matches(['[#8]=[C,N]-aaa[F,Cl,Br,I]', 'c1ccncc1'])
+        """
+        # remove duplicate patterns but keep the input order
+        patterns = [p for i, p in enumerate(patterns) if p not in patterns[:i]]
+
+        if not patterns: return []
+
+        if kwargs.get('smarts', True): qmol = func.rdkit.qmol_in
+        else: qmol = func.rdkit.mol_in
+
+        # every pattern is parsed into a query molecule exactly once
+        queries = union_all(*[select([literal(pattern).label('pattern'),
+                                      qmol(pattern).label('qmol')])
+                              for pattern in patterns]).alias('patterns')
+
+        # shared chemical component prefilter: (het_id, pattern) pairs
+        hits = select([ChemCompRDMol.het_id, queries.c.pattern])
+        hits = hits.where(ChemCompRDMol.rdmol.op('OPERATOR(rdkit.@>)')(queries.c.qmol))
+        hits = hits.alias('hits')
+
+        query = Ligand.query.join('MolString')
+        query = query.join(hits, hits.c.het_id==Ligand.ligand_name)
+
+        query = query.with_entities(hits.c.pattern, Ligand.ligand_id,
+                                    Ligand.biomolecule_id, LigandMolString.ism,
+                                    func.openeye.match_atom_names(LigandMolString.oeb,
+                                                                  hits.c.pattern).label('atom_names'))
+
+        query = query.filter(and_(*expr)).distinct()
+        query = query.order_by(hits.c.pattern, Ligand.ligand_id)
+
+        return [LigandMatch(*row) for row in query.all()]
+
+    def _partitions(self, matches):
+        """
+        Returns the given ligand matches grouped by biomolecule_id, i.e. by the
+        partition of the atoms and contacts tables they have to be fetched from.
+        """
+        partitions = defaultdict(list)
+
+        for match in matches:
+            if match.atom_names: partitions[match.biomolecule_id].append(match)
+
+        return partitions
+
+    def fetch_contacts(self, matches, *expr, **kwargs):
+        """
+        Returns the contacts of many ligand matches at once. Only one query is
+        issued per biomolecule (partition) instead of one per match.
+
+        Parameters
+        ----------
+        matches : list
+            `LigandMatch` objects, e.g. from fetch_all_pattern_matches().
+        *expr : BinaryExpressions, optional
+            SQLAlchemy BinaryExpressions that will be used to filter the query.
+
+        Queried Entities
+        ----------------
+        Contact, Atom, Hetatm
+
+        Returns
+        -------
+        contacts : dict
+            Dictionary in the form {LigandMatch: [Contact,...]}.
+        """
+        contacts = dict((match, []) for match in matches)
+
+        for biomolecule_id, partition in self._partitions(matches).items():
+
+            # atom names of all matches of the same ligand in this partition
+            ligands = defaultdict(set)
+            for match in partition: ligands[match.ligand_id].update(match.atom_names)
+
+            where = and_(Atom.biomolecule_id==biomolecule_id,
+                         Contact.biomolecule_id==biomolecule_id,
+                         or_(*[and_(Hetatm.ligand_id==ligand_id,
+                                    Atom.atom_name==func.any(list(atom_names)))
+                               for ligand_id, atom_names in ligands.items()]),
+                         *expr)
+
+            query = Contact.query.add_columns(Hetatm.ligand_id, Atom.atom_name)
+
+            bgn = query.join(Atom, Atom.atom_id==Contact.atom_bgn_id)
+            bgn = bgn.join(Hetatm, Hetatm.atom_id==Atom.atom_id).filter(where)
+
+            end = query.join(Atom, Atom.atom_id==Contact.atom_end_id)
+            end = end.join(Hetatm, Hetatm.atom_id==Atom.atom_id).filter(where)
+
+            # contacts of the ligand atoms of this partition
+            rows = defaultdict(list)
+            for contact, ligand_id, atom_name in bgn.union_all(end).all():
+                rows[ligand_id].append((atom_name, contact))
+
+            # assign the contacts back to the individual matches
+            for match in partition:
+                contacts[match] = [contact for atom_name, contact in rows[match.ligand_id]
+                                   if atom_name in match.atom_names]
+
+        return contacts
+
+    def fetch_sifts(self, matches, *expr, **kwargs):
+        """
+        Returns the Structural Interaction Fingerprints (SIFts) of many ligand
+        matches at once. Only one query is issued per biomolecule (partition):
+        the interactions are summed up per ligand atom and residue on the server
+        and then per match on the client.
+
+        Parameters
+        ----------
+        matches : list
+            `LigandMatch` objects, e.g. from fetch_all_pattern_matches().
+        *expr : BinaryExpressions, optional
+            SQLAlchemy BinaryExpressions that will be used to filter the query.
+
+        Queried Entities
+        ----------------
+        Contact, Atom, MatchAtom (Atom), Hetatm, Residue
+
+        Returns
+        -------
+        sifts : dict
+            Dictionary in the form {LigandMatch: [(Residue, SIFt...),...]}, the
+            SIFts have the same format as SIFtAdaptor.fetch_by_ligand_id_and_atom_names().
+        """
+        MatchAtom = aliased(Atom)
+
+        sift = SIFtAdaptor()._sift
+        sifts = dict((match, []) for match in matches)
+
+        for biomolecule_id, partition in self._partitions(matches).items():
+
+            ligands = defaultdict(set)
+            for match in partition: ligands[match.ligand_id].update(match.atom_names)
+
+            where = and_(Contact.biomolecule_id==biomolecule_id,
+                         Contact.is_same_entity==False,
+                         or_(*[and_(Hetatm.ligand_id==ligand_id,
+                                    MatchAtom.atom_name==func.any(list(atom_names)))
+                               for ligand_id, atom_names in ligands.items()]),
+                         *expr)
+
+            query = Contact.query.add_columns(Atom.residue_id.label('residue_id'),
+                                              Hetatm.ligand_id.label('ligand_id'),
+                                              MatchAtom.atom_name.label('atom_name'))
+
+            bgn = query.join('AtomBgn')
+            bgn = bgn.join(MatchAtom, and_(MatchAtom.atom_id==Contact.atom_end_id,
+                                           MatchAtom.biomolecule_id==Contact.biomolecule_id))
+            bgn = bgn.join(Hetatm, Hetatm.atom_id==MatchAtom.atom_id).filter(where)
+
+            end = query.join('AtomEnd')
+            end = end.join(MatchAtom, and_(MatchAtom.atom_id==Contact.atom_bgn_id,
+                                           MatchAtom.biomolecule_id==Contact.biomolecule_id))
+            end = end.join(Hetatm, Hetatm.atom_id==MatchAtom.atom_id).filter(where)
+
+            query = bgn.union_all(end).group_by('ligand_id', 'atom_name', 'residue_id')
+            query = query.with_entities(Hetatm.ligand_id, MatchAtom.atom_name,
+                                        Atom.residue_id, *sift)
+
+            # SIFts per ligand atom and residue
+            rows = defaultdict(list)
+            for row in query.all(): rows[row[0]].append(row[1:])
+
+            residue_ids = set(row[1] for values in rows.values() for row in values)
+            residues = {}
+
+            if residue_ids:
+                query = Residue.query.filter(Residue.residue_id.in_(residue_ids))
+                residues = dict((residue.residue_id, residue) for residue in query.all())
+
+            # sum up the atom SIFts of every match per residue
+            for match in partition:
+                summed = {}
+
+                for row in rows[match.ligand_id]:
+                    atom_name, residue_id, values = row[0], row[1], row[2:]
+                    if atom_name not in match.atom_names: continue
+
+                    total = summed.get(residue_id, [0] * len(values))
+                    summed[residue_id] = [a + int(b or 0) for a, b in zip(total, values)]
+
+                sifts[match] = [tuple([residues[key]] + summed[key])
+                                for key in sorted(summed)]
+
+        return sifts
+
 from ..models.ligand import Ligand
 from ..models.ligandmolstring import LigandMolString
 from ..models.chemcomprdmol import ChemCompRDMol
 from ..models.ligandmatch import LigandMatch
+from ..models.contact import Contact
+from ..models.atom import Atom
+from ..models.hetatm import Hetatm
+from ..models.residue import Residue
+from .siftadaptor import SIFtAdaptor
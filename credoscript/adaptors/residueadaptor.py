@@ -117,6 +117,48 @@ class ResidueAdaptor(PathAdaptorMixin, ResidueAdaptorMixin):
 
         return query
 
+    def fetch_all_in_contact_with_ligand_ids(self, ligand_ids, *expr, **kwargs):
+        """
+        Returns all residues that are in contact with many ligands at once using
+        a single query.
+
+        Parameters
+        ----------
+        ligand_ids : list
+            `Ligand` identifiers or `Ligand` objects.
+        *expr : BinaryExpressions, optional
+            SQLAlchemy BinaryExpressions that will be used to filter the query.
+
+        Queried Entities
+        ----------------
+        Residue, BindingSiteResidue
+
+        Returns
+        -------
+        residues : dict
+            Mapping ligand_id -> list of `Residue` objects.
+
+        Examples
+        --------
+        >>> ResidueAdaptor().fetch_all_in_contact_with_ligand_ids([652, 1051])
+        {652: [<Residue(...)>, ...], 1051: [...]}
+        """
+        ligand_ids = set(getattr(ligand_id, 'ligand_id', ligand_id) for ligand_id in ligand_ids)
+        residues = dict((ligand_id, []) for ligand_id in ligand_ids)
+
+        if not ligand_ids: return residues
+
+        query = self.query.add_columns(BindingSiteResidue.ligand_id)
+        query = query.join(BindingSiteResidue,
+                           BindingSiteResidue.residue_id==Residue.residue_id)
+        query = query.filter(and_(BindingSiteResidue.ligand_id.in_(ligand_ids), *expr))
+        query = query.order_by(BindingSiteResidue.ligand_id, Residue.residue_id)
+
+        for residue, ligand_id in query:
+            residues[ligand_id].append(residue)
+
+        return residues
+
     @paginate
     def fetch_all_in_contact_with_ligand_fragment_id(self, ligand_fragment_id,
                                                      biomolecule_id, *expr,
@@ -1,20 +1,33 @@
 from sqlalchemy import Integer
+from sqlalchemy.orm import subqueryload
 from sqlalchemy.sql.expression import and_, cast, func
 
 from credoscript import citations
-from credoscript.mixins.base import paginate
+from credoscript.mixins.base import loader_profile, paginate
+from credoscript.support.prefetch import PrefetchedEntity, attach_many, attach_one, freeze
 
 class StructureAdaptor(object):
     """
     Class to fetch Structure objects from CREDO with the help of various
     selection criterias.
     """
-    def __init__(self, dynamic=False, paginate=False, per_page=100):
+    # named loader profiles for common traversals, e.g. StructureAdaptor(profile='biomolecules')
+    profiles = {'biomolecules': (subqueryload('BiomoleculeMap'),),
+                'chains': (subqueryload('BiomoleculeMap'),
+                           subqueryload('BiomoleculeMap.ChainMap'))}
+
+    def __init__(self, dynamic=False, paginate=False, per_page=100, options=(),
+                 profile=None):
         self.query = Structure.query
         self.dynamic = dynamic
         self.paginate = paginate
         self.per_page = per_page
 
+        if profile: options = tuple(options) + loader_profile(self, profile)
+
+        # add options to this query: can be joinedload, undefer etc.
+        for option in options: self.query = self.query.options(option)
+
     def fetch_by_structure_id(self, structure_id):
         """
         Returns the Structure with the given CREDO structure_id.
@@ -124,6 +137,105 @@ class StructureAdaptor(object):
 
         return query.distinct()
 
+    def prefetch_all_by_uniprot(self, uniprot, *expr):
+        """
+        Returns all structures that contain polypeptides having the specified
+        UniProt accession together with their biomolecules, chains, ligands,
+        binding sites, ligand efficiencies and chemical components. The whole
+        graph is loaded with a fixed number of set-based queries, independent of
+        the number of structures.
+
+        Parameters
+        ----------
+        uniprot : str
+            UniProt accession.
+        *expr : BinaryExpressions, optional
+            SQLAlchemy BinaryExpressions that will be used to filter the query.
+
+        Queried Entities
+        ----------------
+        Structure, Biomolecule, Chain, XRef, Ligand, LigandComponent, BindingSite,
+        LigandEff, ChemComp
+
+        Returns
+        -------
+        structures : list
+            Read-only `PrefetchedEntity` copies of the structures ordered by
+            structure_id. The relationships have the same names as in the models
+            (Structure.Biomolecules, Biomolecule.Chains, Biomolecule.Ligands,
+            Ligand.BindingSite, Ligand.Effs, Ligand.ChemComp, Ligand.ChemComps
+            and their backrefs) but are plain tuples or objects.
+
+        Examples
+        --------
+        >>> structures = StructureAdaptor().prefetch_all_by_uniprot('P03372')
+        >>> structures[0].Biomolecules[0].Ligands
+        (<Ligand(1A52/1/A/EST`600)>, <Ligand(1A52/1/B/EST`600)>)
+        """
+        query = self.query.join('Biomolecules','Chains','XRefs')
+        query = query.filter(and_(XRef.source=='UniProt', XRef.xref==uniprot, *expr))
+
+        structure_ids = query.with_entities(Structure.structure_id).distinct().subquery()
+
+        biomolecule_ids = Biomolecule.query.filter(Biomolecule.structure_id.in_(structure_ids))
+        biomolecule_ids = biomolecule_ids.with_entities(Biomolecule.biomolecule_id).subquery()
+
+        ligand_ids = Ligand.query.filter(Ligand.biomolecule_id.in_(biomolecule_ids))
+        ligand_ids = ligand_ids.with_entities(Ligand.ligand_id).subquery()
+
+        # one query per entity type
+        structures = Structure.query.filter(Structure.structure_id.in_(structure_ids))
+        structures = structures.order_by(Structure.structure_id).all()
+
+        biomolecules = Biomolecule.query.filter(Biomolecule.structure_id.in_(structure_ids))
+        biomolecules = biomolecules.order_by(Biomolecule.biomolecule_id).all()
+
+        chains = Chain.query.filter(Chain.biomolecule_id.in_(biomolecule_ids))
+        chains = chains.order_by(Chain.chain_id).all()
+
+        ligands = Ligand.query.filter(Ligand.biomolecule_id.in_(biomolecule_ids))
+        ligands = ligands.order_by(Ligand.ligand_id).all()
+
+        bindingsites = BindingSite.query.filter(BindingSite.ligand_id.in_(ligand_ids)).all()
+        effs = LigandEff.query.filter(LigandEff.ligand_id.in_(ligand_ids)).all()
+
+        components = LigandComponent.query.filter(LigandComponent.ligand_id.in_(ligand_ids))
+        components = components.with_entities(LigandComponent.ligand_id, LigandComponent.het_id).all()
+
+        het_ids = set(het_id for ligand_id, het_id in components)
+        het_ids.update(ligand.ligand_name for ligand in ligands)
+
+        chemcomps = ChemComp.query.filter(ChemComp.het_id.in_(het_ids)).all() if het_ids else []
+
+        # build the read-only object graph
+        structures = [PrefetchedEntity(structure) for structure in structures]
+        biomolecules = freeze(biomolecules, 'biomolecule_id')
+        ligands = freeze(ligands, 'ligand_id')
+        chemcomps = freeze(chemcomps, 'het_id')
+
+        attach_many(dict((s.structure_id, s) for s in structures),
+                    sorted(biomolecules.values(), key=lambda b: b.biomolecule_id),
+                    'structure_id', 'Biomolecules', 'Structure')
+        attach_many(biomolecules, [PrefetchedEntity(chain) for chain in chains],
+                    'biomolecule_id', 'Chains', 'Biomolecule')
+        attach_many(biomolecules, sorted(ligands.values(), key=lambda l: l.ligand_id),
+                    'biomolecule_id', 'Ligands', 'Biomolecule')
+        attach_one(ligands, [PrefetchedEntity(site) for site in bindingsites],
+                   'ligand_id', 'BindingSite', 'Ligand')
+        attach_many(ligands, [PrefetchedEntity(eff) for eff in effs],
+                    'ligand_id', 'Effs', 'Ligand')
+
+        # chemical components are shared between ligands and have no backref
+        ligand_chemcomps = dict((ligand_id, []) for ligand_id in ligands)
+        for ligand_id, het_id in components:
+            if het_id in chemcomps: ligand_chemcomps[ligand_id].append(chemcomps[het_id])
+
+        for ligand_id, ligand in ligands.items():
+            ligand._attach('ChemComp', chemcomps.get(ligand.ligand_name))
+            ligand._attach('ChemComps', tuple(ligand_chemcomps[ligand_id]))
+
+        return structures
+
     @paginate
     def fetch_all_kinases(self, *expr, **kwargs):
         """
@@ -241,3 +353,9 @@ from ..models.xref import XRef
 from ..models.ligand import Ligand
 from ..models.chain import Polypeptide
 from ..models.structure import Structure
+from ..models.biomolecule import Biomolecule
+from ..models.chain import Chain
+from ..models.ligandcomponent import LigandComponent
+from ..models.bindingsite import BindingSite
+from ..models.ligandeff import LigandEff
+from ..models.chemcomp import ChemComp
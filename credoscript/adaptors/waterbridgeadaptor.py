@@ -0,0 +1,348 @@
+from collections import defaultdict, namedtuple
+
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql.expression import and_, select, union_all
+
+from credoscript import Session
+
+# entity type bit masks used in the structural_interaction_type_bm of contacts
+PRO = 32
+WAT = 1
+
+# water bridges of the batch methods, same fields as the rows of the queries
+WaterBridge = namedtuple('WaterBridge', ['atom_bgn_id', 'water_atom_id', 'atom_end_id',
+                                         'distance_bgn', 'distance_end',
+                                         'contact_bgn_id', 'contact_end_id'])
+
+class WaterBridgeAdaptor(object):
+    """
+    This adaptor is used to fetch water bridges, i.e. pairs of contacts of the
+    same water molecule with two other atoms, in the form
+    [(atom_bgn_id, water_atom_id, atom_end_id, distance_bgn, distance_end,
+    contact_bgn_id, contact_end_id),...]. The bridges are found with a single
+    set-based query per biomolecule instead of iterating over the contacts of
+    every water atom.
+    """
+    def _water_contacts(self, biomolecule_id):
+        """
+        Returns all the contacts between water and non-water atoms of the given
+        biomolecule, oriented so that the water atom always comes first.
+        """
+        bm = Contact.__table__.c.structural_interaction_type_bm
+        contacts = Contact.__table__
+
+        # water atom is the end of the contact
+        end = select([contacts.c.contact_id,
+                      contacts.c.atom_end_id.label('water_atom_id'),
+                      contacts.c.atom_bgn_id.label('atom_id'),
+                      bm.op('>>')(6).label('entity_type_bm'),
+                      contacts.c.distance],
+                     and_(contacts.c.biomolecule_id==biomolecule_id,
+                          bm.op('&')(63)==WAT, bm.op('>>')(6)!=WAT))
+
+        # water atom is the beginning of the contact
+        bgn = select([contacts.c.contact_id,
+                      contacts.c.atom_bgn_id.label('water_atom_id'),
+                      contacts.c.atom_end_id.label('atom_id'),
+                      bm.op('&')(63).label('entity_type_bm'),
+                      contacts.c.distance],
+                     and_(contacts.c.biomolecule_id==biomolecule_id,
+                          bm.op('>>')(6)==WAT, bm.op('&')(63)!=WAT))
+
+        return union_all(end, bgn)
+
+    def _bridges(self, biomolecule_id, *expr, **kwargs):
+        """
+        Returns the two water contact aliases and the query joining them into
+        water bridges.
+        """
+        max_distance = kwargs.get('max_distance', 6.1)
+
+        WatBgn = self._water_contacts(biomolecule_id).alias('water_bgn')
+        WatEnd = self._water_contacts(biomolecule_id).alias('water_end')
+
+        query = Session().query(WatBgn.c.atom_id.label('atom_bgn_id'),
+                                WatBgn.c.water_atom_id,
+                                WatEnd.c.atom_id.label('atom_end_id'),
+                                WatBgn.c.distance.label('distance_bgn'),
+                                WatEnd.c.distance.label('distance_end'),
+                                WatBgn.c.contact_id.label('contact_bgn_id'),
+                                WatEnd.c.contact_id.label('contact_end_id'))
+
+        query = query.select_from(WatBgn)
+        query = query.join(WatEnd, and_(WatEnd.c.water_atom_id==WatBgn.c.water_atom_id,
+                                        WatEnd.c.atom_id!=WatBgn.c.atom_id))
+
+        # only keep bridges within the maximum sum of the two distances
+        query = query.filter(and_(WatBgn.c.distance + WatEnd.c.distance <= max_distance,
+                                  *expr))
+
+        return WatBgn, WatEnd, query
+
+    def fetch_all_contact_pairs_by_water_atom_ids(self, water_atom_ids, biomolecule_id, **kwargs):
+        """
+        Returns all pairs of contacts formed by the same water atom for the given
+        water atoms, e.g. the proximal water of a ligand. Unlike the water
+        bridges, the pairs include contacts with other water atoms and are not
+        restricted to particular entities.
+
+        Parameters
+        ----------
+        water_atom_ids : list
+            `Atom` identifiers of the water atoms.
+        biomolecule_id : int
+            `Biomolecule` identifier.
+        max_distance : float, default=6.1
+            Maximum sum of the two contact distances.
+
+        Returns
+        -------
+        pairs : list
+            List of (contact_bgn_id, contact_end_id) tuples.
+        """
+        if not water_atom_ids: return []
+
+        max_distance = kwargs.get('max_distance', 6.1)
+        contacts = Contact.__table__
+
+        # every contact once for each of its atoms that is one of the water atoms
+        water_contacts = lambda name: union_all(*[select([contacts.c.contact_id,
+                                                          column.label('water_atom_id'),
+                                                          contacts.c.distance],
+                                                         and_(contacts.c.biomolecule_id==biomolecule_id,
+                                                              column.in_(water_atom_ids)))
+                                                  for column in (contacts.c.atom_bgn_id,
+                                                                 contacts.c.atom_end_id)]).alias(name)
+
+        WatBgn, WatEnd = water_contacts('water_bgn'), water_contacts('water_end')
+
+        query = Session().query(WatBgn.c.contact_id.label('contact_bgn_id'),
+                                WatEnd.c.contact_id.label('contact_end_id'))
+
+        query = query.select_from(WatBgn)
+        query = query.join(WatEnd, and_(WatEnd.c.water_atom_id==WatBgn.c.water_atom_id,
+                                        WatEnd.c.contact_id > WatBgn.c.contact_id))
+
+        query = query.filter(WatBgn.c.distance + WatEnd.c.distance <= max_distance)
+
+        return query.all()
+
+    def _group(self, keys, fetch):
+        """
+        Groups the (key, biomolecule_id) tuples by biomolecule, runs one query per
+        biomolecule and returns a dictionary key -> list of water bridges. The
+        query must return the water bridge columns followed by the key.
+        """
+        biomolecules = defaultdict(set)
+        for key, biomolecule_id in keys: biomolecules[biomolecule_id].add(key)
+
+        bridges = dict((key, []) for key, biomolecule_id in keys)
+
+        for biomolecule_id, group in biomolecules.items():
+            for row in fetch(sorted(group), biomolecule_id):
+                bridges[row[-1]].append(WaterBridge(*row[:-1]))
+
+        return bridges
+
+    def fetch_all_by_biomolecule_id(self, biomolecule_id, *expr, **kwargs):
+        """
+        Returns all the water bridges between two non-water atoms of a biomolecule.
+        Every bridge is returned only once.
+
+        Parameters
+        ----------
+        biomolecule_id : int
+            `Biomolecule` identifier.
+        *expr : BinaryExpressions, optional
+            SQLAlchemy BinaryExpressions that will be used to filter the query.
+        max_distance : float, default=6.1
+            Maximum sum of the two distances to the water atom.
+
+        Returns
+        -------
+        bridges : list
+            List of (atom_bgn_id, water_atom_id, atom_end_id, distance_bgn,
+            distance_end, contact_bgn_id, contact_end_id) tuples.
+
+        Examples
+        --------
+        >>> WaterBridgeAdaptor().fetch_all_by_biomolecule_id(1)
+        [(37, 2415, 1206, 2.79, 2.91, 183, 12021), ...]
+        """
+        WatBgn, WatEnd, query = self._bridges(biomolecule_id, *expr, **kwargs)
+        query = query.filter(WatBgn.c.atom_id < WatEnd.c.atom_id)
+
+        return query.all()
+
+    def _ligand_bridges(self, biomolecule_id, *expr, **kwargs):
+        """
+        Returns the query of the ligand-water bridges of a biomolecule, the
+        ligands still have to be selected through Hetatm.ligand_id.
+        """
+        WatBgn, WatEnd, query = self._bridges(biomolecule_id, *expr, **kwargs)
+
+        query = query.join(Hetatm, Hetatm.atom_id==WatBgn.c.atom_id)
+
+        entity_type_bm = kwargs.get('entity_type_bm', PRO)
+        if entity_type_bm is not None:
+            query = query.filter(WatEnd.c.entity_type_bm.op('&')(entity_type_bm) > 0)
+
+        return query
+
+    def fetch_all_by_ligand_id(self, ligand_id, biomolecule_id, *expr, **kwargs):
+        """
+        Returns all the ligand-water-protein bridges of a ligand. atom_bgn_id is
+        always the ligand atom.
+
+        Parameters
+        ----------
+        ligand_id : int
+            `Ligand` identifier.
+        biomolecule_id : int
+            `Biomolecule` identifier.
+        *expr : BinaryExpressions, optional
+            SQLAlchemy BinaryExpressions that will be used to filter the query.
+        max_distance : float, default=6.1
+            Maximum sum of the two distances to the water atom.
+        entity_type_bm : int, default=32
+            Entity type bit mask of the atoms on the other side of the bridge,
+            default is protein. None returns the bridges to any other atom.
+
+        Queried Entities
+        ----------------
+        Contact, Hetatm
+
+        Returns
+        -------
+        bridges : list
+            List of (atom_bgn_id, water_atom_id, atom_end_id, distance_bgn,
+            distance_end, contact_bgn_id, contact_end_id) tuples.
+
+        Examples
+        --------
+        >>> WaterBridgeAdaptor().fetch_all_by_ligand_id(652, 790)
+        """
+        query = self._ligand_bridges(biomolecule_id, *expr, **kwargs)
+
+        return query.filter(Hetatm.ligand_id==ligand_id).all()
+
+    def fetch_all_by_ligand_ids(self, ligands, *expr, **kwargs):
+        """
+        Returns the ligand-water-protein bridges of many ligands with one query
+        per biomolecule. Takes the same keyword arguments as
+        fetch_all_by_ligand_id().
+
+        Parameters
+        ----------
+        ligands : list
+            List of (ligand_id, biomolecule_id) tuples or `Ligand` objects.
+
+        Returns
+        -------
+        bridges : dict
+            Mapping ligand_id -> list of WaterBridge named tuples with the same
+            fields as the bridges of fetch_all_by_ligand_id().
+
+        Examples
+        --------
+        >>> WaterBridgeAdaptor().fetch_all_by_ligand_ids([(652, 790), (1051, 1202)])
+        {652: [...], 1051: [...]}
+        """
+        keys = [(ligand.ligand_id, ligand.biomolecule_id) if isinstance(ligand, Ligand)
+                else tuple(ligand) for ligand in ligands]
+
+        fetch = lambda ligand_ids, biomolecule_id: (self._ligand_bridges(biomolecule_id, *expr, **kwargs)
+                                                    .filter(Hetatm.ligand_id.in_(ligand_ids))
+                                                    .add_columns(Hetatm.ligand_id))
+
+        return self._group(keys, fetch)
+
+    def _interface_bridges(self, biomolecule_id, *expr, **kwargs):
+        """
+        Returns the query of the protein-water-protein bridges between the
+        chains of the interfaces of a biomolecule, the interfaces still have to
+        be selected through Interface.interface_id.
+        """
+        WatBgn, WatEnd, query = self._bridges(biomolecule_id, *expr, **kwargs)
+
+        AtomBgn, AtomEnd = aliased(Atom), aliased(Atom)
+        ResidueBgn, ResidueEnd = aliased(Residue), aliased(Residue)
+
+        query = query.join(AtomBgn, and_(AtomBgn.atom_id==WatBgn.c.atom_id,
+                                         AtomBgn.biomolecule_id==biomolecule_id))
+        query = query.join(AtomEnd, and_(AtomEnd.atom_id==WatEnd.c.atom_id,
+                                         AtomEnd.biomolecule_id==biomolecule_id))
+        query = query.join(ResidueBgn, and_(ResidueBgn.residue_id==AtomBgn.residue_id,
+                                            ResidueBgn.biomolecule_id==biomolecule_id))
+        query = query.join(ResidueEnd, and_(ResidueEnd.residue_id==AtomEnd.residue_id,
+                                            ResidueEnd.biomolecule_id==biomolecule_id))
+        query = query.join(Interface, and_(Interface.chain_bgn_id==ResidueBgn.chain_id,
+                                           Interface.chain_end_id==ResidueEnd.chain_id))
+
+        query = query.filter(and_(WatBgn.c.entity_type_bm==PRO,
+                                  WatEnd.c.entity_type_bm==PRO))
+
+        return query
+
+    def fetch_all_by_interface_id(self, interface_id, biomolecule_id, *expr, **kwargs):
+        """
+        Returns all the protein-water-protein bridges between the two chains of
+        an interface. atom_bgn_id is always an atom of the first chain.
+
+        Parameters
+        ----------
+        interface_id : int
+            `Interface` identifier.
+        biomolecule_id : int
+            `Biomolecule` identifier.
+        *expr : BinaryExpressions, optional
+            SQLAlchemy BinaryExpressions that will be used to filter the query.
+        max_distance : float, default=6.1
+            Maximum sum of the two distances to the water atom.
+
+        Queried Entities
+        ----------------
+        Contact, AtomBgn (Atom), AtomEnd (Atom), ResidueBgn (Residue),
+        ResidueEnd (Residue), Interface
+
+        Returns
+        -------
+        bridges : list
+            List of (atom_bgn_id, water_atom_id, atom_end_id, distance_bgn,
+            distance_end, contact_bgn_id, contact_end_id) tuples.
+        """
+        query = self._interface_bridges(biomolecule_id, *expr, **kwargs)
+
+        return query.filter(Interface.interface_id==interface_id).all()
+
+    def fetch_all_by_interface_ids(self, interfaces, *expr, **kwargs):
+        """
+        Returns the protein-water-protein bridges of many interfaces with one
+        query per biomolecule.
+
+        Parameters
+        ----------
+        interfaces : list
+            List of (interface_id, biomolecule_id) tuples or `Interface` objects.
+
+        Returns
+        -------
+        bridges : dict
+            Mapping interface_id -> list of WaterBridge named tuples with the
+            same fields as the bridges of fetch_all_by_interface_id().
+        """
+        keys = [(interface.interface_id, interface.biomolecule_id) if isinstance(interface, Interface)
+                else tuple(interface) for interface in interfaces]
+
+        fetch = lambda interface_ids, biomolecule_id: (self._interface_bridges(biomolecule_id, *expr, **kwargs)
+                                                       .filter(Interface.interface_id.in_(interface_ids))
+                                                       .add_columns(Interface.interface_id))
+
+        return self._group(keys, fetch)
+
+from ..models.atom import Atom
+from ..models.contact import Contact
+from ..models.hetatm import Hetatm
+from ..models.interface import Interface
+from ..models.ligand import Ligand
+from ..models.residue import Residue
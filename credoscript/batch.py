@@ -0,0 +1,151 @@
+"""
+This module contains a runner for long batch jobs, e.g. fetching the SIFts of
+all ligands or exporting all biomolecules. The work is split into chunks by id
+range and every completed chunk is recorded in a local checkpoint file, so that
+a job that was interrupted (dropped connection, pre-empted process...) resumes
+with the first chunk that has not been completed yet. Failed chunks are retried
+with a fresh session.
+
+>>> from credoscript import batch
+>>> from credoscript.models import Ligand
+>>> def sifts(start, end):
+...     ligands = Ligand.query.filter(Ligand.ligand_id.between(start, end)).all()
+...     # do something with the ligands
+...     return len(ligands)
+>>> batch.run(sifts, batch.id_ranges(Ligand.ligand_id, size=5000), 'sifts.checkpoint')
+"""
+import json
+import os
+import sys
+import time
+
+from sqlalchemy.sql.expression import func
+
+from credoscript import Session, parallel
+
+def id_ranges(column, *expr, **kwargs):
+    """
+    Returns the list of inclusive (start, end) id ranges covering all values of
+    the given integer column.
+
+    Parameters
+    ----------
+    column : Column
+        The id column, e.g. Ligand.ligand_id.
+    *expr : BinaryExpressions, optional
+        SQLAlchemy BinaryExpressions that will be used to filter the rows whose
+        ids are covered.
+    size : int, default=10000
+        Number of ids per range.
+    """
+    size = kwargs.get('size', 10000)
+
+    start, end = Session().query(func.min(column), func.max(column)).filter(*expr).one()
+
+    if start is None: return []
+
+    return [(first, min(first + size - 1, end)) for first in xrange(start, end + 1, size)]
+
+def read_checkpoint(path):
+    """
+    Returns the set of (start, end) ranges that are recorded as completed in the
+    checkpoint file.
+    """
+    completed = set()
+
+    if not os.path.exists(path): return completed
+
+    with open(path) as fh:
+        for line in fh:
+            # the last line might be incomplete if the job was killed
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+
+            completed.add((record['start'], record['end']))
+
+    return completed
+
+def report_progress(done, total, items, elapsed, stream=sys.stderr):
+    """
+    Default progress reporter, writes the number of completed chunks, the number
+    of processed items and the throughput to stderr.
+    """
+    rate = items / elapsed if elapsed else 0.0
+    stream.write("\r{0}/{1} chunks ({2:.1%}), {3} items, {4:.1f} items/s".format(
+                 done, total, float(done) / total if total else 1.0, items, rate))
+
+    if done == total: stream.write("\n")
+
+    stream.flush()
+
+def _attempt(fn, chunk, retries, delay):
+    """
+    Runs a single chunk and retries it with a new session if it fails.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return fn(*chunk)
+
+        except Exception:
+            # drop the session (and its possibly broken connection)
+            Session.remove()
+            if attempt == retries: raise
+
+            time.sleep(delay * (attempt + 1))
+
+def run(fn, ranges, checkpoint, retries=3, delay=5, workers=1, reporter=report_progress):
+    """
+    Runs fn for every (start, end) range that is not recorded in the checkpoint
+    file yet and records every completed range.
+
+    Parameters
+    ----------
+    fn : callable
+        Function fn(start, end) that processes all the entities in the inclusive
+        id range and returns the number of processed items (or None). It should
+        write its results itself, e.g. into a file per range.
+    ranges : list
+        The (start, end) ranges, e.g. from id_ranges().
+    checkpoint : str
+        Path of the checkpoint file, will be created if it does not exist.
+    retries : int, default=3
+        Number of times a failed range is retried before the job is aborted.
+    delay : int, default=5
+        Seconds to wait before the first retry, multiplied by the attempt.
+    workers : int, default=1
+        Number of ranges that are processed in parallel on threads, see
+        credoscript.parallel.
+    reporter : callable, optional
+        Function reporter(done, total, items, elapsed) that is called after every
+        completed range, None to disable progress reporting.
+
+    Returns
+    -------
+    summary : dict
+        Number of completed and skipped ranges, number of processed items and
+        run time of this invocation.
+    """
+    completed = read_checkpoint(checkpoint)
+    pending = [tuple(chunk) for chunk in ranges if tuple(chunk) not in completed]
+
+    total, done, items = len(ranges), len(ranges) - len(pending), 0
+    started = time.time()
+
+    task = lambda chunk: (chunk, _attempt(fn, chunk, retries, delay))
+
+    with open(checkpoint, 'a') as fh:
+        for (start, end), count in parallel.imap(task, pending, workers=workers):
+            fh.write(json.dumps({'start': start, 'end': end, 'count': count,
+                                 'time': time.time()}) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+
+            done += 1
+            items += count or 0
+
+            if reporter: reporter(done, total, items, time.time() - started)
+
+    return {'completed': len(pending), 'skipped': total - len(pending),
+            'items': items, 'seconds': time.time() - started}
@@ -2,7 +2,8 @@
 This extension contains the entities for the UniProt SIFt clustering of all
 ligands in CREDO.
 """
-from xml.etree.ElementTree import Element, SubElement
+from collections import defaultdict
+from xml.etree.ElementTree import Element, SubElement, tostring
 
 from sqlalchemy.orm import aliased, backref, relationship
 from sqlalchemy.sql.expression import and_, or_
@@ -185,105 +186,179 @@ class LigandUniProtSIFtNode(Base):
         """
         return LigandUniProtSIFtNodeAdaptor().fetch_all_leaves(self.ligand_uniprot_sift_node_id)
 
-    def _clade(self, distance=0):
+    def _tree(self, batch_size=1000):
         """
-        Recursive method that will traverse the UniProt SIFt cluster and return
-        an XML clade element containing the annotated tree.
+        Returns the nodes of the tree of this UniProt accession, the ligands of
+        the leaves below this node and their annotations. The nodes are loaded
+        with a single query and the annotations with one query per entity and
+        batch of ligands.
 
-        :param distance: The distance argument is used to provide the children
-                         of this node with its distance.
+        :param batch_size: Number of ligands per annotation query.
         """
-        def ligclade(ligand, distance):
-            """
-            Returns an annotated clade element for a ligand.
-            """
-            element = Element('clade')
+        nodes = dict((node.node, node) for node in self.query.filter_by(uniprot=self.uniprot))
 
-            # name for the node that will be displayed in the tree
-            name = SubElement(element, 'name')
-            name.text = ligand.path[:17]
+        query = LigandUniProtSIFtNode2Ligand.query.with_entities(LigandUniProtSIFtNode2Ligand.node,
+                                                                 LigandUniProtSIFtNode2Ligand.ligand_id)
+        leaves = dict(query.filter_by(uniprot=self.uniprot).all())
 
-            # branch length: obtained from the parent
-            branch_length = SubElement(element, 'branch_length')
-            branch_length.text = "{:.2f}".format(distance)
+        # ligands of the leaves below this node
+        ligand_ids, stack = [], [self.node]
 
-            # additional annotation: the uri element is used to make the node
-            # clickable, it will link to the credimus ligand page
-            annotation = SubElement(element, 'annotation')
-            uri = SubElement(annotation, 'uri')
-            uri.text = "/ligands/{}".format(ligand.ligand_id)
+        while stack:
+            node = nodes[stack.pop()]
 
-            # chart options for this ligand node
-            chart = SubElement(element, 'chart')
-            interaction = SubElement(chart, 'interaction')
+            for child in (node.links, node.rechts):
+                if child < 0: stack.append(child)
+                elif child in leaves: ligand_ids.append(leaves[child])
 
-            # interaction types as internal arc chart
-            if ligand.is_drug_target_int: interaction.text = 'drugtarget'
-            elif ligand.is_enzyme_cmpd: interaction.text = 'enzymecmpd'
+        ligands, chemcomps, bindingsites, effs = {}, defaultdict(list), {}, defaultdict(list)
 
-            # background color to highlight the compound type
-            chemcomps = ligand.ChemComps.all()
+        for start in xrange(0, len(ligand_ids), batch_size):
+            batch = ligand_ids[start:start+batch_size]
 
-            if len(chemcomps) == 1:
-                chemcomp = chemcomps.pop()
+            ligands.update((ligand.ligand_id, ligand)
+                           for ligand in Ligand.query.filter(Ligand.ligand_id.in_(batch)))
 
-                if chemcomp.is_approved_drug: name.attrib['bgStyle'] = 'appdrug'
-                elif chemcomp.is_nucleotide: name.attrib['bgStyle'] = 'nucleotide'
-                elif chemcomp.is_drug: name.attrib['bgStyle'] = 'drug'
-                elif chemcomp.is_lead: name.attrib['bgStyle'] = 'lead'
-                elif chemcomp.is_drug_like: name.attrib['bgStyle'] = 'druglike'
-                elif chemcomp.is_solvent: name.attrib['bgStyle'] = 'solvent'
+            query = ChemComp.query.add_column(LigandComponent.ligand_id)
+            query = query.join(LigandComponent, LigandComponent.het_id==ChemComp.het_id)
 
-            else:
-                name.attrib['bgStyle'] = 'heteropeptide'
+            for chemcomp, ligand_id in query.filter(LigandComponent.ligand_id.in_(batch)):
+                chemcomps[ligand_id].append(chemcomp)
 
-            # binding site property
-            bindingsite = SubElement(chart, 'bindingsite')
+            bindingsites.update((bindingsite.ligand_id, bindingsite) for bindingsite
+                                in BindingSite.query.filter(BindingSite.ligand_id.in_(batch)))
 
-            if ligand.BindingSite.has_mut_res: bindingsite.text = 'mutated'
-            elif ligand.BindingSite.has_mod_res: bindingsite.text = 'modified'
-            elif ligand.BindingSite.has_non_std_res: bindingsite.text = 'nonstd'
+            for eff in LigandEff.query.filter(LigandEff.ligand_id.in_(batch)):
+                effs[eff.ligand_id].append(eff)
 
-            # normalized maximum ligand p(Kd,Ki,IC50) as bar chart
-            # we normalize it between 0 and 100 to make the differences more visible
-            # in the bar chart. Logarithmic values are hard to distinguish
-            activity = SubElement(chart, 'activity')
-            effs = ligand.Effs
+        annotations = dict((node, (ligands[ligand_id], chemcomps[ligand_id],
+                                   bindingsites.get(ligand_id), effs[ligand_id]))
+                           for node, ligand_id in leaves.items() if ligand_id in ligands)
 
-            # we use 1 nM (9) as ceiling, 1mM (3) as floor
-            norm_pkd = max(((eff.p - 3) / (9.0-3)) * 100 for eff in effs) if effs else 0
-            activity.text = str(norm_pkd)
+        return nodes, annotations
 
-            return element
+    def _ligclade(self, ligand, chemcomps, bindingsite, effs, distance):
+        """
+        Returns an annotated clade element for a ligand.
+        """
+        element = Element('clade')
 
-        clade = Element('clade')
+        # name for the node that will be displayed in the tree
+        name = SubElement(element, 'name')
+        name.text = ligand.path[:17]
 
-        # every node has a branch length (root is 0)
-        branch_length = SubElement(clade, 'branch_length')
+        # branch length: obtained from the parent
+        branch_length = SubElement(element, 'branch_length')
         branch_length.text = "{:.2f}".format(distance)
 
-        if self.links < 0: node = self.LeftNode._clade(self.distance)
-        else: node = ligclade(self.LeftLigand, self.distance)
+        # additional annotation: the uri element is used to make the node
+        # clickable, it will link to the credimus ligand page
+        annotation = SubElement(element, 'annotation')
+        uri = SubElement(annotation, 'uri')
+        uri.text = "/ligands/{}".format(ligand.ligand_id)
+
+        # chart options for this ligand node
+        chart = SubElement(element, 'chart')
+        interaction = SubElement(chart, 'interaction')
+
+        # interaction types as internal arc chart
+        if ligand.is_drug_target_int: interaction.text = 'drugtarget'
+        elif ligand.is_enzyme_cmpd: interaction.text = 'enzymecmpd'
+
+        # background color to highlight the compound type
+        if len(chemcomps) == 1:
+            chemcomp = chemcomps[0]
+
+            if chemcomp.is_approved_drug: name.attrib['bgStyle'] = 'appdrug'
+            elif chemcomp.is_nucleotide: name.attrib['bgStyle'] = 'nucleotide'
+            elif chemcomp.is_drug: name.attrib['bgStyle'] = 'drug'
+            elif chemcomp.is_lead: name.attrib['bgStyle'] = 'lead'
+            elif chemcomp.is_drug_like: name.attrib['bgStyle'] = 'druglike'
+            elif chemcomp.is_solvent: name.attrib['bgStyle'] = 'solvent'
+
+        else:
+            name.attrib['bgStyle'] = 'heteropeptide'
+
+        # binding site property
+        chart_bindingsite = SubElement(chart, 'bindingsite')
 
-        clade.append(node)
+        if bindingsite is not None:
+            if bindingsite.has_mut_res: chart_bindingsite.text = 'mutated'
+            elif bindingsite.has_mod_res: chart_bindingsite.text = 'modified'
+            elif bindingsite.has_non_std_res: chart_bindingsite.text = 'nonstd'
 
-        if self.rechts < 0: node = self.RightNode._clade(self.distance)
-        else: node = ligclade(self.RightLigand, self.distance)
+        # normalized maximum ligand p(Kd,Ki,IC50) as bar chart
+        # we normalize it between 0 and 100 to make the differences more visible
+        # in the bar chart. Logarithmic values are hard to distinguish
+        activity = SubElement(chart, 'activity')
 
-        clade.append(node)
+        # we use 1 nM (9) as ceiling, 1mM (3) as floor
+        norm_pkd = max(((eff.p - 3) / (9.0-3)) * 100 for eff in effs) if effs else 0
+        activity.text = str(norm_pkd)
 
-        return clade
+        return element
 
-    def phyloxml(self, **kwargs):
+    def _events(self, tree, distance=0):
         """
-        Returns the root element of UniProt SIFt cluster tree in PhyloXML format.
+        Traverses the tree below this node iteratively (no recursion limit) and
+        yields ('start', distance) when a clade of a node is opened, ('ligand',
+        element) for every leaf and ('end', None) when the clade is closed. The
+        left child is always visited before the right child.
+
+        :param distance: Branch length of this node.
+        """
+        nodes, annotations = tree
+        stack = [('node', self.node, distance)]
+
+        while stack:
+            event, node, distance = stack.pop()
+
+            if event == 'end':
+                yield 'end', None
+
+            elif node < 0:
+                yield 'start', distance
+
+                # children get the distance of their parent node
+                current = nodes[node]
+                stack.append(('end', None, None))
+                stack.append(('node', current.rechts, current.distance))
+                stack.append(('node', current.links, current.distance))
+
+            elif node in annotations:
+                yield 'ligand', self._ligclade(*annotations[node], distance=distance)
+
+    def _clade(self, distance=0, tree=None):
+        """
+        Returns an XML clade element containing the annotated tree below this
+        node.
+
+        :param distance: The distance argument is used to provide the children
+                         of this node with its distance.
         """
-        root = Element('phyloxml')
-        phylogeny = SubElement(root, 'phylogeny')
-        phylogeny.set('rooted', 'true')
+        stack = [Element('clade')]
+
+        for event, value in self._events(tree or self._tree(), distance):
+            if event == 'start':
+                clade = SubElement(stack[-1], 'clade')
+
+                # every node has a branch length (root is 0)
+                branch_length = SubElement(clade, 'branch_length')
+                branch_length.text = "{:.2f}".format(value)
+
+                stack.append(clade)
 
-        # rendering options
-        render = SubElement(phylogeny, 'render')
+            elif event == 'ligand': stack[-1].append(value)
+            else: stack.pop()
+
+        return stack[0][0]
+
+    def _render(self, **kwargs):
+        """
+        Returns the render element of the PhyloXML tree containing the rendering
+        options, charts and styles.
+        """
+        render = Element('render')
         parameters = SubElement(render, 'parameters')
         circular = SubElement(parameters, 'circular')
         buffer_radius = SubElement(circular, 'bufferRadius')
@@ -308,28 +383,63 @@ class LigandUniProtSIFtNode(Base):
 
         # styling of elements: charts, arcs, backgrounds
         styles = SubElement(render, 'styles')
-        drugtarget = SubElement(styles, 'drugtarget', {'fill': '#75BBE4', 'stroke':'#DDD'})
-        enzymecmpd = SubElement(styles, 'enzymecmpd', {'fill': '#DEF1CC', 'stroke':'#DDD'})
-        bar_chart = SubElement(styles, 'barChart', {'fill':'#999', 'stroke-width':'0'})
+        SubElement(styles, 'drugtarget', {'fill': '#75BBE4', 'stroke':'#DDD'})
+        SubElement(styles, 'enzymecmpd', {'fill': '#DEF1CC', 'stroke':'#DDD'})
+        SubElement(styles, 'barChart', {'fill':'#999', 'stroke-width':'0'})
 
         # chemical component types
-        appdrug = SubElement(styles, 'appdrug', {'fill': '#3296CB', 'stroke':'#3296CB'})
-        drug = SubElement(styles, 'drug', {'fill': '#75BBE4', 'stroke':'#75BBE4'})
-        lead = SubElement(styles, 'lead', {'fill': '#A9D6F0', 'stroke':'#A9D6F0'})
-        druglike = SubElement(styles, 'druglike', {'fill': '#CDE9F4', 'stroke':'#CDE9F4'})
-        solvent = SubElement(styles, 'solvent', {'fill': '#FFFACD', 'stroke':'#FFFACD'})
-        heteropeptide = SubElement(styles, 'heteropeptide', {'fill': '#FBD5A5', 'stroke':'#FBD5A5'})
-        nucleotide = SubElement(styles, 'nucleotide', {'fill': '#DEF1CC', 'stroke':'#DEF1CC'})
+        SubElement(styles, 'appdrug', {'fill': '#3296CB', 'stroke':'#3296CB'})
+        SubElement(styles, 'drug', {'fill': '#75BBE4', 'stroke':'#75BBE4'})
+        SubElement(styles, 'lead', {'fill': '#A9D6F0', 'stroke':'#A9D6F0'})
+        SubElement(styles, 'druglike', {'fill': '#CDE9F4', 'stroke':'#CDE9F4'})
+        SubElement(styles, 'solvent', {'fill': '#FFFACD', 'stroke':'#FFFACD'})
+        SubElement(styles, 'heteropeptide', {'fill': '#FBD5A5', 'stroke':'#FBD5A5'})
+        SubElement(styles, 'nucleotide', {'fill': '#DEF1CC', 'stroke':'#DEF1CC'})
 
         # binding site properties
-        mutated = SubElement(styles, 'mutated', {'fill': '#E75559', 'stroke':'#DDD'})
-        modified = SubElement(styles, 'modified', {'fill': '#F98892', 'stroke':'#DDD'})
-        nonstd = SubElement(styles, 'nonstd', {'fill': '#FDCDD7', 'stroke':'#DDD'})
+        SubElement(styles, 'mutated', {'fill': '#E75559', 'stroke':'#DDD'})
+        SubElement(styles, 'modified', {'fill': '#F98892', 'stroke':'#DDD'})
+        SubElement(styles, 'nonstd', {'fill': '#FDCDD7', 'stroke':'#DDD'})
+
+        return render
 
-        clade = SubElement(phylogeny, 'clade')
-        clade.append(self._clade())
+    def phyloxml(self, stream=None, **kwargs):
+        """
+        Returns the root element of UniProt SIFt cluster tree in PhyloXML format.
+        All nodes of the tree are loaded with one query and the annotations of
+        the leaves with a few batched queries.
+
+        :param stream: File-like object. If given, the XML is written to it
+                       incrementally, one ligand clade at a time, instead of
+                       building the whole tree in memory, and None is returned.
+        :param batch_size: Number of ligands per annotation query.
+        """
+        tree = self._tree(batch_size=kwargs.get('batch_size', 1000))
+
+        if stream is None:
+            root = Element('phyloxml')
+            phylogeny = SubElement(root, 'phylogeny')
+            phylogeny.set('rooted', 'true')
+            phylogeny.append(self._render(**kwargs))
+
+            clade = SubElement(phylogeny, 'clade')
+            clade.append(self._clade(tree=tree))
+
+            return root
+
+        stream.write('<phyloxml><phylogeny rooted="true">')
+        stream.write(tostring(self._render(**kwargs)))
+        stream.write('<clade>')
+
+        for event, value in self._events(tree):
+            if event == 'start':
+                stream.write('<clade><branch_length>{:.2f}</branch_length>'.format(value))
+            elif event == 'ligand':
+                stream.write(tostring(value))
+            else:
+                stream.write('</clade>')
 
-        return root
+        stream.write('</clade></phylogeny></phyloxml>')
 
 class LigandUniProtSIFtNode2Ligand(Base):
     __tablename__ = '%s.ligand_uniprot_sift_node_to_ligand' % schema['credo']
@@ -450,4 +560,8 @@ class LigandUniProtSIFtNodeAdaptor(object):
 
         return query
 
+from credoscript.models.bindingsite import BindingSite
+from credoscript.models.chemcomp import ChemComp
 from credoscript.models.ligand import Ligand
+from credoscript.models.ligandcomponent import LigandComponent
+from credoscript.models.ligandeff import LigandEff
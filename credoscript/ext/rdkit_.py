@@ -1,3 +1,5 @@
+import multiprocessing
+
 import sqlalchemy.types as types
 
 from sqlalchemy import func
@@ -8,8 +10,119 @@ try:
 except ImportError:
     RDMol = BYTEA
 else:
+    class LazyMol(object):
+        """
+        Proxy of an RDKit molecule that keeps the pickled molecule and only builds
+        the RDKit Mol when one of its attributes is accessed for the first time.
+        RDKit functions that take a molecule as argument need the real molecule,
+        i.e. the mol attribute.
+        """
+        __slots__ = ('pkl', '_mol')
+
+        def __init__(self, pkl):
+            self.pkl = pkl
+            self._mol = None
+
+        @property
+        def mol(self):
+            """
+            The deserialised RDKit Mol.
+            """
+            if self._mol is None: self._mol = Mol(self.pkl)
+
+            return self._mol
+
+        @property
+        def loaded(self):
+            """
+            True if the RDKit Mol has been built already.
+            """
+            return self._mol is not None
+
+        def __getattr__(self, name):
+            # only called for attributes that are not defined on the proxy
+            if name.startswith('__') or name == '_mol': raise AttributeError(name)
+
+            return getattr(self.mol, name)
+
+        def __getstate__(self):
+            return self.pkl
+
+        def __setstate__(self, pkl):
+            self.pkl, self._mol = pkl, None
+
+        def ToBinary(self):
+            return self.pkl
+
+    def unwrap(mol):
+        """
+        Returns the RDKit Mol of a LazyMol, other objects are returned unchanged.
+        """
+        return mol.mol if isinstance(mol, LazyMol) else mol
+
+    # function applied to every molecule in a worker process of map_mols()
+    _job = None
+
+    def _init_process(fn):
+        """
+        """
+        global _job
+        _job = fn
+
+    def _apply(pkl):
+        """
+        """
+        return _job(Mol(pkl)) if pkl is not None else None
+
+    def map_mols(fn, mols, processes=None, chunksize=None):
+        """
+        Returns the list of the results of fn applied to every molecule, the
+        molecules are deserialised and processed in a pool of worker processes
+        so that only the pickled molecules and the results are transferred.
+
+        Parameters
+        ----------
+        fn : callable
+            Function that takes an RDKit Mol and returns a picklable result, e.g.
+            lambda mol: mol.HasSubstructMatch(query). None molecules give None.
+        mols : list
+            LazyMol objects, RDKit Mols or pickled molecules.
+        processes : int, optional
+            Number of worker processes, defaults to the number of cores. 1
+            processes the molecules in this process.
+        """
+        pkls = [mol if mol is None or isinstance(mol, basestring) else mol.ToBinary()
+                for mol in mols]
+
+        if processes == 1:
+            return [fn(Mol(pkl)) if pkl is not None else None for pkl in pkls]
+
+        processes = processes or multiprocessing.cpu_count()
+        chunksize = chunksize or max(1, len(pkls) // (processes * 4))
+
+        pool = multiprocessing.Pool(processes, initializer=_init_process, initargs=(fn,))
+
+        try:
+            results = pool.map(_apply, pkls, chunksize=chunksize)
+            pool.close()
+
+        except:
+            pool.terminate()
+            raise
+
+        finally:
+            pool.join()
+
+        return results
+
     class RDMol(types.TypeDecorator):
-        """Custom type for RDKit Molecule type""" 
+        """
+        Custom type for RDKit Molecule type. Results are returned as LazyMol
+        instead of RDKit Mol, methods of the molecule can be called directly but
+        RDKit functions that take the molecule as argument, e.g.
+        mol.HasSubstructMatch(rdmol), need the RDKit Mol (rdmol.mol or
+        unwrap(rdmol)).
+        """
         impl = BYTEA
 
         def get_col_spec(self):
@@ -19,13 +132,13 @@ else:
             if value is not None:
                 value = value.ToBinary()
             return value
-            
+
         def bind_expression(self, bind_value):
             return func.rdkit.mol_from_pkl(bind_value)
 
         def process_result_value(self, value, dialect):
-            #print "Processing result value", value #, type(cPickle.loads(value))
-            return Mol(str(value)) if value is not None else value
-            
+            # only copy the pickle, the Mol is built on first access
+            return LazyMol(str(value)) if value is not None else value
+
         def column_expression(self, col):
             return func.rdkit.mol_to_pkl(col, type_=self)
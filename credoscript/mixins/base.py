@@ -220,3 +220,18 @@ def paginate(func):
             return query.all()
 
     return wrapper
+
+def loader_profile(adaptor, profile):
+    """
+    Returns the loader options (joinedload, subqueryload etc.) of the named
+    profile that is defined in the profiles dictionary of the given adaptor.
+    """
+    profiles = getattr(adaptor, 'profiles', {})
+
+    try:
+        return tuple(profiles[profile])
+
+    except KeyError:
+        raise ValueError("{0} has no loader profile '{1}', available profiles: {2}"
+                         .format(adaptor.__class__.__name__, profile,
+                                 ', '.join(sorted(profiles)) or 'none'))
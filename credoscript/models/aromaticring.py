@@ -1,6 +1,6 @@
 from sqlalchemy.ext.hybrid import hybrid_property
 
-from credoscript import Base, schema
+from credoscript import Base, config, schema
 from credoscript.mixins import PathMixin
 from credoscript.support.vector import Vector
 
@@ -67,14 +67,14 @@ class AromaticRing(Base, PathMixin):
         """
         The centroid of the aromatic ring as Vector object.
         """
-        return Vector(self.centroid)
+        return Vector(self.centroid, copy=not config['extras'].get('numpy-casters'))
 
     @property
     def Normal(self):
         """
         The normal of the aromatic ring as Vector object.
         """
-        return Vector(self.normal)
+        return Vector(self.normal, copy=not config['extras'].get('numpy-casters'))
 
     @property
     def Atoms(self):
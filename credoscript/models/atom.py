@@ -2,10 +2,15 @@ from sqlalchemy.orm import backref, relationship
 from sqlalchemy.sql.expression import or_
 from sqlalchemy.ext.hybrid import hybrid_method
 
-from credoscript import Base, BaseQuery, schema
+from credoscript import Base, BaseQuery, config, schema
 from credoscript.mixins import PathMixin
 from credoscript.support.vector import Vector
 
+# atom type flags in the bit order of Atom.type_bm
+ATOM_TYPES = ("is_acceptor","is_donor","is_weak_acceptor","is_weak_donor","is_xbond_acceptor","is_xbond_donor",
+              "is_pos_ionisable" ,"is_neg_ionisable","is_aromatic","is_hydrophobe",
+              "is_carbonyl_carbon","is_carbonyl_oxygen","is_metal")
+
 class Atom(Base, PathMixin):
     """
     Represents an Atom entity from CREDO.
@@ -109,20 +114,23 @@ class Atom(Base, PathMixin):
 
     @property
     def pdb_line(self):
-        name_fix = " %s" % self.atom_name if (len(self.atom_name) < 4 and not self.atom_name.startswith('H')) else self.atom_name
-        line = "{:6s}{:5d} {:4s}{:1s}{:3s} {:1s}{:4d}{:1s}   {:8.3f}{:8.3f}{:8.3f}{:6.2f}{:6.2f}          {:>2s}  \n".format(
-               self.group_pdb, self.atom_serial, name_fix, self.alt_loc, self.res_name,
-               self.chain_id, self.res_num, self.ins_code, self.coords[0], self.coords[1], self.coords[2],
-               self.occupancy, self.b_factor, self.element)
-        return line
+        """
+        Returns this atom as PDB ATOM/HETATM record. Use pdbwriter.write_pdb() to
+        export whole biomolecules without loading every residue and chain.
+        """
+        return pdbwriter.pdb_line(self.group_pdb, self.atom_serial, self.atom_name,
+                                  self.alt_loc, self.res_name, self.chain_id,
+                                  self.res_num, self.ins_code, self.coords,
+                                  self.occupancy, self.b_factor, self.element)
     
     @property
     def Vector(self):
         """
         Returns the coordinates of this atom as Vector object that supports linear
-        algebra routines.
+        algebra routines. The coordinates are not copied if they are decoded as
+        NumPy arrays already (numpy-casters extra).
         """
-        return Vector(self.coords)
+        return Vector(self.coords, copy=not config['extras'].get('numpy-casters'))
 
     @property
     def ProximalWater(self):
@@ -190,11 +198,8 @@ class Atom(Base, PathMixin):
     
     @property
     def type_bm(self):
-        all_prop = ["is_acceptor","is_donor","is_weak_acceptor","is_weak_donor","is_xbond_acceptor","is_xbond_donor",
-                    "is_pos_ionisable" ,"is_neg_ionisable","is_aromatic","is_hydrophobe",
-                    "is_carbonyl_carbon","is_carbonyl_oxygen","is_metal"]
-
-        return sum([int(getattr(self, prop, 0)) << i for (i, prop) in enumerate(all_prop)])
+        return sum([int(getattr(self, prop, 0)) << i for (i, prop) in enumerate(ATOM_TYPES)])
         
 
 from ..adaptors.atomadaptor import AtomAdaptor
+from ..support import pdbwriter
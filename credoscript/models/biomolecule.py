@@ -179,4 +179,36 @@ class Biomolecule(Base, PathMixin):
         adaptor = AtomRingInteractionAdaptor(dynamic=True)
         return adaptor.fetch_all_by_biomolecule_id(self.biomolecule_id)
 
+    def write_pdb(self, fh, *expr, **kwargs):
+        """
+        Streams all the atoms of this biomolecule in PDB format to the given
+        file-like object with a single query. Use format='mmcif' to write an
+        mmCIF _atom_site loop instead.
+
+        Parameters
+        ----------
+        fh : file
+            File-like object, e.g. an open file or socket.makefile('w').
+        *expr : BinaryExpressions, optional
+            SQLAlchemy BinaryExpressions that will be used to filter the atoms.
+        format : str, default='pdb'
+            Either 'pdb' or 'mmcif'.
+
+        Returns
+        -------
+        count : int
+            Number of atom records that were written.
+
+        Examples
+        --------
+        >>> with open('1a52.pdb', 'w') as fh: biomolecule.write_pdb(fh)
+        4094
+        """
+        if kwargs.pop('format', 'pdb') == 'mmcif':
+            kwargs.setdefault('name', self.path.replace('/', '_'))
+            return pdbwriter.write_mmcif(self.biomolecule_id, fh, *expr, **kwargs)
+
+        return pdbwriter.write_pdb(self.biomolecule_id, fh, *expr, **kwargs)
+
 from ..adaptors.atomringinteractionadaptor import AtomRingInteractionAdaptor
+from ..support import pdbwriter
@@ -278,6 +278,11 @@ class ChemComp(Base):
         limit : int, optional, default=25
             The number of hits that should be returned.
         target : {'ligands','chemcomps'}
+        max_confs : int, optional
+            Only consider the top N conformers of every chemical component.
+        local : bool, default=False
+            Search against the client-side conformer index
+            (credoscript.support.usr) instead of using the database.
 
         Returns
         -------
@@ -298,6 +303,11 @@ class ChemComp(Base):
         """
         conformer = self.Conformers.first()
 
+        if kwargs.pop('local', False):
+            return usr.chem_comp_index().fetch_all_by_usr_moments(*expr,
+                                                                  usr_moments=conformer.usr_moments,
+                                                                  **kwargs)
+
         return ChemCompAdaptor().fetch_all_by_usr_moments(*expr, usr_space=conformer.usr_space,
                                                           usr_moments=conformer.usr_moments,
                                                           **kwargs)
@@ -305,3 +315,4 @@ class ChemComp(Base):
 from .chemcompconformer import ChemCompConformer
 from .ligand import Ligand
 from ..adaptors.chemcompadaptor import ChemCompAdaptor
+from ..support import usr
@@ -25,10 +25,18 @@ class ChemCompConformer(Base):
 
     def usrcat(self, *expr, **kwargs):
         """
+        Performs a USRCAT search of this conformer against the conformers of all
+        chemical components, in the client-side index if local=True.
         """
+        if kwargs.pop('local', False):
+            return usr.chem_comp_index().fetch_all_by_usr_moments(*expr,
+                                                                  usr_moments=self.usr_moments,
+                                                                  **kwargs)
+
         return ChemCompAdaptor().fetch_all_by_usr_moments(*expr,
                                                           usr_space=self.usr_space,
                                                           usr_moments=self.usr_moments,
                                                           **kwargs)
 
 from ..adaptors.chemcompadaptor import ChemCompAdaptor
+from ..support import usr
@@ -5,6 +5,7 @@ from sqlalchemy.sql.expression import func
 
 try:
     from rdkit.Chem import MolFromSmarts, MolFromSmiles
+    from credoscript.ext.rdkit_ import unwrap
 except ImportError:
     pass
 
@@ -20,6 +21,14 @@ class FragmentRDMol(Base):
     This class contains the RDKit RDMol object for a fragment from CREDO.
     Only available if the RDKit PostgreSQL cartridge is installed on the server
     and the RDKit Python wrappers are available on the client side.
+
+    Attributes
+    ----------
+    rdmol : LazyMol
+        The RDKit molecule of the fragment. The molecule is only deserialised
+        when one of its attributes is accessed, RDKit functions that take the
+        molecule as argument need the RDKit Mol, i.e. rdmol.mol or
+        credoscript.ext.rdkit_.unwrap(rdmol).
     """
     __tablename__ = '%s.fragment_rdmols' % schema['pdbchem']
     __table_args__ = {'autoload': True, 'extend_existing': True}
@@ -126,7 +135,7 @@ class FragmentRDMol(Base):
             True if the rdmol molecule attribute is contained in the specified
             substructure in SMILES format.
         """
-        return MolFromSmiles(smiles).HasSubstructMatch(self.rdmol)
+        return MolFromSmiles(smiles).HasSubstructMatch(unwrap(self.rdmol))
 
     @contained_in.expression
     def contained_in(self, smiles):
@@ -1,4 +1,6 @@
+import numpy as np
 from sqlalchemy.orm import backref, relationship, column_property, synonym
+from sqlalchemy.orm.collections import attribute_mapped_collection
 from sqlalchemy.sql.expression import and_, func, or_
 from sqlalchemy.ext.hybrid import hybrid_method, hybrid_property
 
@@ -83,6 +85,8 @@ class Ligand(Base, PathMixin):
         All the aromatic rings of this ligand.
     Atoms : list
         All the atoms of this ligand.
+    AtomMap : dict
+        All the atoms of this ligand keyed by atom_id (can be eager loaded).
     Ligand_fragments : Query
         All the fragments derived from this ligand.
     MolString : MolString
@@ -161,6 +165,15 @@ class Ligand(Base, PathMixin):
                          foreign_keys="[LigandComponent.ligand_id, Atom.residue_id, Atom.biomolecule_id]",
                          uselist=True, innerjoin=True, lazy='dynamic')
 
+    # non-dynamic variant of Atoms that can be eager loaded, keyed by atom_id
+    AtomMap = relationship("Atom",
+                           collection_class=attribute_mapped_collection("atom_id"),
+                           secondary=Base.metadata.tables['%s.ligand_components' % schema['credo']],
+                           primaryjoin="Ligand.ligand_id==LigandComponent.ligand_id",
+                           secondaryjoin="and_(LigandComponent.residue_id==Atom.residue_id, Ligand.biomolecule_id==Atom.biomolecule_id)",
+                           foreign_keys="[LigandComponent.ligand_id, Atom.residue_id, Atom.biomolecule_id]",
+                           uselist=True, innerjoin=True)
+
     LigandFragments = relationship("LigandFragment", query_class=BaseQuery,
                                    primaryjoin="LigandFragment.ligand_id==Ligand.ligand_id",
                                    foreign_keys="[LigandFragment.ligand_id]",
@@ -245,20 +258,22 @@ class Ligand(Base, PathMixin):
         usr : float
             The USR similarity between two ligands.
         """
-        if isinstance(other, Ligand) and self.usr_moments and other.usr_moments:
+        if not isinstance(other, Ligand): return None
+
+        # the moments can be lists or NumPy arrays (numpy-casters extra)
+        moments = self.usr_moments, other.usr_moments
+
+        if all(m is not None and len(m) for m in moments):
             ow, hw, rw, aw, dw = 1.0, 0.25, 0.25, 0.25, 0.25
 
             scale = 12 * (ow+hw+rw+aw+dw)
-            weights = [abs(a - b) for a, b in zip(self.usr_moments, other.usr_moments)]
 
-            # apply the USRCAT weights
-            weights[:12] = [x*ow for x in weights[:12]]
-            weights[12:24] = [x*hw for x in weights[12:24]]
-            weights[24:36] = [x*rw for x in weights[24:36]]
-            weights[36:48] = [x*aw for x in weights[36:48]]
-            weights[48:] = [x*dw for x in weights[48:]]
+            # apply the USRCAT weights to the blocks of 12 moments
+            weights = np.repeat([ow, hw, rw, aw, dw], 12)
+            diff = np.abs(np.asarray(moments[0], dtype=np.float64) -
+                          np.asarray(moments[1], dtype=np.float64))
 
-            return  1.0 / (1.0 + sum(weights) / scale)
+            return  1.0 / (1.0 + float(np.dot(weights, diff)) / scale)
 
     @requires.rdkit
     def __mod__(self, other):
@@ -521,6 +536,10 @@ class Ligand(Base, PathMixin):
         limit : int, optional, default=25
             The number of hits that should be returned.
         target : {'ligands','chemcomps'}
+        local : bool, default=False
+            Search against the client-side USRCAT index of all ligands or
+            chemical component conformers (credoscript.support.usr) instead of
+            using the database.
 
         Returns
         -------
@@ -540,16 +559,27 @@ class Ligand(Base, PathMixin):
 
         """
         # do nothing if this ligand does not have any usr moments
-        if not self.usr_space or not self.usr_moments: return None
+        if self.usr_space is None or self.usr_moments is None: return None
 
         # do a USR search against the modelled conformers and return the top
         # ranked chemcomps
         if kwargs.get('target', 'ligands') == 'chemcomps':
+            if kwargs.pop('local', False):
+                return usr.chem_comp_index().fetch_all_by_usr_moments(*expr,
+                                                                      usr_moments=self.usr_moments,
+                                                                      **kwargs)
+
             return ChemCompAdaptor().fetch_all_by_usr_moments(*expr,
                                                               usr_space=self.usr_space,
                                                               usr_moments=self.usr_moments,
                                                               **kwargs)
 
+        # do a USR search against the in-memory index of all bound ligands
+        elif kwargs.pop('local', False):
+            return usr.ligand_index().fetch_all_by_usr_moments(*expr,
+                                                               usr_moments=self.usr_moments,
+                                                               **kwargs)
+
         # do a USR search against all bound ligands
         else:
             return LigandAdaptor().fetch_all_by_usr_moments(*expr,
@@ -571,3 +601,4 @@ from ..adaptors.atomringinteractionadaptor import AtomRingInteractionAdaptor
 from ..adaptors.ligandadaptor import LigandAdaptor
 from ..adaptors.protfragmentadaptor import ProtFragmentAdaptor
 from ..adaptors.siftadaptor import SIFtAdaptor
+from ..support import usr
@@ -5,7 +5,7 @@ from sqlalchemy.sql.expression import and_, func, or_
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.hybrid import hybrid_property
 
-from credoscript import Base, BaseQuery, schema, pi_groups, pi_residues
+from credoscript import Base, BaseQuery, config, schema, pi_groups, pi_residues
 from credoscript.mixins import PathMixin
 from credoscript.support.vector import Vector
 
@@ -121,14 +121,14 @@ class PiGroup(Base): #, PathMixin):
         """
         The centroid of the aromatic ring as Vector object.
         """
-        return Vector(self.centroid)
+        return Vector(self.centroid, copy=not config['extras'].get('numpy-casters'))
 
     @property
     def Normal(self):
         """
         The normal of the aromatic ring as Vector object.
         """
-        return Vector(self.normal)
+        return Vector(self.normal, copy=not config['extras'].get('numpy-casters'))
 
     @property
     def Atoms(self):
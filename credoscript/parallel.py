@@ -0,0 +1,258 @@
+"""
+This module contains functions to run (I/O-bound) adaptor calls in parallel on
+a pool of threads and to run map-reduce jobs over biomolecules (partitions) on
+a pool of processes. Every worker thread uses its own scoped Session, i.e. its
+own connection from the shared connection pool.
+
+Adaptors bind their query to the session of the thread that creates them, so
+they have to be created inside the mapped function:
+
+>>> from credoscript import parallel
+>>> from credoscript.adaptors import SIFtAdaptor
+>>> sifts = parallel.map(lambda ligand_id: SIFtAdaptor().fetch_by_ligand_id(ligand_id),
+                         ligand_ids, workers=8)
+"""
+import sys
+import threading
+import multiprocessing
+from itertools import islice
+from Queue import Queue
+
+from sqlalchemy.pool import QueuePool
+
+from credoscript import Session, engine
+
+def default_workers():
+    """
+    Returns the default number of worker threads, i.e. the size of the connection
+    pool.
+    """
+    if isinstance(engine.pool, QueuePool): return engine.pool.size()
+
+    return 4
+
+def _worker(fn, tasks, results):
+    """
+    Runs the tasks from the queue until it receives None. The scoped session of
+    this thread is rolled back after a failed task and removed at the end so that
+    the connection is returned to the pool.
+    """
+    try:
+        while True:
+            task = tasks.get()
+            if task is None: break
+
+            index, item = task
+
+            try:
+                results.put((index, True, fn(item)))
+            except Exception:
+                Session.rollback()
+                results.put((index, False, sys.exc_info()))
+    finally:
+        Session.remove()
+
+def imap(fn, items, workers=None, buffer=None):
+    """
+    Returns an iterator over the results of fn applied to every item, in the
+    same order as the items. The items are run on a pool of worker threads but
+    only a bounded number of items is in flight at any time. The first exception
+    raised by fn is re-raised in the calling thread after the pending items have
+    finished.
+
+    Parameters
+    ----------
+    fn : callable
+        Function that takes a single item, e.g. an identifier.
+    items : iterable
+        The items, can also be a generator.
+    workers : int, optional
+        Number of worker threads, defaults to the size of the connection pool.
+    buffer : int, optional
+        Maximum number of items in flight, defaults to twice the number of
+        workers.
+    """
+    workers = workers or default_workers()
+    buffer = buffer or 2 * workers
+
+    tasks, results = Queue(), Queue()
+    threads = [threading.Thread(target=_worker, args=(fn, tasks, results))
+               for i in range(workers)]
+
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    items = enumerate(items)
+    done, error, pending = {}, None, 0
+
+    try:
+        # fill the buffer
+        for task in islice(items, buffer):
+            tasks.put(task)
+            pending += 1
+
+        expected = 0
+
+        while pending:
+            index, success, value = results.get()
+            pending -= 1
+
+            if not success and error is None: error = value
+
+            done[index] = value
+
+            # submit a new item for every finished one unless something failed
+            if error is None:
+                for task in islice(items, 1):
+                    tasks.put(task)
+                    pending += 1
+
+            # yield the results in order as soon as they are available
+            while error is None and expected in done:
+                yield done.pop(expected)
+                expected += 1
+
+        if error is not None:
+            raise error[0], error[1], error[2]
+
+    finally:
+        for thread in threads: tasks.put(None)
+
+def map(fn, items, workers=None, buffer=None):
+    """
+    Returns the list of results of fn applied to every item, in the same order
+    as the items. Takes the same arguments as imap().
+
+    Examples
+    --------
+    >>> parallel.map(lambda ligand_id: SIFtAdaptor().fetch_by_ligand_id(ligand_id), [1,2,3])
+    """
+    return list(imap(fn, items, workers=workers, buffer=buffer))
+
+# the mapper and reducer of the current map_reduce() job in a worker process
+_job = None
+
+def _init_process(fn, reducer, arrays):
+    """
+    Initializes a worker process of map_reduce().
+    """
+    global _job
+    _job = fn, reducer, arrays
+
+def _run_chunk(biomolecule_ids):
+    """
+    Applies the mapper to every biomolecule of the chunk and returns the reduced
+    result of the chunk.
+    """
+    fn, reducer, arrays = _job
+    session, result = Session(), None
+
+    try:
+        for biomolecule_id in biomolecule_ids:
+            if arrays: value = fn(biomolecule_id, AtomAdaptor().fetch_atom_arrays(biomolecule_id))
+            else: value = fn(biomolecule_id, session)
+
+            result = value if result is None else reducer(result, value)
+
+    finally:
+        Session.remove()
+
+    return result
+
+def _chunks(sizes, count):
+    """
+    Splits the (biomolecule_id, size) tuples into the given number of chunks of
+    similar total size, largest chunks first.
+    """
+    chunks = [[0, []] for i in range(max(1, min(count, len(sizes))))]
+
+    # greedy: assign the largest remaining partition to the smallest chunk
+    for biomolecule_id, size in sorted(sizes, key=lambda s: s[1], reverse=True):
+        chunk = min(chunks, key=lambda c: c[0])
+        chunk[0] += size or 1
+        chunk[1].append(biomolecule_id)
+
+    return [ids for size, ids in sorted(chunks, reverse=True) if ids]
+
+def map_reduce(fn, reducer, *expr, **kwargs):
+    """
+    Applies fn to every biomolecule (partition of the atoms and contacts tables)
+    on a pool of processes and combines the results with reducer. The
+    biomolecules are scheduled in chunks that are balanced by their number of
+    atoms.
+
+    Parameters
+    ----------
+    fn : callable
+        Mapper fn(biomolecule_id, session) that should only query the partition
+        of this biomolecule, e.g. by filtering on Contact.biomolecule_id. With
+        arrays=True it is called as fn(biomolecule_id, atoms) with the atoms
+        from AtomAdaptor.fetch_atom_arrays() instead.
+    reducer : callable
+        Associative function reducer(a, b) that combines two results, e.g.
+        operator.add.
+    *expr : BinaryExpressions, optional
+        SQLAlchemy BinaryExpressions that will be used to filter the biomolecules.
+    biomolecule_ids : list, optional
+        Only process these biomolecules.
+    processes : int, optional
+        Number of worker processes, defaults to the number of cores.
+    arrays : bool, default=False
+        Pass the atoms of the biomolecule as columnar arrays to fn.
+    initial : optional
+        Initial value of the reduction, also returned if there are no
+        biomolecules.
+
+    Returns
+    -------
+    result
+        The reduced result of all biomolecules.
+
+    Examples
+    --------
+    >>> def count(biomolecule_id, session):
+    ...     query = session.query(Contact.structural_interaction_type_bm, func.count(Contact.contact_id))
+    ...     query = query.filter(Contact.biomolecule_id==biomolecule_id)
+    ...     return Counter(dict(query.group_by(Contact.structural_interaction_type_bm)))
+    >>> parallel.map_reduce(count, operator.add)
+    Counter({...})
+    """
+    processes = kwargs.get('processes') or multiprocessing.cpu_count()
+
+    query = Biomolecule.query.with_entities(Biomolecule.biomolecule_id, Biomolecule.num_atoms)
+    query = query.filter(*expr)
+
+    if kwargs.get('biomolecule_ids') is not None:
+        query = query.filter(Biomolecule.biomolecule_id.in_(kwargs['biomolecule_ids']))
+
+    # several chunks per process so that the processes finish at the same time
+    chunks = _chunks(query.all(), processes * 4)
+
+    # the worker processes must not inherit open connections of this process
+    Session.remove()
+    engine.dispose()
+
+    pool = multiprocessing.Pool(processes, initializer=_init_process,
+                                initargs=(fn, reducer, kwargs.get('arrays', False)))
+
+    result = kwargs.get('initial')
+
+    try:
+        for value in pool.imap_unordered(_run_chunk, chunks):
+            if value is not None:
+                result = value if result is None else reducer(result, value)
+
+        pool.close()
+
+    except:
+        pool.terminate()
+        raise
+
+    finally:
+        pool.join()
+
+    return result
+
+from .models.biomolecule import Biomolecule
+from .adaptors.atomadaptor import AtomAdaptor
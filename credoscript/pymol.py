@@ -275,7 +275,21 @@ def show_contacts(self, *expr, **kwargs):
     contacts = self.Contacts.filter(and_(*expr)).all()
 
     # also include bridged hbonds
-    if kwargs.get('water_bridges', False):
+    if kwargs.get('water_bridges', False) and isinstance(self, Ligand):
+
+        # all pairs of contacts of the proximal water within the maximum
+        # distance of 6.1 angstrom, found with a single query
+        water_atom_ids = [water.atom_id for water in self.ProximalWater.all()]
+        pairs = WaterBridgeAdaptor().fetch_all_contact_pairs_by_water_atom_ids(water_atom_ids,
+                                                                               self.biomolecule_id,
+                                                                               max_distance=6.1)
+        contact_ids = set(contact_id for pair in pairs for contact_id in pair)
+
+        if contact_ids:
+            contacts.extend(Contact.query.filter(and_(Contact.biomolecule_id==self.biomolecule_id,
+                                                      Contact.contact_id.in_(contact_ids))).all())
+
+    elif kwargs.get('water_bridges', False):
         for water in self.ProximalWater.all():
 
             # keep only those bridges that are within the maximum distance
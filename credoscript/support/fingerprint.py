@@ -0,0 +1,341 @@
+"""
+Client-side fingerprint similarity searching. The RDKit fingerprints of all
+chemical components (chem_comp_rdfps) are loaded once into packed uint64 bit
+arrays that are cached on disk per CREDO release, together with the number of
+bits set in every fingerprint. The rows are sorted by their popcount so that
+only the rows that can reach the similarity threshold are compared with the
+query.
+
+>>> from credoscript.support import fingerprint
+>>> index = fingerprint.chem_comp_index('circular')
+>>> index.fetch_all_by_sim('Cc1ccc(cc1Nc2nccc(n2)c3cccnc3)NC(=O)c4ccc(cc4)CN5CC[NH+](CC5)C')
+[(<ChemComp(STI)>, 1.0), (<ChemComp(MPZ)>, 0.64...), ...]
+"""
+import os
+import threading
+import multiprocessing
+
+import numpy as np
+
+try:
+    from rdkit.DataStructs import CreateFromBinaryText
+except ImportError:
+    pass
+
+from sqlalchemy.sql.expression import and_, func
+
+from credoscript import Session, config
+from credoscript.util import requires
+from credoscript.support.usr import _save, cache_directory, release
+
+# cartridge functions creating the query fingerprints, same as in
+# ChemCompAdaptor.fetch_all_by_sim()
+FINGERPRINTS = {'circular': lambda smi: func.rdkit.morganbv_fp(smi, 2),
+                'torsion': func.rdkit.torsionbv_fp,
+                'atompair': func.rdkit.atompairbv_fp,
+                'maccs': func.rdkit.maccs_fp,
+                'layered': func.rdkit.layered_fp,
+                'avalon': func.rdkit.avalon_fp}
+
+# number of bits set in every possible byte
+POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+def pack_bits(bits):
+    """
+    Returns the fingerprints given as boolean matrix of shape (n, nbits) as
+    packed uint64 matrix of shape (n, ceil(nbits / 64)).
+    """
+    bits = np.atleast_2d(np.asarray(bits, dtype=bool))
+    words = -(-bits.shape[1] // 64)
+
+    padded = np.zeros((bits.shape[0], words * 64), dtype=bool)
+    padded[:, :bits.shape[1]] = bits
+
+    return np.packbits(padded, axis=1).view(np.uint64)
+
+def popcount(words):
+    """
+    Returns the number of bits set in every row of a packed uint64 matrix.
+    """
+    words = np.ascontiguousarray(np.atleast_2d(words))
+
+    return POPCOUNT_TABLE[words.view(np.uint8)].sum(axis=1, dtype=np.int32)
+
+def _unpack(binary):
+    """
+    Returns the bits of a fingerprint serialised with bfp_to_binary_text().
+    """
+    fp = CreateFromBinaryText(str(binary))
+
+    return np.fromstring(fp.ToBitString(), dtype=np.uint8) - ord('0')
+
+class FingerprintIndex(object):
+    """
+    In-memory index of packed binary fingerprints.
+
+    Parameters
+    ----------
+    ids : numpy.ndarray
+        Identifiers of the fingerprints.
+    fps : numpy.ndarray
+        Packed uint64 fingerprints of shape (n, words).
+    """
+    def __init__(self, ids, fps):
+        counts = popcount(fps)
+
+        # sort by popcount to prune the rows that cannot reach the threshold
+        order = np.argsort(counts, kind='mergesort')
+
+        self.ids = ids[order]
+        self.fps = np.ascontiguousarray(fps[order])
+        self.counts = counts[order]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def similarity(self, query, metric='tanimoto', threshold=0.0):
+        """
+        Returns the row indices and the similarities of all rows that can reach
+        the threshold.
+
+        Parameters
+        ----------
+        query : numpy.ndarray
+            Packed uint64 query fingerprint.
+        metric : {'tanimoto','dice'}
+            Similarity metric.
+        threshold : float, default=0.0
+            Similarity threshold used to prune the rows by their popcount.
+        """
+        query = np.asarray(query, dtype=np.uint64).ravel()
+        count = int(popcount(query)[0])
+
+        # bounds of the popcount of the rows that can reach the threshold
+        if threshold > 0 and metric == 'tanimoto':
+            low, high = threshold * count, count / threshold
+        elif threshold > 0 and metric == 'dice':
+            low, high = threshold * count / (2 - threshold), count * (2 - threshold) / threshold
+        else:
+            low, high = 0, np.inf
+
+        start = np.searchsorted(self.counts, np.ceil(low - 1e-9), side='left')
+        end = np.searchsorted(self.counts, np.floor(high + 1e-9), side='right')
+
+        common = popcount(np.bitwise_and(self.fps[start:end], query))
+        counts = self.counts[start:end]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if metric == 'tanimoto':
+                sim = common / (counts + count - common).astype(np.float64)
+            elif metric == 'dice':
+                sim = 2.0 * common / (counts + count).astype(np.float64)
+            else:
+                raise ValueError("{0} is not a valid similarity metric.".format(metric))
+
+        return np.arange(start, end), np.nan_to_num(sim)
+
+    def mask(self, ids):
+        """
+        Returns the boolean mask of the rows of the index with the given
+        identifiers, e.g. to restrict a search with search(allowed=...).
+        """
+        return np.in1d(self.ids, np.asarray(list(ids), dtype=self.ids.dtype))
+
+    def search(self, query, threshold=0.5, limit=None, metric='tanimoto', allowed=None):
+        """
+        Returns the hits as list of (id, similarity) tuples in descending order
+        of similarity.
+
+        Parameters
+        ----------
+        query : numpy.ndarray
+            Packed uint64 query fingerprint.
+        threshold : float, default=0.5
+            Similarity threshold.
+        limit : int, optional
+            Maximum number of hits.
+        metric : {'tanimoto','dice'}
+            Similarity metric.
+        allowed : numpy.ndarray, optional
+            Boolean mask of the rows that can be hits, see mask(). The mask is
+            applied before the hits are limited.
+        """
+        rows, sim = self.similarity(query, metric=metric, threshold=threshold)
+
+        hits = np.flatnonzero(sim >= threshold)
+
+        if allowed is not None: hits = hits[allowed[rows[hits]]]
+
+        if limit and limit < len(hits):
+            hits = hits[np.argpartition(-sim[hits], limit-1)[:limit]]
+
+        hits = hits[np.argsort(-sim[hits], kind='mergesort')]
+
+        return [(self.ids[rows[i]], float(sim[i])) for i in hits]
+
+    def search_many(self, queries, processes=None, **kwargs):
+        """
+        Returns the hits of many query fingerprints, the queries are sharded
+        across a pool of processes. Takes the same keyword arguments as search().
+        """
+        queries = list(queries)
+        chunk = max(1, len(queries) // ((processes or multiprocessing.cpu_count()) * 4))
+
+        pool = multiprocessing.Pool(processes, initializer=_init_process,
+                                    initargs=(self, kwargs))
+
+        try:
+            hits = pool.map(_search, queries, chunksize=chunk)
+            pool.close()
+
+        except:
+            pool.terminate()
+            raise
+
+        finally:
+            pool.join()
+
+        return hits
+
+# the index and search arguments of the current search_many() in a worker process
+_job = None
+
+def _init_process(index, kwargs):
+    """
+    """
+    global _job
+    _job = index, kwargs
+
+def _search(query):
+    """
+    """
+    index, kwargs = _job
+
+    return index.search(query, **kwargs)
+
+class ChemCompFingerprintIndex(FingerprintIndex):
+    """
+    Fingerprint index of all chemical components.
+    """
+    def __init__(self, ids, fps, fp='circular'):
+        super(ChemCompFingerprintIndex, self).__init__(ids, fps)
+        self.fp = fp
+
+    @classmethod
+    def load(cls, fp='circular', directory=None, batch_size=10000):
+        """
+        Returns the index of the given fingerprint type of all chemical
+        components. The fingerprints are read from the cache files of the
+        current release if they exist and created otherwise.
+
+        Parameters
+        ----------
+        fp : {'circular','atompair','torsion','maccs','layered','avalon'}
+            RDKit fingerprint type.
+        directory : str, optional
+            Cache directory, see credoscript.support.usr.cache_directory().
+        batch_size : int, default=10000
+            Number of rows that are fetched at once.
+
+        Requires
+        --------
+        .. important:: `RDKit  <http://www.rdkit.org>`_ Python wrappers.
+        """
+        if not config['extras']['rdkit']:
+            raise ImportError("The RDKit Python wrappers are required to load the fingerprint index.")
+
+        if fp not in FINGERPRINTS:
+            raise ValueError("The fingerprint type [{0}] does not exist.".format(fp))
+
+        directory = directory or cache_directory()
+        prefix = os.path.join(directory, 'chem_comp_{0}_fp-{1}'.format(fp, release()))
+        paths = prefix + '.ids.npy', prefix + '.fps.npy'
+
+        if not all(os.path.exists(path) for path in paths):
+            column = getattr(ChemCompRDFP, '{0}_fp'.format(fp))
+
+            query = ChemCompRDFP.query.with_entities(ChemCompRDFP.het_id,
+                                                     func.rdkit.bfp_to_binary_text(column))
+            query = query.filter(column!=None).order_by(ChemCompRDFP.het_id)
+
+            ids, fps = [], []
+
+            result = query.session.connection().execution_options(stream_results=True).execute(query.statement)
+
+            try:
+                while True:
+                    rows = result.fetchmany(batch_size)
+                    if not rows: break
+
+                    ids.extend(row[0] for row in rows)
+                    fps.extend(pack_bits(_unpack(row[1]))[0] for row in rows)
+            finally:
+                result.close()
+
+            _save(paths[0], np.array(ids, dtype='S5'))
+            _save(paths[1], np.array(fps, dtype=np.uint64))
+
+        return cls(np.load(paths[0]), np.load(paths[1]), fp=fp)
+
+    @requires.rdkit
+    def query_fingerprint(self, smi):
+        """
+        Returns the packed fingerprint of a SMILES string, created by the
+        cartridge in exactly the same way as the fingerprints in the index.
+        """
+        binary = Session().query(func.rdkit.bfp_to_binary_text(FINGERPRINTS[self.fp](smi))).scalar()
+
+        return pack_bits(_unpack(binary))[0]
+
+    @requires.rdkit
+    def fetch_all_by_sim(self, smi, *expr, **kwargs):
+        """
+        Returns all chemical components whose fingerprints are similar to the
+        given SMILES string. Takes the same arguments as
+        ChemCompAdaptor.fetch_all_by_sim(), the fingerprint type is the one of
+        the index. The chemical components are filtered by the expressions
+        before the hits are limited.
+
+        Returns
+        -------
+        hits : list
+            List of tuples in the form (ChemComp, similarity).
+        """
+        allowed = None
+
+        if expr:
+            query = ChemComp.query.with_entities(ChemComp.het_id).filter(and_(*expr))
+            allowed = self.mask(str(het_id) for het_id, in query)
+
+        hits = self.search(self.query_fingerprint(smi),
+                           threshold=kwargs.get('threshold', 0.5),
+                           limit=kwargs.get('limit'),
+                           metric=kwargs.get('metric', 'tanimoto'),
+                           allowed=allowed)
+
+        if not hits: return []
+
+        similarity = dict((str(het_id), sim) for het_id, sim in hits)
+
+        query = ChemComp.query.filter(ChemComp.het_id.in_(similarity.keys()))
+
+        return sorted(((hit, similarity[hit.het_id]) for hit in query),
+                      key=lambda hit: hit[1], reverse=True)
+
+_indexes = {}
+_lock = threading.Lock()
+
+def chem_comp_index(fp='circular', directory=None):
+    """
+    Returns the fingerprint index of all chemical components for the given
+    fingerprint type, which is loaded only once per process. Raises ImportError
+    if RDKit is not available.
+    """
+    with _lock:
+        if fp not in _indexes:
+            _indexes[fp] = ChemCompFingerprintIndex.load(fp=fp, directory=directory)
+
+    return _indexes[fp]
+
+from ..models.chemcomp import ChemComp
+from ..models.chemcomprdfp import ChemCompRDFP
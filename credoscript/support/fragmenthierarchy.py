@@ -0,0 +1,255 @@
+"""
+In-memory RECAP fragment hierarchy. The parent-child edges of all fragments
+(fragment_hierarchies) are loaded once into a directed acyclic graph with CSR
+adjacency arrays. The transitive closure, i.e. the sorted descendants and
+ancestors of every fragment, is precomputed in the same layout so that the
+descendants, leaves and common ancestors of a fragment are array slices instead
+of recursive SQL queries.
+
+>>> from credoscript.support import fragmenthierarchy
+>>> dag = fragmenthierarchy.fragment_dag()
+>>> dag.descendants(1)
+array([  2,   3,  17, ...])
+>>> dag.fetch_all_leaves(1)
+[<Fragment(3)>, ...]
+"""
+import threading
+
+import numpy as np
+from sqlalchemy.sql.expression import and_, func
+
+def _csr(sources, targets, size):
+    """
+    Returns the (indptr, indices) arrays of the adjacency lists of the given
+    edges, the targets of every source are sorted and unique.
+    """
+    edges = np.unique(np.asarray(sources, dtype=np.int64) * size + np.asarray(targets, dtype=np.int64))
+    sources, targets = edges // size, edges % size
+
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(sources, minlength=size))
+
+    return indptr, targets
+
+class FragmentDAG(object):
+    """
+    Directed acyclic graph of the RECAP fragment hierarchy.
+
+    Parameters
+    ----------
+    parent_ids, child_ids : numpy.ndarray
+        Fragment identifiers of the parent-child edges.
+    direct : numpy.ndarray
+        Boolean mask of the edges that connect a child to its direct parents,
+        see FragmentAdaptor.fetch_all_parents().
+    fragment_ids : numpy.ndarray
+        Identifiers of the fragments.
+    is_terminal : numpy.ndarray
+        Boolean mask of the terminal fragments.
+    """
+    def __init__(self, parent_ids, child_ids, direct, fragment_ids, is_terminal):
+        self.ids = np.asarray(fragment_ids, dtype=np.int64)
+        order = np.argsort(self.ids)
+        self.ids = self.ids[order]
+        self.is_terminal = np.asarray(is_terminal, dtype=bool)[order]
+
+        parents = np.searchsorted(self.ids, parent_ids)
+        children = np.searchsorted(self.ids, child_ids)
+        direct = np.asarray(direct, dtype=bool)
+
+        n = len(self.ids)
+
+        self.children_indptr, self.children_indices = _csr(parents, children, n)
+        self.parents_indptr, self.parents_indices = _csr(children[direct], parents[direct], n)
+
+        self._closure()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _closure(self):
+        """
+        Computes the descendants of every fragment in reverse topological order
+        and the ancestors by transposing the descendants.
+        """
+        n = len(self.ids)
+        indptr, indices = self.children_indptr, self.children_indices
+
+        # Kahn's algorithm on the reversed edges: a fragment is processed after
+        # all its children
+        remaining = np.diff(indptr)
+        parents = [[] for i in xrange(n)]
+        for node in xrange(n):
+            for child in indices[indptr[node]:indptr[node+1]]: parents[child].append(node)
+
+        stack = list(np.flatnonzero(remaining == 0))
+        descendants = [None] * n
+
+        while stack:
+            node = stack.pop()
+
+            children = indices[indptr[node]:indptr[node+1]]
+            descendants[node] = np.unique(np.concatenate([children] + [descendants[child] for child in children]))
+
+            for parent in parents[node]:
+                remaining[parent] -= 1
+                if remaining[parent] == 0: stack.append(parent)
+
+        if any(desc is None for desc in descendants):
+            raise ValueError("The fragment hierarchy contains a cycle.")
+
+        self.descendants_indptr = np.zeros(n + 1, dtype=np.int64)
+        self.descendants_indptr[1:] = np.cumsum([len(desc) for desc in descendants])
+        self.descendants_indices = (np.concatenate(descendants).astype(np.int64)
+                                    if n else np.empty(0, dtype=np.int64))
+
+        sources = np.repeat(np.arange(n), np.diff(self.descendants_indptr))
+        self.ancestors_indptr, self.ancestors_indices = _csr(self.descendants_indices, sources, n)
+
+    def _row(self, fragment_id):
+        """
+        Returns the row of the fragment or None if it is not in the hierarchy.
+        """
+        row = np.searchsorted(self.ids, fragment_id)
+
+        if row < len(self.ids) and self.ids[row] == fragment_id: return row
+
+    def _slice(self, fragment_id, indptr, indices):
+        """
+        """
+        row = self._row(fragment_id)
+
+        if row is None: return np.empty(0, dtype=np.int64)
+
+        return indices[indptr[row]:indptr[row+1]]
+
+    def children(self, fragment_id):
+        """
+        Returns the sorted identifiers of the children of the fragment.
+        """
+        return self.ids[self._slice(fragment_id, self.children_indptr, self.children_indices)]
+
+    def parents(self, fragment_id):
+        """
+        Returns the sorted identifiers of the direct parents of the fragment.
+        """
+        return self.ids[self._slice(fragment_id, self.parents_indptr, self.parents_indices)]
+
+    def descendants(self, fragment_id):
+        """
+        Returns the sorted identifiers of all descendants of the fragment.
+        """
+        return self.ids[self._slice(fragment_id, self.descendants_indptr, self.descendants_indices)]
+
+    def leaves(self, fragment_id):
+        """
+        Returns the sorted identifiers of the terminal descendants of the
+        fragment.
+        """
+        rows = self._slice(fragment_id, self.descendants_indptr, self.descendants_indices)
+
+        return self.ids[rows[self.is_terminal[rows]]]
+
+    def ancestors(self, fragment_id):
+        """
+        Returns the sorted identifiers of all ancestors of the fragment.
+        """
+        return self.ids[self._slice(fragment_id, self.ancestors_indptr, self.ancestors_indices)]
+
+    def common_ancestors(self, fragment_ids):
+        """
+        Returns the sorted identifiers of the fragments that are ancestors of
+        all the given fragments.
+        """
+        common = None
+
+        for fragment_id in fragment_ids:
+            rows = self._slice(fragment_id, self.ancestors_indptr, self.ancestors_indices)
+            common = rows if common is None else np.intersect1d(common, rows, assume_unique=True)
+
+        if common is None: return np.empty(0, dtype=np.int64)
+
+        return self.ids[common]
+
+    def _fetch_all(self, fragment_ids, *expr):
+        """
+        """
+        if not len(fragment_ids): return []
+
+        query = Fragment.query.filter(and_(Fragment.fragment_id.in_(fragment_ids.tolist()), *expr))
+
+        return query.order_by(Fragment.fragment_id.asc()).all()
+
+    def fetch_all_children(self, fragment_id, *expr):
+        """
+        Returns all fragments that are derived from this fragment through RECAP,
+        see FragmentAdaptor.fetch_all_children().
+        """
+        return self._fetch_all(self.children(fragment_id), *expr)
+
+    def fetch_all_parents(self, fragment_id, *expr):
+        """
+        Returns the direct parents of the fragment, see
+        FragmentAdaptor.fetch_all_parents().
+        """
+        return self._fetch_all(self.parents(fragment_id), *expr)
+
+    def fetch_all_descendants(self, fragment_id, *expr):
+        """
+        Returns all the descending fragments of the fragment with the given
+        fragment_id, see FragmentAdaptor.fetch_all_descendants().
+        """
+        return self._fetch_all(self.descendants(fragment_id), *expr)
+
+    def fetch_all_leaves(self, fragment_id, *expr):
+        """
+        Returns only the terminal (leaf) fragments of the fragment with the
+        given fragment_id, see FragmentAdaptor.fetch_all_leaves().
+        """
+        return self._fetch_all(self.leaves(fragment_id), *expr)
+
+    @classmethod
+    def load(cls):
+        """
+        Returns the hierarchy of all fragments in FragmentHierarchy. An edge
+        connects a child to a direct parent if it has the highest order_child of
+        all edges of the child within the same chemical component.
+        """
+        query = FragmentHierarchy.query.with_entities(FragmentHierarchy.parent_id,
+                                                      FragmentHierarchy.child_id,
+                                                      FragmentHierarchy.het_id,
+                                                      FragmentHierarchy.order_child)
+        edges = query.filter(and_(FragmentHierarchy.parent_id!=None,
+                                  FragmentHierarchy.child_id!=None)).all()
+
+        # highest order of every child within a chemical component
+        query = FragmentHierarchy.query.with_entities(FragmentHierarchy.het_id,
+                                                      FragmentHierarchy.child_id,
+                                                      func.max(FragmentHierarchy.order_child))
+        query = query.group_by(FragmentHierarchy.het_id, FragmentHierarchy.child_id)
+        highest = dict(((het_id, child_id), order) for het_id, child_id, order in query)
+
+        fragments = Fragment.query.with_entities(Fragment.fragment_id, Fragment.is_terminal).all()
+
+        return cls([edge.parent_id for edge in edges],
+                   [edge.child_id for edge in edges],
+                   [edge.order_child == highest[edge.het_id, edge.child_id] for edge in edges],
+                   [fragment_id for fragment_id, is_terminal in fragments],
+                   [bool(is_terminal) for fragment_id, is_terminal in fragments])
+
+_dag = None
+_lock = threading.Lock()
+
+def fragment_dag():
+    """
+    Returns the fragment hierarchy, which is loaded only once per process.
+    """
+    global _dag
+
+    with _lock:
+        if _dag is None: _dag = FragmentDAG.load()
+
+    return _dag
+
+from ..models.fragment import Fragment
+from ..models.fragmenthierarchy import FragmentHierarchy
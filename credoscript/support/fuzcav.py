@@ -0,0 +1,315 @@
+"""
+Client-side FuzCav binding site similarity. The FuzCav fingerprints (counts of
+pharmacophoric feature triplets) of all binding sites are loaded once into a
+compact integer matrix that is cached on disk per CREDO release. All similarity
+metrics only depend on which counts are non-null, so the index also keeps the
+non-null counts as packed bitsets, which turns a search against all binding
+sites into a few vectorised bit operations instead of a full table scan with
+one function call per row.
+
+>>> from credoscript.support import fuzcav
+>>> index = fuzcav.ligand_index('calpha')
+>>> index.fetch_all_by_fuzcav(ligand_id=652, metric='simpson', limit=10)
+[(<Ligand(A 1001 STI)>, 1.0), ...]
+"""
+import os
+import threading
+
+import numpy as np
+from sqlalchemy.sql.expression import and_
+
+from credoscript.support.fingerprint import pack_bits, popcount
+from credoscript.support.usr import _save, cache_directory, release, top_hits
+
+# similarity metrics, same names as in LigandAdaptor.fetch_all_by_fuzcav()
+METRICS = ('fuzcavglobal', 'simpson', 'russell-rao', 'ochiai', 'kulcz')
+
+def coefficients(common, count_a, count_b, length, metric='fuzcavglobal'):
+    """
+    Returns the similarity coefficients computed from the number of non-null
+    counts the fingerprints have in common and the number of non-null counts of
+    each fingerprint. The arguments can be arrays of any shape that broadcast.
+
+    Parameters
+    ----------
+    common : numpy.ndarray
+        Number of counts that are non-null in both fingerprints.
+    count_a, count_b : numpy.ndarray
+        Number of non-null counts of the fingerprints.
+    length : int
+        Length of the fingerprints.
+    metric : {'fuzcavglobal','simpson','russell-rao','ochiai','kulcz'}
+        fuzcavglobal divides by the larger and simpson by the smaller number of
+        non-null counts, russell-rao by the fingerprint length; ochiai is the
+        geometric and kulcz the arithmetic mean of the two ratios.
+    """
+    common = np.asarray(common, dtype=np.float64)
+    count_a = np.asarray(count_a, dtype=np.float64)
+    count_b = np.asarray(count_b, dtype=np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if metric == 'fuzcavglobal': sim = common / np.maximum(count_a, count_b)
+        elif metric == 'simpson': sim = common / np.minimum(count_a, count_b)
+        elif metric == 'russell-rao': sim = common / float(length)
+        elif metric == 'ochiai': sim = common / np.sqrt(count_a * count_b)
+        elif metric == 'kulcz': sim = 0.5 * (common / count_a + common / count_b)
+        else: raise ValueError("unknown metric: {}".format(metric))
+
+    return np.nan_to_num(sim)
+
+class FuzCavIndex(object):
+    """
+    In-memory index of FuzCav fingerprints.
+
+    Parameters
+    ----------
+    ids : numpy.ndarray
+        Identifiers of the binding sites.
+    fps : numpy.ndarray
+        Integer matrix of the FuzCav counts, shape (n, length).
+    """
+    def __init__(self, ids, fps):
+        self.ids = ids
+        self.fps = fps
+        self.bits = pack_bits(np.asarray(fps) > 0)
+        self.counts = popcount(self.bits)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def length(self):
+        """
+        Length of the fingerprints.
+        """
+        return self.fps.shape[1]
+
+    def subset(self, ids):
+        """
+        Returns a new index containing only the given identifiers (in the order
+        of this index), e.g. the binding sites of a protein family for clustering.
+        """
+        mask = np.in1d(self.ids, np.asarray(list(ids), dtype=self.ids.dtype))
+
+        return self.__class__(self.ids[mask], np.asarray(self.fps[mask]))
+
+    def fingerprint(self, identifier):
+        """
+        Returns the FuzCav fingerprint of the given identifier or None.
+        """
+        row = np.flatnonzero(self.ids == identifier)
+
+        if len(row): return self.fps[row[0]]
+
+    def similarity(self, fp, metric='fuzcavglobal'):
+        """
+        Returns the similarities of all binding sites with the given FuzCav
+        fingerprint.
+        """
+        fp = np.asarray(fp)
+
+        if fp.shape != (self.length,):
+            raise ValueError("The FuzCav fingerprint must have {0} counts.".format(self.length))
+
+        query = pack_bits(fp > 0)
+        common = popcount(np.bitwise_and(self.bits, query))
+
+        return coefficients(common, popcount(query), self.counts, self.length, metric)
+
+    def search(self, fp, limit=100, threshold=0.16, metric='fuzcavglobal'):
+        """
+        Returns the top hits as list of (id, similarity) tuples in descending
+        order of similarity.
+
+        Parameters
+        ----------
+        fp : list
+            FuzCav fingerprint.
+        limit : int, default=100
+            The number of hits that should be returned, None for all hits.
+        threshold : float, default=0.16
+            The similarity of the hits must be above the threshold, like in
+            LigandAdaptor.fetch_all_by_fuzcav().
+        metric : {'fuzcavglobal','simpson','russell-rao','ochiai','kulcz'}
+            Similarity metric, see coefficients().
+        """
+        scores = self.similarity(fp, metric=metric)
+        rows = np.flatnonzero(scores > threshold)
+
+        return [(self.ids[i].item(), float(scores[i]))
+                for i in rows[top_hits(scores[rows], limit, threshold)]]
+
+    def all_vs_all(self, metric='fuzcavglobal', tile_size=1024):
+        """
+        Returns the all-vs-all FuzCav distances (1 - similarity) as condensed
+        distance matrix in the layout of scipy.spatial.distance.pdist(), e.g. for
+        hierarchical clustering of binding sites. The numbers of common non-null
+        counts are computed in tiles as products of 0/1 matrices.
+
+        Parameters
+        ----------
+        metric : {'fuzcavglobal','simpson','russell-rao','ochiai','kulcz'}
+            Similarity metric, see coefficients().
+        tile_size : int, default=1024
+            Number of rows and columns of a tile, bounds the memory.
+
+        Returns
+        -------
+        distances : numpy.ndarray
+            Float32 array of length n * (n - 1) / 2.
+
+        Examples
+        --------
+        >>> index = fuzcav.ligand_index().subset(ligand_ids)
+        >>> linkage(index.all_vs_all(metric='simpson'), method='average')
+        """
+        n = len(self.ids)
+        condensed = np.empty(n * (n - 1) // 2, dtype=np.float32)
+
+        tiles = [(start, min(start+tile_size, n)) for start in xrange(0, n, tile_size)]
+        present = lambda r0, r1: (np.asarray(self.fps[r0:r1]) > 0).astype(np.float32)
+
+        for i, (r0, r1) in enumerate(tiles):
+            rows = present(r0, r1)
+
+            for c0, c1 in tiles[i:]:
+                common = np.dot(rows, present(c0, c1).T)
+                sim = coefficients(common, self.counts[r0:r1,None], self.counts[None,c0:c1],
+                                   self.length, metric)
+
+                for j in xrange(r0, r1):
+                    # only the upper triangle k > j is stored
+                    k0 = max(c0, j + 1)
+                    if k0 >= c1: continue
+
+                    offset = n * j - j * (j + 1) // 2 - j - 1
+                    condensed[offset+k0:offset+c1] = 1.0 - sim[j-r0, k0-c0:]
+
+        return condensed
+
+    @classmethod
+    def load(cls, name, query, directory=None, batch_size=50000, dtype=np.int64):
+        """
+        Returns the index of the (id, fp) rows of the query. The arrays are read
+        from the cache files of the current release if they exist and created
+        otherwise.
+
+        Parameters
+        ----------
+        name : str
+            Name of the index, used for the cache file names.
+        query : Query
+            Query returning the identifiers and the FuzCav fingerprints.
+        directory : str, optional
+            Cache directory, see credoscript.support.usr.cache_directory().
+        batch_size : int, default=50000
+            Number of rows that are fetched at once.
+        dtype : numpy.dtype, default=numpy.int64
+            Data type of the identifiers.
+        """
+        directory = directory or cache_directory()
+        prefix = os.path.join(directory, '{0}-{1}'.format(name, release()))
+        paths = prefix + '.ids.npy', prefix + '.fps.npy'
+
+        if not all(os.path.exists(path) for path in paths):
+            ids, fps = [], []
+
+            result = query.session.connection().execution_options(stream_results=True).execute(query.statement)
+
+            try:
+                while True:
+                    rows = result.fetchmany(batch_size)
+                    if not rows: break
+
+                    rows = [row for row in rows if row[1] is not None]
+                    ids.extend(row[0] for row in rows)
+                    fps.extend(row[1] for row in rows)
+            finally:
+                result.close()
+
+            fps = np.array(fps, dtype=np.int32)
+
+            # the counts are small, use the smallest type that can hold them
+            if fps.size and fps.max() < np.iinfo(np.int16).max: fps = fps.astype(np.int16)
+
+            _save(paths[0], np.array(ids, dtype=dtype))
+            _save(paths[1], fps)
+
+        return cls(np.load(paths[0]), np.load(paths[1], mmap_mode='r'))
+
+class LigandFuzCavIndex(FuzCavIndex):
+    """
+    FuzCav index of the binding sites of all CREDO ligands.
+    """
+    @classmethod
+    def load(cls, fptype='calpha', directory=None, batch_size=50000):
+        """
+        Returns the index of the given FuzCav fingerprint type of all binding
+        sites in BindingSiteFuzcav.
+
+        Parameters
+        ----------
+        fptype : {'calpha','rep'}
+            FuzCav fingerprint type, see LigandAdaptor.fetch_all_by_fuzcav().
+        """
+        if fptype == "calpha": targetfp = BindingSiteFuzcav.calphafp
+        elif fptype == "rep": targetfp = BindingSiteFuzcav.repfp
+        else: raise ValueError("{} is not a valid fingerprint type.".format(fptype))
+
+        query = BindingSiteFuzcav.query.with_entities(BindingSiteFuzcav.ligand_id, targetfp)
+        query = query.order_by(BindingSiteFuzcav.ligand_id)
+
+        return super(LigandFuzCavIndex, cls).load('binding_site_fuzcav_{0}'.format(fptype),
+                                                  query, directory=directory,
+                                                  batch_size=batch_size)
+
+    def fetch_all_by_fuzcav(self, *expr, **kwargs):
+        """
+        Performs a FuzCav search against the binding sites of all ligands. Takes
+        the same arguments as LigandAdaptor.fetch_all_by_fuzcav() except fptype,
+        which is the one of the index.
+
+        Returns
+        -------
+        hits : list
+            List of tuples in the form (Ligand, FuzCav similarity).
+        """
+        fp = kwargs.get('fp')
+
+        # use the fingerprint of a CREDO ligand
+        if kwargs.get('ligand_id'):
+            fp = self.fingerprint(kwargs['ligand_id'])
+
+            if fp is None:
+                raise ValueError('Ligand with ligand_id {} has no FuzCav fingerprint.'
+                                 .format(kwargs['ligand_id']))
+
+        hits = self.search(fp, limit=kwargs.get('limit', 100),
+                           threshold=kwargs.get('threshold', 0.16),
+                           metric=kwargs.get('metric', 'fuzcavglobal'))
+
+        if not hits: return []
+
+        similarity = dict(hits)
+
+        query = Ligand.query.filter(and_(Ligand.ligand_id.in_(similarity.keys()), *expr))
+
+        return sorted(((hit, similarity[hit.ligand_id]) for hit in query),
+                      key=lambda hit: hit[1], reverse=True)
+
+_indexes = {}
+_lock = threading.Lock()
+
+def ligand_index(fptype='calpha', directory=None):
+    """
+    Returns the FuzCav index of all ligands for the given fingerprint type,
+    which is loaded only once per process.
+    """
+    with _lock:
+        if fptype not in _indexes:
+            _indexes[fptype] = LigandFuzCavIndex.load(fptype=fptype, directory=directory)
+
+    return _indexes[fptype]
+
+from ..models.bindingsite import BindingSiteFuzcav
+from ..models.ligand import Ligand
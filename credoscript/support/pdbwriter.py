@@ -0,0 +1,130 @@
+"""
+Streaming export of CREDO biomolecules in PDB or mmCIF format. The atoms are
+fetched together with their residue and chain information in a single ordered
+query through a server-side cursor and written record by record, i.e. without
+creating ORM objects or triggering lazy loads.
+"""
+from sqlalchemy.sql.expression import and_
+
+from credoscript import Session
+
+PDB_ATOM_RECORD = "{:6s}{:5d} {:4s}{:1s}{:3s} {:1s}{:4d}{:1s}   {:8.3f}{:8.3f}{:8.3f}{:6.2f}{:6.2f}          {:>2s}  \n"
+
+MMCIF_ATOM_SITE = ('group_PDB', 'id', 'type_symbol', 'label_atom_id', 'label_alt_id',
+                   'label_comp_id', 'label_asym_id', 'auth_seq_id', 'pdbx_PDB_ins_code',
+                   'Cartn_x', 'Cartn_y', 'Cartn_z', 'occupancy', 'B_iso_or_equiv',
+                   'pdbx_PDB_model_num')
+
+def pdb_line(group_pdb, atom_serial, atom_name, alt_loc, res_name, chain_id,
+             res_num, ins_code, coords, occupancy, b_factor, element):
+    """
+    Returns a formatted PDB ATOM/HETATM record.
+    """
+    if len(atom_name) < 4 and not atom_name.startswith('H'):
+        atom_name = " %s" % atom_name
+
+    return PDB_ATOM_RECORD.format(group_pdb, atom_serial, atom_name, alt_loc,
+                                  res_name, chain_id, res_num, ins_code,
+                                  coords[0], coords[1], coords[2],
+                                  occupancy, b_factor, element)
+
+def mmcif_line(group_pdb, atom_serial, atom_name, alt_loc, res_name, chain_id,
+               res_num, ins_code, coords, occupancy, b_factor, element):
+    """
+    Returns a formatted row of the mmCIF _atom_site loop.
+    """
+    # atom names with primes have to be quoted
+    if "'" in atom_name: atom_name = '"%s"' % atom_name
+
+    return "{} {} {} {} {} {} {} {} {} {:.3f} {:.3f} {:.3f} {:.2f} {:.2f} 1\n".format(
+           group_pdb, atom_serial, element, atom_name, (alt_loc or '').strip() or '.',
+           res_name, chain_id, res_num, (ins_code or '').strip() or '?',
+           coords[0], coords[1], coords[2], occupancy, b_factor)
+
+def iter_atom_records(biomolecule_id, *expr, **kwargs):
+    """
+    Returns an iterator over the atom records of the biomolecule in the form
+    (group_pdb, atom_serial, atom_name, alt_loc, res_name, chain_id, res_num,
+    ins_code, coords, occupancy, b_factor, element), ordered by atom serial.
+
+    Parameters
+    ----------
+    biomolecule_id : int
+        Primary key of the biomolecule.
+    *expr : BinaryExpressions, optional
+        SQLAlchemy BinaryExpressions that will be used to filter the query.
+    batch_size : int, default=10000
+        Number of rows that are fetched from the server-side cursor at once.
+
+    Queried Entities
+    ----------------
+    Atom, Residue, Chain
+    """
+    session = Session()
+
+    query = session.query(Atom.group_pdb, Atom.atom_serial, Atom.atom_name,
+                          Atom.alt_loc, Residue.res_name, Chain.pdb_chain_id,
+                          Residue.res_num, Residue.ins_code, Atom.coords,
+                          Atom.occupancy, Atom.b_factor, Atom.element)
+
+    query = query.join(Residue, and_(Residue.residue_id==Atom.residue_id,
+                                     Residue.biomolecule_id==Atom.biomolecule_id))
+    query = query.join(Chain, Chain.chain_id==Residue.chain_id)
+
+    # the atoms and residues tables are partitioned by biomolecule_id
+    query = query.filter(and_(Atom.biomolecule_id==biomolecule_id,
+                              Residue.biomolecule_id==biomolecule_id, *expr))
+    query = query.order_by(Atom.atom_serial)
+
+    # use a named (server-side) cursor to keep the memory footprint constant
+    query = query.execution_options(stream_results=True)
+
+    return query.yield_per(kwargs.get('batch_size', 10000))
+
+def write_pdb(biomolecule_id, fh, *expr, **kwargs):
+    """
+    Writes the atoms of the biomolecule in PDB format to the given file-like
+    object, e.g. an open file or socket.makefile(). Takes the same arguments as
+    iter_atom_records().
+
+    Returns
+    -------
+    count : int
+        Number of atom records that were written.
+    """
+    count = 0
+
+    for count, row in enumerate(iter_atom_records(biomolecule_id, *expr, **kwargs), 1):
+        fh.write(pdb_line(*row))
+
+    fh.write("END   \n")
+
+    return count
+
+def write_mmcif(biomolecule_id, fh, *expr, **kwargs):
+    """
+    Writes the atoms of the biomolecule as mmCIF _atom_site loop to the given
+    file-like object. Takes the same arguments as iter_atom_records() and the
+    optional keyword argument `name` that is used as data block name.
+
+    Returns
+    -------
+    count : int
+        Number of atom records that were written.
+    """
+    fh.write("data_{}\n#\nloop_\n".format(kwargs.get('name', biomolecule_id)))
+
+    for item in MMCIF_ATOM_SITE: fh.write("_atom_site.{}\n".format(item))
+
+    count = 0
+
+    for count, row in enumerate(iter_atom_records(biomolecule_id, *expr, **kwargs), 1):
+        fh.write(mmcif_line(*row))
+
+    fh.write("#\n")
+
+    return count
+
+from ..models.atom import Atom
+from ..models.residue import Residue
+from ..models.chain import Chain
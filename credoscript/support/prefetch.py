@@ -0,0 +1,104 @@
+"""
+Read-only, in-memory copies of CREDO entities that are used to hand out object
+graphs that were loaded with a fixed number of set-based queries. Traversing a
+prefetched graph never hits the database again.
+"""
+from collections import defaultdict
+
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.orm.properties import ColumnProperty
+
+class PrefetchedEntity(object):
+    """
+    Read-only snapshot of a mapped CREDO entity. The loaded (non-deferred) column
+    attributes of the entity are copied and the prefetched relationships are
+    attached under the same attribute names as in the models, to-many
+    relationships as tuples. Plain properties of the model (e.g. `path`) and its
+    __repr__ keep working.
+    """
+    def __init__(self, entity):
+        model = entity.__class__
+        attrs = self.__dict__
+
+        attrs['__model__'] = model
+
+        for prop in class_mapper(model).iterate_properties:
+            if isinstance(prop, ColumnProperty) and not prop.deferred:
+                attrs[prop.key] = getattr(entity, prop.key)
+
+    def __getattr__(self, name):
+        """
+        Falls back on the plain properties of the model class.
+        """
+        for cls in self.__model__.__mro__:
+            if name in cls.__dict__:
+                attr = cls.__dict__[name]
+                if isinstance(attr, property): return attr.fget(self)
+                break
+
+        raise AttributeError("prefetched {0} has no attribute '{1}'"
+                             .format(self.__model__.__name__, name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("prefetched {0} objects are read-only"
+                             .format(self.__model__.__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError("prefetched {0} objects are read-only"
+                             .format(self.__model__.__name__))
+
+    def __repr__(self):
+        """
+        """
+        try:
+            return self.__model__.__repr__.im_func(self)
+        except AttributeError:
+            return '<Prefetched{0}>'.format(self.__model__.__name__)
+
+    def _attach(self, name, value):
+        """
+        Internal method used to set a relationship while the graph is built.
+        """
+        self.__dict__[name] = value
+
+
+def freeze(entities, key):
+    """
+    Returns the read-only copies of the given entities in a dictionary keyed by
+    the given attribute (usually the primary key).
+    """
+    return dict((getattr(entity, key), PrefetchedEntity(entity)) for entity in entities)
+
+
+def attach_many(parents, children, fk, name, backref=None):
+    """
+    Attaches the children to their parents as tuple under the given relationship
+    name. The parents are looked up through the foreign key attribute of the
+    children, the optional backref is set on every child.
+    """
+    groups = defaultdict(list)
+
+    for child in children:
+        parent = parents.get(getattr(child, fk))
+
+        if parent is not None:
+            groups[getattr(child, fk)].append(child)
+            if backref: child._attach(backref, parent)
+
+    for key, parent in parents.items():
+        parent._attach(name, tuple(groups.get(key, ())))
+
+
+def attach_one(parents, children, fk, name, backref=None):
+    """
+    Attaches at most one child to every parent under the given relationship
+    name, parents without a child get None.
+    """
+    for parent in parents.values(): parent._attach(name, None)
+
+    for child in children:
+        parent = parents.get(getattr(child, fk))
+
+        if parent is not None:
+            parent._attach(name, child)
+            if backref: child._attach(backref, parent)
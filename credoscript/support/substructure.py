@@ -0,0 +1,353 @@
+"""
+Client-side substructure screening. The RDKit molecules of all chemical
+components (chem_comp_rdmols) and fragments (fragment_rdmols) are loaded once as
+pickles that are cached on disk per CREDO release, together with their RDKit
+pattern fingerprints. A substructure query is first screened against the
+pattern fingerprints and only the remaining candidates are matched with
+HasSubstructMatch() on a pool of processes, so that many concurrent screens do
+not compete for a few database backends.
+
+>>> from credoscript.support import substructure
+>>> index = substructure.chem_comp_index()
+>>> index.fetch_all_by_substruct('c1cc(cnc1)c2ccncn2')
+[<ChemComp(AK8)>, <ChemComp(BZ9)>, <ChemComp(K11)>, <ChemComp(L1E)>, ...]
+"""
+import os
+import threading
+import multiprocessing
+
+import numpy as np
+
+try:
+    from rdkit.Chem import Mol, MolFromSmarts, MolFromSmiles
+    from rdkit.Chem.rdmolops import PatternFingerprint
+except ImportError:
+    pass
+
+from sqlalchemy.sql.expression import and_
+
+from credoscript import config
+from credoscript.util import requires
+from credoscript.support.fingerprint import pack_bits
+from credoscript.support.usr import _save, cache_directory, release
+
+# number of bits of the pattern fingerprints used for screening
+PATTERN_FP_SIZE = 2048
+
+def pattern_fingerprint(mol):
+    """
+    Returns the packed pattern fingerprint of an RDKit molecule.
+    """
+    fp = PatternFingerprint(mol, fpSize=PATTERN_FP_SIZE)
+
+    return pack_bits(np.fromstring(fp.ToBitString(), dtype=np.uint8) - ord('0'))[0]
+
+class SubstructureIndex(object):
+    """
+    In-memory index of pickled RDKit molecules and their pattern fingerprints.
+
+    Parameters
+    ----------
+    ids : numpy.ndarray
+        Identifiers of the molecules.
+    mols : numpy.ndarray
+        Concatenated RDKit pickles of all molecules as uint8 array, can be
+        memory-mapped.
+    offsets : numpy.ndarray
+        Start of every pickle in mols, has one more element than ids.
+    patterns : numpy.ndarray
+        Packed uint64 pattern fingerprints of shape (n, words).
+    """
+    def __init__(self, ids, mols, offsets, patterns):
+        self.ids = ids
+        self.mols = mols
+        self.offsets = offsets
+        self.patterns = patterns
+
+    def __len__(self):
+        return len(self.ids)
+
+    def mol(self, row):
+        """
+        Returns the RDKit molecule of the given row.
+        """
+        return Mol(self.mols[self.offsets[row]:self.offsets[row+1]].tostring())
+
+    @classmethod
+    def load(cls, name, query, directory=None, batch_size=10000, dtype=np.int64):
+        """
+        Returns the index of the (id, rdmol) rows of the query. The arrays are
+        read from the cache files of the current release if they exist and
+        created otherwise.
+
+        Parameters
+        ----------
+        name : str
+            Name of the index, used for the cache file names.
+        query : Query
+            Query returning the identifiers and the RDMol column.
+        directory : str, optional
+            Cache directory, see credoscript.support.usr.cache_directory().
+        batch_size : int, default=10000
+            Number of rows that are fetched at once.
+        dtype : numpy.dtype, default=numpy.int64
+            Data type of the identifiers.
+
+        Requires
+        --------
+        .. important:: `RDKit  <http://www.rdkit.org>`_ Python wrappers.
+        """
+        if not config['extras']['rdkit']:
+            raise ImportError("The RDKit Python wrappers are required to load the substructure index.")
+
+        directory = directory or cache_directory()
+        prefix = os.path.join(directory, '{0}-{1}'.format(name, release()))
+        paths = [prefix + suffix for suffix in ('.ids.npy', '.mols.npy', '.offsets.npy', '.patterns.npy')]
+
+        if not all(os.path.exists(path) for path in paths):
+            ids, pkls, patterns = [], [], []
+
+            result = query.session.connection().execution_options(stream_results=True).execute(query.statement)
+
+            try:
+                while True:
+                    rows = result.fetchmany(batch_size)
+                    if not rows: break
+
+                    for identifier, rdmol in rows:
+                        if rdmol is None: continue
+
+                        ids.append(identifier)
+                        pkls.append(rdmol.pkl)
+                        patterns.append(pattern_fingerprint(rdmol.mol))
+            finally:
+                result.close()
+
+            offsets = np.zeros(len(pkls) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(pkl) for pkl in pkls])
+
+            _save(paths[0], np.array(ids, dtype=dtype))
+            _save(paths[1], np.fromstring(''.join(pkls), dtype=np.uint8))
+            _save(paths[2], offsets)
+            _save(paths[3], np.array(patterns, dtype=np.uint64).reshape(len(pkls), -1))
+
+        return cls(np.load(paths[0]), np.load(paths[1], mmap_mode='r'),
+                   np.load(paths[2]), np.load(paths[3]))
+
+    def candidates(self, query):
+        """
+        Returns the rows whose pattern fingerprints contain all the bits of the
+        pattern fingerprint of the query molecule, i.e. the only rows that can
+        contain the query as substructure.
+        """
+        pattern = pattern_fingerprint(query)
+
+        return np.flatnonzero((np.bitwise_and(self.patterns, pattern) == pattern).all(axis=1))
+
+    def match(self, query, rows, processes=None):
+        """
+        Returns the rows whose molecules contain the query molecule.
+
+        Parameters
+        ----------
+        query : rdkit.Chem.Mol
+            Query molecule, created from SMILES or SMARTS.
+        rows : numpy.ndarray
+            Rows that will be matched.
+        processes : int, optional
+            Number of worker processes, defaults to the number of cores. 1
+            matches the molecules in this process.
+        """
+        rows = np.asarray(rows)
+
+        if processes == 1 or len(rows) < 2:
+            return rows[[self.mol(row).HasSubstructMatch(query) for row in rows]]
+
+        processes = processes or multiprocessing.cpu_count()
+        chunks = [chunk for chunk in np.array_split(rows, processes * 4) if len(chunk)]
+
+        # the workers inherit the index and the query, only the rows are sent
+        pool = multiprocessing.Pool(processes, initializer=_init_process,
+                                    initargs=(self, query))
+
+        try:
+            hits = pool.map(_match, chunks)
+            pool.close()
+
+        except:
+            pool.terminate()
+            raise
+
+        finally:
+            pool.join()
+
+        return np.concatenate(hits)
+
+    @requires.rdkit
+    def search(self, smi, processes=None):
+        """
+        Returns the sorted identifiers of all molecules that contain the given
+        SMILES substructure.
+        """
+        query = MolFromSmiles(str(smi))
+        if query is None: raise ValueError("Cannot parse SMILES [{0}].".format(smi))
+
+        return np.sort(self.ids[self.match(query, self.candidates(query), processes)])
+
+    @requires.rdkit
+    def search_smarts(self, smarts, processes=None):
+        """
+        Returns the sorted identifiers of all molecules that match the given
+        SMARTS pattern. SMARTS queries are not screened with the pattern
+        fingerprints since their query atoms and bonds are not guaranteed to set
+        the same bits as the molecules that match them.
+        """
+        query = MolFromSmarts(str(smarts))
+        if query is None: raise ValueError("Cannot parse SMARTS [{0}].".format(smarts))
+
+        return np.sort(self.ids[self.match(query, np.arange(len(self.ids)), processes)])
+
+# the index and the query molecule of the current match() in a worker process
+_job = None
+
+def _init_process(index, query):
+    """
+    """
+    global _job
+    _job = index, query
+
+def _match(rows):
+    """
+    """
+    index, query = _job
+
+    return rows[[index.mol(row).HasSubstructMatch(query) for row in rows]]
+
+class ChemCompSubstructureIndex(SubstructureIndex):
+    """
+    Substructure index of all chemical components.
+    """
+    @classmethod
+    def load(cls, directory=None, batch_size=10000):
+        """
+        Returns the index of all chemical components, see SubstructureIndex.load().
+
+        Requires
+        --------
+        .. important:: `RDKit  <http://www.rdkit.org>`_ Python wrappers.
+        """
+        query = ChemCompRDMol.query.with_entities(ChemCompRDMol.het_id, ChemCompRDMol.rdmol)
+
+        return super(ChemCompSubstructureIndex, cls).load('chem_comp_rdmols', query,
+                                                          directory=directory,
+                                                          batch_size=batch_size,
+                                                          dtype='S5')
+
+    def _fetch_all(self, het_ids, *expr):
+        """
+        """
+        if not len(het_ids): return []
+
+        query = ChemComp.query.filter(and_(ChemComp.het_id.in_([str(het_id) for het_id in het_ids]),
+                                           *expr))
+
+        return query.order_by(ChemComp.het_id.asc()).all()
+
+    def fetch_all_by_substruct(self, smi, *expr, **kwargs):
+        """
+        Returns all chemical components that have the given SMILES substructure,
+        in the same order as ChemCompAdaptor.fetch_all_by_substruct().
+
+        Parameters
+        ----------
+        smi : str
+            SMILES string of the substructure.
+        *expr : BinaryExpressions, optional
+            SQLAlchemy BinaryExpressions that will be used to filter the query.
+        processes : int, optional
+            Number of worker processes.
+        """
+        return self._fetch_all(self.search(smi, processes=kwargs.get('processes')), *expr)
+
+    def fetch_all_by_smarts(self, smarts, *expr, **kwargs):
+        """
+        Returns all chemical components that match the given SMARTS pattern, in
+        the same order as ChemCompAdaptor.fetch_all_by_smarts(). Takes the same
+        arguments as fetch_all_by_substruct().
+        """
+        return self._fetch_all(self.search_smarts(smarts, processes=kwargs.get('processes')), *expr)
+
+class FragmentSubstructureIndex(SubstructureIndex):
+    """
+    Substructure index of all fragments.
+    """
+    @classmethod
+    def load(cls, directory=None, batch_size=10000):
+        """
+        Returns the index of all fragments, see SubstructureIndex.load().
+
+        Requires
+        --------
+        .. important:: `RDKit  <http://www.rdkit.org>`_ Python wrappers.
+        """
+        query = FragmentRDMol.query.with_entities(FragmentRDMol.fragment_id, FragmentRDMol.rdmol)
+
+        return super(FragmentSubstructureIndex, cls).load('fragment_rdmols', query,
+                                                          directory=directory,
+                                                          batch_size=batch_size)
+
+    def _fetch_all(self, fragment_ids, *expr):
+        """
+        """
+        if not len(fragment_ids): return []
+
+        query = Fragment.query.filter(and_(Fragment.fragment_id.in_(fragment_ids.tolist()),
+                                           *expr))
+
+        return query.order_by(Fragment.fragment_id.asc()).all()
+
+    def fetch_all_by_substruct(self, smi, *expr, **kwargs):
+        """
+        Returns all fragments that have the given SMILES substructure. Takes the
+        same arguments as ChemCompSubstructureIndex.fetch_all_by_substruct().
+        """
+        return self._fetch_all(self.search(smi, processes=kwargs.get('processes')), *expr)
+
+    def fetch_all_by_smarts(self, smarts, *expr, **kwargs):
+        """
+        Returns all fragments that match the given SMARTS pattern. Takes the same
+        arguments as ChemCompSubstructureIndex.fetch_all_by_substruct().
+        """
+        return self._fetch_all(self.search_smarts(smarts, processes=kwargs.get('processes')), *expr)
+
+_indexes = {}
+_lock = threading.Lock()
+
+def _index(cls, directory):
+    """
+    Returns the cached index of the class, an index is only cached once it has
+    been loaded successfully.
+    """
+    with _lock:
+        if cls not in _indexes: _indexes[cls] = cls.load(directory=directory)
+
+    return _indexes[cls]
+
+def chem_comp_index(directory=None):
+    """
+    Returns the substructure index of all chemical components, which is loaded
+    only once per process. Raises ImportError if RDKit is not available.
+    """
+    return _index(ChemCompSubstructureIndex, directory)
+
+def fragment_index(directory=None):
+    """
+    Returns the substructure index of all fragments, which is loaded only once
+    per process. Raises ImportError if RDKit is not available.
+    """
+    return _index(FragmentSubstructureIndex, directory)
+
+from ..models.chemcomp import ChemComp
+from ..models.chemcomprdmol import ChemCompRDMol
+from ..models.fragment import Fragment
+from ..models.fragment_rdkit import FragmentRDMol
@@ -0,0 +1,809 @@
+"""
+Client-side Ultrafast Shape Recognition with CREDO Atom Types (USRCAT). The USR
+moments of all ligands are loaded once into a float32 matrix that is cached on
+disk per CREDO release and memory-mapped, so that a shape search against all
+ligands is a single vectorised NumPy operation instead of a database round trip
+with a cube prefilter. The same is done for the conformers of all chemical
+components, whose scores are reduced to the best conformer per component. The
+similarity is the same as in Ligand.__or__ and the arrayxd_usrcatsim() database
+function. The descriptors can also be computed from coordinates, e.g. to search
+with docked poses.
+
+>>> from credoscript.support import usr
+>>> index = usr.ligand_index()
+>>> index.fetch_all_by_usr_moments(usr_moments=ligand.usr_moments, limit=10)
+[(<Ligand(A 233 STI)>, 1.0), ...]
+"""
+import os
+import threading
+import multiprocessing
+
+import numpy as np
+from sqlalchemy.sql.expression import and_
+
+from credoscript import __version__, config
+
+# number of USRCAT moments: 12 for each of the five atom type distributions
+NUM_MOMENTS = 60
+
+# number of rows that are scored at once to bound the temporary memory
+BLOCK_SIZE = 65536
+
+def usrcat_weights(ow=1.0, hw=0.25, rw=0.25, aw=0.25, dw=0.25):
+    """
+    Returns the vector of the 60 normalised USRCAT weights, i.e. the weight of
+    each block of 12 moments divided by the scale 12 * (ow+hw+rw+aw+dw).
+    """
+    scale = 12 * (ow+hw+rw+aw+dw)
+
+    return (np.repeat([ow, hw, rw, aw, dw], 12) / scale).astype(np.float32)
+
+def usrcat_similarity(moments, query, weights):
+    """
+    Returns the USRCAT similarities between the rows of the moments matrix and
+    the query moments.
+    """
+    scores = np.empty(len(moments), dtype=np.float32)
+
+    for start in xrange(0, len(moments), BLOCK_SIZE):
+        block = moments[start:start+BLOCK_SIZE]
+        scores[start:start+BLOCK_SIZE] = np.dot(np.abs(block - query), weights)
+
+    return 1.0 / (1.0 + scores)
+
+def usrcat_block(a, b, weights):
+    """
+    Returns the matrix of USRCAT similarities between the rows of a and the rows
+    of b. The weighted distances are accumulated one moment at a time so that
+    the temporary memory is bounded by the size of the result.
+    """
+    distances = np.zeros((len(a), len(b)), dtype=np.float32)
+    diff = np.empty_like(distances)
+
+    for k in range(NUM_MOMENTS):
+        np.subtract.outer(a[:,k], b[:,k], out=diff)
+        np.abs(diff, out=diff)
+        diff *= weights[k]
+        distances += diff
+
+    return 1.0 / (1.0 + distances)
+
+# the moments and weights of the current all-vs-all job in a worker process
+_job = None
+
+def _init_process(moments, weights):
+    """
+    Initializes a worker process of the all-vs-all functions.
+    """
+    global _job
+    _job = moments, weights
+
+def _pair_block(tile):
+    """
+    Returns the similarities of a (row, column) tile of the all-vs-all matrix.
+    """
+    moments, weights = _job
+    (r0, r1), (c0, c1) = tile
+
+    return tile, usrcat_block(np.asarray(moments[r0:r1]), np.asarray(moments[c0:c1]), weights)
+
+def _neighbour_block(args):
+    """
+    Returns the top k neighbours of a tile of rows against all other rows.
+    """
+    moments, weights = _job
+    (r0, r1), k, tile_size = args
+
+    rows = np.asarray(moments[r0:r1])
+    best_idx = np.empty((len(rows), 0), dtype=np.int64)
+    best_sim = np.empty((len(rows), 0), dtype=np.float32)
+
+    for c0 in xrange(0, len(moments), tile_size):
+        sim = usrcat_block(rows, np.asarray(moments[c0:c0+tile_size]), weights)
+
+        # exclude the rows themselves
+        for i in xrange(max(r0, c0), min(r1, c0+tile_size)): sim[i-r0, i-c0] = -1.0
+
+        idx = np.arange(c0, c0+sim.shape[1], dtype=np.int64)
+        best_idx, best_sim = _merge_top_k(best_idx, best_sim, idx, sim, k)
+
+    return r0, best_idx, best_sim
+
+def _segment_neighbour_block(args):
+    """
+    Returns the top k neighbour segments of a tile of segments against all
+    other segments, the similarity of two segments is the highest similarity
+    of any pair of their rows.
+    """
+    moments, weights = _job
+    (s0, s1), k, tiles, bounds = args
+
+    rows = np.asarray(moments[bounds[s0]:bounds[s1]])
+    best_idx = np.empty((s1-s0, 0), dtype=np.int64)
+    best_sim = np.empty((s1-s0, 0), dtype=np.float32)
+
+    for t0, t1 in tiles:
+        sim = usrcat_block(rows, np.asarray(moments[bounds[t0]:bounds[t1]]), weights)
+
+        # segmented maximum over the rows and the columns
+        sim = np.maximum.reduceat(sim, bounds[s0:s1] - bounds[s0], axis=0)
+        sim = np.maximum.reduceat(sim, bounds[t0:t1] - bounds[t0], axis=1)
+
+        # exclude the segments themselves
+        for i in xrange(max(s0, t0), min(s1, t1)): sim[i-s0, i-t0] = -1.0
+
+        idx = np.arange(t0, t1, dtype=np.int64)
+        best_idx, best_sim = _merge_top_k(best_idx, best_sim, idx, sim, k)
+
+    return s0, best_idx, best_sim
+
+def _merge_top_k(best_idx, best_sim, idx, sim, k):
+    """
+    Merges the similarities of a tile of columns with the current top k of
+    every row.
+    """
+    sim = np.hstack((best_sim, sim))
+    idx = np.hstack((best_idx, np.tile(idx, (len(sim), 1))))
+
+    top = np.argsort(-sim, axis=1, kind='mergesort')[:,:k]
+    select = np.arange(len(sim))[:,None], top
+
+    return idx[select], sim[select]
+
+def _tiles(n, size):
+    """
+    Returns the (start, end) ranges of the tiles.
+    """
+    return [(start, min(start+size, n)) for start in xrange(0, n, size)]
+
+def _segment_tiles(bounds, size):
+    """
+    Returns the (start, end) ranges of tiles of whole segments with at most
+    size rows each, unless a single segment is larger.
+    """
+    tiles, start = [], 0
+    num_segments = len(bounds) - 1
+
+    for end in xrange(1, num_segments+1):
+        if end == num_segments or bounds[end+1] - bounds[start] > size:
+            tiles.append((start, end))
+            start = end
+
+    return tiles
+
+def _pool(moments, weights, processes):
+    """
+    Returns a pool of processes that share the moments (fork).
+    """
+    return multiprocessing.Pool(processes or multiprocessing.cpu_count(),
+                                initializer=_init_process, initargs=(moments, weights))
+
+def all_vs_all(moments, tile_size=1024, processes=None, **weights):
+    """
+    Returns the all-vs-all USRCAT distances (1 - similarity) as condensed
+    distance matrix, i.e. in the same layout as scipy.spatial.distance.pdist(),
+    so that it can be used directly for hierarchical clustering with
+    scipy.cluster.hierarchy.linkage(). The matrix is computed in tiles on a
+    pool of processes.
+
+    Parameters
+    ----------
+    moments : numpy.ndarray
+        Matrix of shape (n, 60), e.g. USRIndex.moments.
+    tile_size : int, default=1024
+        Number of rows and columns of a tile, bounds the memory per process.
+    processes : int, optional
+        Number of worker processes, defaults to the number of cores.
+    ow, hw, rw, aw, dw : float
+        Weights of the atom type distributions, the defaults are the same as in
+        Ligand.__or__.
+
+    Returns
+    -------
+    distances : numpy.ndarray
+        Float32 array of length n * (n - 1) / 2.
+
+    Examples
+    --------
+    >>> index = usr.ligand_index().subset(ligand_ids)
+    >>> linkage(usr.all_vs_all(index.moments), method='average')
+    """
+    n = len(moments)
+    condensed = np.empty(n * (n - 1) // 2, dtype=np.float32)
+
+    tiles = _tiles(n, tile_size)
+    pairs = [(rows, cols) for i, rows in enumerate(tiles) for cols in tiles[i:]]
+
+    pool = _pool(moments, usrcat_weights(**weights), processes)
+
+    try:
+        for ((r0, r1), (c0, c1)), sim in pool.imap_unordered(_pair_block, pairs):
+            for i in xrange(r0, r1):
+                # only the upper triangle j > i is stored
+                j0 = max(c0, i + 1)
+                if j0 >= c1: continue
+
+                offset = n * i - i * (i + 1) // 2 - i - 1
+                condensed[offset+j0:offset+c1] = 1.0 - sim[i-r0, j0-c0:]
+
+        pool.close()
+
+    except:
+        pool.terminate()
+        raise
+
+    finally:
+        pool.join()
+
+    return condensed
+
+def top_k_neighbours(moments, k=10, tile_size=1024, processes=None, **weights):
+    """
+    Returns the sparse neighbour graph of the k most similar rows of every row,
+    which needs O(n * k) instead of O(n^2) memory. Takes the same arguments as
+    all_vs_all().
+
+    Returns
+    -------
+    neighbours : numpy.ndarray
+        Int64 matrix of shape (n, k) with the row indices of the neighbours in
+        descending order of similarity.
+    similarities : numpy.ndarray
+        Float32 matrix of shape (n, k) with the USRCAT similarities.
+    """
+    n = len(moments)
+    k = min(k, max(n - 1, 0))
+
+    neighbours = np.empty((n, k), dtype=np.int64)
+    similarities = np.empty((n, k), dtype=np.float32)
+
+    tasks = [(rows, k, tile_size) for rows in _tiles(n, tile_size)]
+
+    pool = _pool(moments, usrcat_weights(**weights), processes)
+
+    try:
+        for r0, idx, sim in pool.imap_unordered(_neighbour_block, tasks):
+            neighbours[r0:r0+len(idx)] = idx
+            similarities[r0:r0+len(sim)] = sim
+
+        pool.close()
+
+    except:
+        pool.terminate()
+        raise
+
+    finally:
+        pool.join()
+
+    return neighbours, similarities
+
+def top_k_segment_neighbours(moments, offsets, k=10, tile_size=1024, processes=None, **weights):
+    """
+    Returns the top k neighbour graph of contiguous segments of rows, e.g. the
+    conformers of chemical components, with the highest similarity of any pair
+    of rows of two segments as their similarity. Takes the same arguments as
+    top_k_neighbours(), the tiles contain whole segments.
+
+    Parameters
+    ----------
+    offsets : numpy.ndarray
+        Start of every segment, e.g. ChemCompConformerUSRIndex.offsets.
+
+    Returns
+    -------
+    neighbours : numpy.ndarray
+        Int64 matrix of shape (number of segments, k) with the segment indices
+        of the neighbours in descending order of similarity.
+    similarities : numpy.ndarray
+        Float32 matrix of shape (number of segments, k) with the USRCAT
+        similarities.
+    """
+    bounds = np.r_[offsets, len(moments)].astype(np.int64)
+    n = len(offsets)
+    k = min(k, max(n - 1, 0))
+
+    neighbours = np.empty((n, k), dtype=np.int64)
+    similarities = np.empty((n, k), dtype=np.float32)
+
+    tiles = _segment_tiles(bounds, tile_size)
+    tasks = [(rows, k, tiles, bounds) for rows in tiles]
+
+    pool = _pool(moments, usrcat_weights(**weights), processes)
+
+    try:
+        for s0, idx, sim in pool.imap_unordered(_segment_neighbour_block, tasks):
+            neighbours[s0:s0+len(idx)] = idx
+            similarities[s0:s0+len(sim)] = sim
+
+        pool.close()
+
+    except:
+        pool.terminate()
+        raise
+
+    finally:
+        pool.join()
+
+    return neighbours, similarities
+
+def top_hits(scores, limit, threshold):
+    """
+    Returns the indices of the top scores above the threshold in descending
+    order, only the top hits are sorted.
+    """
+    if limit and limit < len(scores):
+        top = np.argpartition(-scores, limit-1)[:limit]
+    else:
+        top = np.arange(len(scores))
+
+    top = top[scores[top] >= threshold]
+
+    return top[np.argsort(-scores[top], kind='mergesort')]
+
+def _moments(distances, mask):
+    """
+    Returns the mean, standard deviation and cube root of the skewness of the
+    distances of the masked atoms to each of the four reference points, shape
+    (poses, 12), or zeros if no atom is masked.
+    """
+    poses = distances.shape[0]
+
+    if not mask.any(): return np.zeros((poses, 12))
+
+    distances = distances[..., mask]
+
+    mean = distances.mean(axis=-1)
+    deviation = distances - mean[..., np.newaxis]
+    m2 = (deviation ** 2).mean(axis=-1)
+    m3 = (deviation ** 3).mean(axis=-1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        skew = np.where(m2 > 0, m3 / m2 ** 1.5, 0.0)
+
+    cbrt = np.sign(skew) * np.abs(skew) ** (1.0 / 3.0)
+
+    return np.dstack((mean, np.sqrt(m2), cbrt)).reshape(poses, 12)
+
+def usrcat_descriptors(coords, hydrophobe=None, aromatic=None, acceptor=None,
+                       donor=None, type_bm=None):
+    """
+    Returns the USR space (12 moments of all atoms) and the 60 USRCAT moments in
+    the same layout as stored in LigandUSR and ChemCompConformer, i.e. for all
+    atoms, hydrophobes, aromatic atoms, acceptors and donors the mean, standard
+    deviation and cube root of the skewness of the distances to the centroid,
+    the closest atom to the centroid, the farthest atom from the centroid and
+    the farthest atom from the latter. The reference points are always defined
+    by all atoms.
+
+    Parameters
+    ----------
+    coords : numpy.ndarray
+        Coordinates of a single pose with shape (n, 3) or of many poses of the
+        same molecule with shape (poses, n, 3), e.g. docked poses or conformers.
+    hydrophobe, aromatic, acceptor, donor : numpy.ndarray, optional
+        Boolean flags of the atoms, as in Atom.is_hydrophobe etc.
+    type_bm : numpy.ndarray, optional
+        Atom type bit masks (Atom.type_bm or the type_bm field of the atom arrays
+        from AtomAdaptor.fetch_atom_arrays()) that are used instead of the flags.
+
+    Returns
+    -------
+    usr_space : numpy.ndarray
+        The 12 USR moments, shape (12,) or (poses, 12).
+    usr_moments : numpy.ndarray
+        The 60 USRCAT moments, shape (60,) or (poses, 60).
+
+    Examples
+    --------
+    >>> atoms = AtomAdaptor().fetch_atom_arrays(ligand.biomolecule_id, Hetatm.ligand_id==ligand.ligand_id)
+    >>> usr_space, usr_moments = usrcat_descriptors(atoms['coords'], type_bm=atoms['type_bm'])
+    >>> LigandAdaptor().fetch_all_by_usr_moments(usr_space=usr_space, usr_moments=usr_moments)
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    single = coords.ndim == 2
+
+    if single: coords = coords[np.newaxis]
+
+    poses, n = coords.shape[:2]
+
+    if type_bm is not None:
+        type_bm = np.asarray(type_bm)
+        flags = [type_bm & (1 << ATOM_TYPES.index(prop)) > 0
+                 for prop in ('is_hydrophobe', 'is_aromatic', 'is_acceptor', 'is_donor')]
+    else:
+        flags = [np.zeros(n, dtype=bool) if flag is None else np.asarray(flag, dtype=bool)
+                 for flag in (hydrophobe, aromatic, acceptor, donor)]
+
+    distance = lambda point: np.sqrt(((coords - point[:, np.newaxis]) ** 2).sum(axis=-1))
+    select = lambda indices: coords[np.arange(poses), indices]
+
+    # the four reference points of every pose
+    ctd = coords.mean(axis=1)
+    dist_ctd = distance(ctd)
+    cst, fct = select(dist_ctd.argmin(axis=1)), select(dist_ctd.argmax(axis=1))
+    dist_fct = distance(fct)
+    ftf = select(dist_fct.argmax(axis=1))
+
+    distances = np.concatenate([dist[:, np.newaxis] for dist in (dist_ctd, distance(cst),
+                                                                 dist_fct, distance(ftf))],
+                               axis=1)
+
+    moments = np.hstack([_moments(distances, mask) for mask in [np.ones(n, dtype=bool)] + flags])
+
+    if single: return moments[0, :12], moments[0]
+
+    return moments[:, :12], moments
+
+def usrcat_descriptors_from_atoms(atoms):
+    """
+    Returns the USR space and USRCAT moments of a list of `Atom` objects, e.g.
+    the atoms of a ligand, see usrcat_descriptors().
+    """
+    atoms = list(atoms)
+
+    return usrcat_descriptors([atom.coords for atom in atoms],
+                              **dict((prop[3:], [getattr(atom, prop) for atom in atoms])
+                                     for prop in ('is_hydrophobe', 'is_aromatic',
+                                                  'is_acceptor', 'is_donor')))
+
+def release():
+    """
+    Returns the identifier of the current CREDO release that is used to key the
+    cache files, i.e. the credoscript version and the latest database update.
+    """
+    update = Update.query.order_by(Update.update_id.desc()).first()
+
+    if update: return '{0}-{1}'.format(__version__, update.update_id)
+
+    return __version__
+
+def cache_directory():
+    """
+    Returns the directory of the cache files, "cache" in the directory section
+    of the configuration or ~/.credoscript.
+    """
+    directory = config['directory'].get('cache') or os.path.join(os.path.expanduser('~'), '.credoscript')
+
+    if not os.path.exists(directory): os.makedirs(directory)
+
+    return directory
+
+def _save(path, array):
+    """
+    Saves the array atomically so that other processes never see a partial file.
+    """
+    tmp = '{0}.{1}.tmp'.format(path, os.getpid())
+
+    with open(tmp, 'wb') as fh: np.save(fh, array)
+
+    os.rename(tmp, path)
+
+class USRIndex(object):
+    """
+    In-memory index of USRCAT moments of CREDO entities.
+
+    Parameters
+    ----------
+    ids : numpy.ndarray
+        Identifiers of the entities, one per row of the moments.
+    moments : numpy.ndarray
+        Float32 matrix of shape (n, 60), can be memory-mapped.
+    """
+    def __init__(self, ids, moments):
+        self.ids = ids
+        self.moments = moments
+
+    def __len__(self):
+        return len(self.ids)
+
+    def subset(self, ids):
+        """
+        Returns a new index containing only the given identifiers (in the order
+        of this index), e.g. the ligands bound to a target for clustering.
+        """
+        mask = np.in1d(self.ids, np.asarray(list(ids), dtype=self.ids.dtype))
+
+        return self.__class__(self.ids[mask], np.asarray(self.moments[mask]))
+
+    def all_vs_all(self, **kwargs):
+        """
+        Returns the condensed USRCAT distance matrix of all entities in the index,
+        see all_vs_all().
+        """
+        return all_vs_all(self.moments, **kwargs)
+
+    def top_k_neighbours(self, k=10, **kwargs):
+        """
+        Returns the top k neighbour graph of all entities in the index as
+        dictionary id -> list of (id, similarity) tuples, see top_k_neighbours().
+        """
+        neighbours, similarities = top_k_neighbours(self.moments, k=k, **kwargs)
+
+        return dict((self.ids[i].item(), [(self.ids[j].item(), float(sim))
+                                        for j, sim in zip(neighbours[i], similarities[i])])
+                    for i in xrange(len(self.ids)))
+
+    @classmethod
+    def load(cls, name, query, directory=None, batch_size=50000, dtype=np.int64):
+        """
+        Returns the index of the (id, usr_moments) rows of the query. The arrays
+        are read from the cache files of the current release if they exist and
+        created otherwise.
+
+        Parameters
+        ----------
+        name : str
+            Name of the index, used for the cache file names.
+        query : Query
+            Query returning the identifiers and the USR moments.
+        directory : str, optional
+            Cache directory, defaults to cache_directory().
+        batch_size : int, default=50000
+            Number of rows that are fetched at once.
+        dtype : numpy.dtype, default=numpy.int64
+            Data type of the identifiers.
+        """
+        directory = directory or cache_directory()
+        prefix = os.path.join(directory, '{0}-{1}'.format(name, release()))
+        paths = prefix + '.ids.npy', prefix + '.moments.npy'
+
+        if not all(os.path.exists(path) for path in paths):
+            ids, moments = [], []
+
+            # server-side cursor, the moments might be lists or NumPy arrays
+            result = query.session.connection().execution_options(stream_results=True).execute(query.statement)
+
+            try:
+                while True:
+                    rows = result.fetchmany(batch_size)
+                    if not rows: break
+
+                    rows = [row for row in rows if row[1] is not None and len(row[1]) == NUM_MOMENTS]
+                    ids.extend(row[0] for row in rows)
+                    moments.append(np.array([row[1] for row in rows], dtype=np.float32).reshape(-1, NUM_MOMENTS))
+            finally:
+                result.close()
+
+            moments = np.vstack(moments) if moments else np.empty((0, NUM_MOMENTS), dtype=np.float32)
+
+            _save(paths[0], np.array(ids, dtype=dtype))
+            _save(paths[1], moments)
+
+        return cls(np.load(paths[0]), np.load(paths[1], mmap_mode='r'))
+
+    def similarity(self, usr_moments, ow=1.0, hw=0.25, rw=0.25, aw=0.25, dw=0.25):
+        """
+        Returns the USRCAT similarities of all entities with the query moments.
+        """
+        if usr_moments is None or len(usr_moments) != NUM_MOMENTS:
+            raise ValueError('The 60 USR shape descriptors are required.')
+
+        query = np.asarray(usr_moments, dtype=np.float32)
+
+        return usrcat_similarity(self.moments, query, usrcat_weights(ow, hw, rw, aw, dw))
+
+    def search(self, usr_moments, limit=25, threshold=0.5, **weights):
+        """
+        Returns the top hits as list of (id, similarity) tuples in descending
+        order of similarity.
+
+        Parameters
+        ----------
+        usr_moments : list
+            60 USRCAT moments.
+        limit : int, default=25
+            The number of hits that should be returned.
+        threshold : float, default=0.5
+            Minimum similarity of the hits.
+        ow, hw, rw, aw, dw : float
+            Weights of the atom type distributions, see similarity().
+        """
+        scores = self.similarity(usr_moments, **weights)
+
+        return [(int(self.ids[i]), float(scores[i])) for i in top_hits(scores, limit, threshold)]
+
+class LigandUSRIndex(USRIndex):
+    """
+    USRCAT index of all CREDO ligands.
+    """
+    @classmethod
+    def load(cls, directory=None, batch_size=50000):
+        """
+        Returns the index of the moments of all ligands in LigandUSR.
+        """
+        query = LigandUSR.query.with_entities(LigandUSR.ligand_id, LigandUSR.usr_moments)
+        query = query.order_by(LigandUSR.ligand_id)
+
+        return super(LigandUSRIndex, cls).load('ligand_usr', query, directory=directory,
+                                                batch_size=batch_size)
+
+    def fetch_all_by_usr_moments(self, *expr, **kwargs):
+        """
+        Performs a USRCAT search against all ligands in the index. Takes the same
+        arguments as LigandAdaptor.fetch_all_by_usr_moments() except that no
+        probe_radius is needed because all ligands are scored.
+
+        Returns
+        -------
+        hits : list
+            List of tuples in the form (Ligand, USRCAT similarity).
+        """
+        usr_moments = kwargs.get('usr_moments')
+
+        # get the moments from a CREDO ligand id an identifier was provided
+        if kwargs.get('ligand_id'):
+            ligand = Ligand.query.get(kwargs['ligand_id'])
+
+            if not ligand:
+                raise ValueError('Ligand with ligand_id {} does not exist.'
+                                 .format(kwargs['ligand_id']))
+
+            usr_moments = ligand.usr_moments
+
+        weights = dict((key, kwargs[key]) for key in ('ow','hw','rw','aw','dw') if key in kwargs)
+        hits = self.search(usr_moments, limit=kwargs.get('limit', 100),
+                           threshold=kwargs.get('threshold', 0.5), **weights)
+
+        if not hits: return []
+
+        similarity = dict(hits)
+
+        query = Ligand.query.filter(and_(Ligand.ligand_id.in_(similarity.keys()), *expr))
+        hits = sorted(((hit, similarity[hit.ligand_id]) for hit in query),
+                      key=lambda hit: hit[1], reverse=True)
+
+        return hits
+
+class ChemCompConformerUSRIndex(USRIndex):
+    """
+    USRCAT index of the conformers of all chemical components. The conformers
+    are sorted by het_id and conformer number so that the conformers of a
+    chemical component form a contiguous segment of the moments matrix.
+    """
+    def __init__(self, ids, moments):
+        super(ChemCompConformerUSRIndex, self).__init__(ids, moments)
+
+        # start of the segment of every chemical component
+        self.offsets = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else np.empty(0, dtype=np.int64)
+        self.het_ids = ids[self.offsets]
+
+        # rank of every conformer within its chemical component, starting at 0
+        sizes = np.diff(np.r_[self.offsets, len(ids)])
+        self.ranks = np.arange(len(ids)) - np.repeat(self.offsets, sizes)
+
+    @classmethod
+    def load(cls, directory=None, batch_size=50000):
+        """
+        Returns the index of the moments of all chemical component conformers.
+        """
+        query = ChemCompConformer.query.with_entities(ChemCompConformer.het_id,
+                                                      ChemCompConformer.usr_moments)
+        query = query.order_by(ChemCompConformer.het_id, ChemCompConformer.conformer)
+
+        return super(ChemCompConformerUSRIndex, cls).load('chem_comp_conformer_usr', query,
+                                                          directory=directory,
+                                                          batch_size=batch_size, dtype='S5')
+
+    def chem_comp_similarity(self, usr_moments, max_confs=None, **weights):
+        """
+        Returns the highest USRCAT similarity of the conformers of every chemical
+        component (segmented maximum), in the order of het_ids.
+
+        Parameters
+        ----------
+        usr_moments : list
+            60 USRCAT moments.
+        max_confs : int, optional
+            Only consider the top N conformers of every chemical component.
+        """
+        scores = self.similarity(usr_moments, **weights)
+
+        if max_confs: scores[self.ranks >= max_confs] = 0.0
+
+        if not len(scores): return scores
+
+        return np.maximum.reduceat(scores, self.offsets)
+
+    def top_k_neighbours(self, k=10, **kwargs):
+        """
+        Returns the top k neighbour graph of all chemical components in the index
+        as dictionary het_id -> list of (het_id, similarity) tuples, the
+        similarity of two chemical components is the one of their most similar
+        pair of conformers. See top_k_segment_neighbours().
+        """
+        neighbours, similarities = top_k_segment_neighbours(self.moments, self.offsets, k=k, **kwargs)
+
+        return dict((str(self.het_ids[i]), [(str(self.het_ids[j]), float(sim))
+                                            for j, sim in zip(neighbours[i], similarities[i])])
+                    for i in xrange(len(self.het_ids)))
+
+    def mask(self, het_ids):
+        """
+        Returns the boolean mask of the given chemical components in the order
+        of het_ids, e.g. to restrict a search with search(allowed=...).
+        """
+        return np.in1d(self.het_ids, np.asarray(list(het_ids), dtype=self.het_ids.dtype))
+
+    def search(self, usr_moments, limit=25, threshold=0.5, max_confs=None, allowed=None, **weights):
+        """
+        Returns the top hits as list of (het_id, similarity) tuples in descending
+        order of similarity, the similarity of a chemical component is the one
+        of its most similar conformer. Takes the same arguments as
+        USRIndex.search() and chem_comp_similarity().
+
+        Parameters
+        ----------
+        allowed : numpy.ndarray, optional
+            Boolean mask of the chemical components that can be hits, see
+            mask(). The mask is applied before the hits are ranked.
+        """
+        scores = self.chem_comp_similarity(usr_moments, max_confs=max_confs, **weights)
+        rows = np.arange(len(scores)) if allowed is None else np.flatnonzero(allowed)
+
+        return [(str(self.het_ids[i]), float(scores[i]))
+                for i in rows[top_hits(scores[rows], limit, threshold)]]
+
+    def fetch_all_by_usr_moments(self, *expr, **kwargs):
+        """
+        Performs a USRCAT search against all chemical component conformers in
+        the index. Takes the same arguments as ChemCompAdaptor.fetch_all_by_usr_moments(),
+        all hits are returned unless a limit is given. The chemical components
+        are filtered by the expressions before the hits are ranked.
+
+        Returns
+        -------
+        hits : list
+            List of tuples in the form (ChemComp, USRCAT similarity).
+        """
+        allowed = None
+
+        if expr:
+            query = ChemComp.query.with_entities(ChemComp.het_id).filter(and_(*expr))
+            allowed = self.mask(str(het_id) for het_id, in query)
+
+        weights = dict((key, kwargs[key]) for key in ('ow','hw','rw','aw','dw') if key in kwargs)
+        hits = self.search(kwargs.get('usr_moments'), limit=kwargs.get('limit'),
+                           threshold=kwargs.get('threshold', 0.5),
+                           max_confs=kwargs.get('max_confs'), allowed=allowed, **weights)
+
+        if not hits: return []
+
+        similarity = dict(hits)
+
+        query = ChemComp.query.filter(ChemComp.het_id.in_(similarity.keys()))
+        hits = sorted(((hit, similarity[hit.het_id]) for hit in query),
+                      key=lambda hit: hit[1], reverse=True)
+
+        return hits
+
+_indexes = {}
+_lock = threading.Lock()
+
+def ligand_index(directory=None):
+    """
+    Returns the USRCAT index of all ligands, which is loaded only once per
+    process.
+    """
+    with _lock:
+        if 'ligands' not in _indexes:
+            _indexes['ligands'] = LigandUSRIndex.load(directory=directory)
+
+    return _indexes['ligands']
+
+def chem_comp_index(directory=None):
+    """
+    Returns the USRCAT index of all chemical component conformers, which is
+    loaded only once per process.
+    """
+    with _lock:
+        if 'chemcomps' not in _indexes:
+            _indexes['chemcomps'] = ChemCompConformerUSRIndex.load(directory=directory)
+
+    return _indexes['chemcomps']
+
+from ..models.atom import ATOM_TYPES
+from ..models.chemcomp import ChemComp
+from ..models.chemcompconformer import ChemCompConformer
+from ..models.ligand import Ligand
+from ..models.ligandusr import LigandUSR
+from ..models.meta import Update
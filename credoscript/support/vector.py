@@ -201,10 +201,13 @@ class Vector:
 
     __slots__ = ['_ar']
 
-    def __init__(self, vector):
+    def __init__(self, vector, copy=True):
         '''
+        Use copy=False to wrap a NumPy float64 array (e.g. coordinates decoded
+        by the numpy-casters extra) without copying it; changes made through
+        __setitem__ then also affect the wrapped array.
         '''
-        self._ar = array(vector, 'd')
+        self._ar = array(vector, 'd', copy=copy)
 
     def __repr__(self):
         x,y,z=self._ar
@@ -0,0 +1,217 @@
+"""
+This module contains functions to export the results of credoscript queries as
+Apache Arrow record batches, tables or Parquet files. The queries are executed
+as plain SQL statements through a server-side cursor, i.e. no ORM instances are
+created and the memory footprint is bounded by the batch size.
+"""
+from __future__ import absolute_import
+
+from numbers import Number
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pass
+
+from sqlalchemy import types
+from sqlalchemy.orm import Query
+
+from credoscript import Session
+from credoscript.util import requires
+from credoscript.util.psycopg2 import NDARRAY
+
+def arrow_type(sqltype):
+    """
+    Returns the Arrow data type for the given (reflected) SQLAlchemy column type
+    or None if the type has to be inferred from the data, e.g. for cube and
+    array columns.
+    """
+    if isinstance(sqltype, types.Boolean): return pa.bool_()
+    elif isinstance(sqltype, types.SmallInteger): return pa.int16()
+    elif isinstance(sqltype, types.BigInteger): return pa.int64()
+    elif isinstance(sqltype, types.Integer): return pa.int32()
+    elif isinstance(sqltype, types.REAL): return pa.float32()
+    elif isinstance(sqltype, types.Float): return pa.float64()
+    elif isinstance(sqltype, types.Numeric): return pa.float64()
+    elif isinstance(sqltype, types.DateTime): return pa.timestamp('us')
+    elif isinstance(sqltype, types.Date): return pa.date32()
+    elif isinstance(sqltype, (types.String, types.Enum)): return pa.string()
+
+def declared_arrow_type(sqltype):
+    """
+    Returns the Arrow data type of a column of unknown type that only contains
+    NULLs, derived from the declared column type. Arrays become variable-size
+    lists of their item type, all other types strings.
+    """
+    if isinstance(sqltype, NDARRAY): return pa.list_(pa.float64())
+
+    item_type = getattr(sqltype, 'item_type', None)
+
+    if item_type is not None: return pa.list_(arrow_type(item_type) or pa.string())
+
+    return pa.string()
+
+def infer_arrow_type(values):
+    """
+    Infers the Arrow data type of a column of unknown type from the values of
+    the first batch that contains any. Numeric arrays (cube, float[], NumPy
+    arrays) of the same length become fixed-size lists, all other values are
+    stored as strings.
+    """
+    values = [value for value in values if value is not None]
+
+    if not values: return pa.string()
+
+    if all(hasattr(value, '__len__') and not isinstance(value, basestring)
+           and all(isinstance(item, Number) for item in value) for value in values):
+        item_type = pa.int64() if all(isinstance(item, (int, long)) for value in values for item in value) else pa.float64()
+        sizes = set(len(value) for value in values)
+
+        if len(sizes) == 1: return pa.list_(item_type, sizes.pop())
+        else: return pa.list_(item_type)
+
+    return pa.string()
+
+def _statement(query):
+    """
+    Returns the session and the SQL statement of a Query or Core selectable.
+    """
+    if isinstance(query, Query):
+        return query.session, query.statement
+
+    return Session(), query
+
+def _schema(statement):
+    """
+    Returns the Arrow schema of the statement derived from the declared column
+    types, used for empty results.
+    """
+    return pa.schema([pa.field(column.name, arrow_type(column.type) or declared_arrow_type(column.type))
+                      for column in statement.columns])
+
+def _column(values, datatype):
+    """
+    """
+    if datatype == pa.string():
+        values = [value if value is None or isinstance(value, basestring) else str(value)
+                  for value in values]
+
+    elif isinstance(datatype, (pa.ListType, getattr(pa, 'FixedSizeListType', pa.ListType))):
+        values = [None if value is None else list(value) for value in values]
+
+    return pa.array(values, type=datatype)
+
+@requires.pyarrow
+def iter_record_batches(query, batch_size=10000):
+    """
+    Returns an iterator over Arrow record batches containing the result of the
+    query. The types of cube and array columns are inferred from their first
+    non-null values, batches are only held back while such a column contained
+    nothing but NULLs.
+
+    Parameters
+    ----------
+    query : Query or Select
+        Any SQLAlchemy query, e.g. from an adaptor with dynamic=True.
+    batch_size : int, default=10000
+        Maximum number of rows per record batch.
+
+    Examples
+    --------
+    >>> query = LigandAdaptor(dynamic=True).fetch_all_by_uniprot('P03372')
+    >>> for batch in iter_record_batches(query): print batch.num_rows
+    """
+    session, statement = _statement(query)
+
+    columns = list(statement.columns)
+    names = [column.name for column in columns]
+    datatypes = [arrow_type(column.type) for column in columns]
+
+    # use a named (server-side) cursor to keep the memory footprint constant
+    result = session.connection().execution_options(stream_results=True).execute(statement)
+
+    # the types of cube and array columns are fixed by their first non-null
+    # values, the batches are held back until all types are known
+    pending = []
+
+    try:
+        while True:
+            rows = result.fetchmany(batch_size)
+            if rows: pending.append(zip(*rows))
+
+            for i, datatype in enumerate(datatypes):
+                if datatype is not None: continue
+
+                # only NULLs in the whole result
+                if not rows: datatypes[i] = declared_arrow_type(columns[i].type)
+
+                elif any(value is not None for value in pending[-1][i]):
+                    datatypes[i] = infer_arrow_type(pending[-1][i])
+
+            if any(datatype is None for datatype in datatypes): continue
+
+            for data in pending:
+                yield pa.RecordBatch.from_arrays([_column(values, datatype)
+                                                  for values, datatype in zip(data, datatypes)],
+                                                 names)
+            pending = []
+
+            if not rows: break
+    finally:
+        result.close()
+
+@requires.pyarrow
+def to_arrow(query, batch_size=10000):
+    """
+    Returns the result of the query as Arrow table, e.g. to be used with
+    table.to_pandas(). Takes the same arguments as iter_record_batches(). An
+    empty result is returned as empty table with the declared column types.
+    """
+    batches = list(iter_record_batches(query, batch_size=batch_size))
+
+    if batches: return pa.Table.from_batches(batches)
+
+    return pa.Table.from_batches([], schema=_schema(_statement(query)[1]))
+
+@requires.pyarrow
+def to_parquet(query, path, batch_size=10000, compression='snappy'):
+    """
+    Writes the result of the query to a Parquet file, one row group per record
+    batch, without holding the whole result in memory. An empty result is
+    written as file without rows with the declared column types.
+
+    Parameters
+    ----------
+    query : Query or Select
+        Any SQLAlchemy query, e.g. from an adaptor with dynamic=True.
+    path : str
+        Path of the Parquet file.
+    batch_size : int, default=10000
+        Maximum number of rows per record batch / row group.
+    compression : str, default='snappy'
+        Parquet compression codec.
+
+    Returns
+    -------
+    count : int
+        The number of rows that were written.
+    """
+    writer, count = None, 0
+
+    try:
+        for batch in iter_record_batches(query, batch_size=batch_size):
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema, compression=compression)
+
+            writer.write_table(pa.Table.from_batches([batch]))
+            count += batch.num_rows
+
+        if writer is None:
+            pq.write_table(pa.Table.from_batches([], schema=_schema(_statement(query)[1])),
+                           path, compression=compression)
+
+    finally:
+        if writer is not None: writer.close()
+
+    return count
@@ -0,0 +1,256 @@
+"""
+This module contains the tool to extract a consistent subset of CREDO, e.g. all
+kinase structures, into a local SQLite mirror. credoscript can be bound to the
+mirror by setting "mirror" in config.json to the mirror directory, which removes
+the network latency for analyses that only touch this subset.
+
+Every table of the configured schemas is created in the mirror. The rows of a
+table are selected through the first of its columns that links it to the subset
+(biomolecule_id, structure_id, ligand_id, chain_id, residue_id, het_id,
+fragment_id, pdb) or through entity_type/entity_id for cross references. Tables
+without any of these columns are created empty unless they are listed in
+full_tables.
+"""
+from __future__ import absolute_import
+
+import os
+from decimal import Decimal
+
+from sqlalchemy import Column, MetaData, Table, types, type_coerce
+from sqlalchemy.sql.expression import and_, or_, select
+
+from credoscript import config, metadata
+from credoscript.util.sqlite import MIRROR_COLUMNS, JSONArray, create_mirror_engine, mirror_path
+
+# the column types that can be stored as they are in SQLite
+BASIC_TYPES = (types.Boolean, types.Integer, types.Float, types.Numeric,
+               types.DateTime, types.Date, types.Time, types.String,
+               types.LargeBinary)
+
+# columns that link a table to the subset, in order of precedence
+KEYS = ('biomolecule_id', 'structure_id', 'ligand_id', 'chain_id', 'residue_id',
+        'het_id', 'fragment_id', 'pdb')
+
+# entity types of the xrefs table that are linked through entity_id
+ENTITY_KEYS = {'Structure': 'structure_id', 'Biomolecule': 'biomolecule_id',
+               'Chain': 'chain_id', 'Ligand': 'ligand_id', 'Residue': 'residue_id'}
+
+def _mirror_type(sqltype):
+    """
+    Returns the column type used in the mirror, everything that is not a basic
+    type (cube, ptree, arrays, cartridge types...) is stored as text.
+    """
+    if isinstance(sqltype, (types.Boolean, types.Integer, types.LargeBinary,
+                            types.DateTime, types.Date, types.Time)):
+        return sqltype.__class__
+
+    elif isinstance(sqltype, types.Numeric):
+        return types.Float
+
+    return types.Text
+
+def _subset(structure_ids):
+    """
+    Returns a dictionary of subqueries returning the keys of all entities that
+    belong to the given structures.
+    """
+    table = lambda name: metadata.tables['%s.%s' % (config['schema'][name.split('.')[0]]['name'],
+                                                    name.split('.')[1])]
+
+    structures = table('credo.structures')
+    biomolecules = table('credo.biomolecules')
+    chains = table('credo.chains')
+    ligands = table('credo.ligands')
+    residues = table('credo.residues')
+    components = table('credo.ligand_components')
+    fragments = table('pdbchem.chem_comp_fragments')
+
+    biomolecule_ids = select([biomolecules.c.biomolecule_id],
+                             biomolecules.c.structure_id.in_(structure_ids))
+    ligand_ids = select([ligands.c.ligand_id], ligands.c.biomolecule_id.in_(biomolecule_ids))
+    het_ids = select([components.c.het_id], components.c.ligand_id.in_(ligand_ids)).distinct()
+
+    return {'structure_id': structure_ids,
+            'biomolecule_id': biomolecule_ids,
+            'chain_id': select([chains.c.chain_id], chains.c.biomolecule_id.in_(biomolecule_ids)),
+            'ligand_id': ligand_ids,
+            'residue_id': select([residues.c.residue_id], residues.c.biomolecule_id.in_(biomolecule_ids)),
+            'het_id': het_ids,
+            'fragment_id': select([fragments.c.fragment_id], fragments.c.het_id.in_(het_ids)).distinct(),
+            'pdb': select([structures.c.pdb], structures.c.structure_id.in_(structure_ids))}
+
+def _value(value, arrays, name):
+    """
+    Converts a value into a type that can be stored in SQLite, arrays are stored
+    as JSON text and their column is remembered.
+    """
+    if isinstance(value, Decimal):
+        return float(value)
+
+    elif isinstance(value, (list, tuple)) or hasattr(value, 'tolist'):
+        arrays.add(name)
+        return JSONArray().process_bind_param(value, None)
+
+    return value
+
+def extract_mirror(directory, *expr, **kwargs):
+    """
+    Extracts all the structures matching the given criteria together with all
+    their dependent rows into a local SQLite mirror. Existing mirror files in
+    the directory are replaced. All rows are read in a single REPEATABLE READ
+    transaction, i.e. from the same snapshot of the database.
+
+    Parameters
+    ----------
+    directory : str
+        Output directory of the mirror, will be created if it does not exist.
+    *expr : BinaryExpressions, optional
+        SQLAlchemy BinaryExpressions that will be used to filter the structures.
+    uniprot : str, optional
+        Only structures containing polypeptides with this UniProt accession.
+    pdbs : list, optional
+        Only structures with these PDB codes.
+    query : Query, optional
+        Structure query, e.g. StructureAdaptor(dynamic=True).fetch_all_kinases().
+    full_tables : list, optional
+        Fully qualified names of tables without a link to the subset that should
+        be copied completely, e.g. ['pdbchem.fragment_hierarchies'].
+    batch_size : int, default=10000
+        Number of rows that are copied at once.
+
+    Returns
+    -------
+    counts : dict
+        Number of rows copied per table.
+
+    Examples
+    --------
+    >>> extract_mirror('/data/credo-kinases', query=StructureAdaptor(dynamic=True).fetch_all_kinases())
+    """
+    # import all models so that all their tables are reflected
+    from credoscript import models
+    from credoscript.adaptors import StructureAdaptor
+
+    batch_size = kwargs.get('batch_size', 10000)
+    full_tables = set(kwargs.get('full_tables', ()))
+
+    query = kwargs.get('query', models.Structure.query)
+
+    if kwargs.get('uniprot'):
+        query = StructureAdaptor(dynamic=True).fetch_all_by_uniprot(kwargs['uniprot'])
+    if kwargs.get('pdbs'):
+        query = query.filter(models.Structure.pdb.in_([pdb.upper() for pdb in kwargs['pdbs']]))
+
+    query = query.filter(and_(*expr)).with_entities(models.Structure.structure_id).distinct()
+
+    schemas = [config['schema'][key]['name'] for key in config['schema']]
+
+    if not os.path.exists(directory): os.makedirs(directory)
+
+    for schema in schemas:
+        if os.path.exists(mirror_path(directory, schema)):
+            os.remove(mirror_path(directory, schema))
+
+    engine = create_mirror_engine(directory, schemas)
+    mirror = MetaData()
+
+    # all tables are read from the same snapshot so that the mirror is
+    # consistent even if the database is updated during the extraction
+    snapshot = metadata.bind.connect().execution_options(isolation_level='REPEATABLE READ')
+    transaction = snapshot.begin()
+
+    try:
+        counts = _extract(snapshot, engine, mirror, query, schemas, full_tables, batch_size)
+    finally:
+        transaction.rollback()
+        snapshot.close()
+
+    return counts
+
+def _extract(snapshot, engine, mirror, query, schemas, full_tables, batch_size):
+    """
+    Copies the rows of all tables of the subset that are visible to the
+    snapshot connection into the mirror engine.
+    """
+    structure_ids = [row.structure_id for row in snapshot.execute(query.statement)]
+
+    subset = _subset(structure_ids)
+
+    # the biomolecules are used to select from partitioned tables one by one
+    biomolecule_ids = [row[0] for row in snapshot.execute(subset['biomolecule_id'])]
+
+    counts = {}
+
+    for table in metadata.sorted_tables:
+        if table.schema not in schemas: continue
+
+        # create the table in the mirror
+        columns = [Column(column.name, _mirror_type(column.type), primary_key=column.primary_key)
+                   for column in table.columns]
+        target = Table(table.name, mirror, *columns, schema=table.schema)
+        target.create(engine)
+
+        # select the columns with their textual representation if they are not
+        # basic types, the cartridge types would otherwise be decoded
+        source = select([column if isinstance(column.type, BASIC_TYPES)
+                         else type_coerce(column, types.Text).label(column.name)
+                         for column in table.columns])
+
+        if table.fullname in full_tables:
+            selects = [source]
+
+        elif 'entity_type' in table.c and 'entity_id' in table.c:
+            selects = [source.where(or_(*[and_(table.c.entity_type==entity_type,
+                                               table.c.entity_id.in_(subset[key]))
+                                          for entity_type, key in ENTITY_KEYS.items()]))]
+
+        else:
+            key = next((key for key in KEYS if key in table.c), None)
+
+            # partitioned tables are queried per biomolecule for constraint exclusion
+            if key == 'biomolecule_id':
+                selects = [source.where(table.c.biomolecule_id==biomolecule_id)
+                           for biomolecule_id in biomolecule_ids]
+            elif key:
+                selects = [source.where(table.c[key].in_(subset[key]))]
+            else:
+                selects = []
+
+        arrays, counts[table.fullname] = set(), 0
+        connection = engine.connect()
+        transaction = connection.begin()
+
+        try:
+            for statement in selects:
+                result = snapshot.execution_options(stream_results=True).execute(statement)
+
+                while True:
+                    rows = result.fetchmany(batch_size)
+                    if not rows: break
+
+                    connection.execute(target.insert(),
+                                       [dict((key, _value(value, arrays, key))
+                                             for key, value in row.items())
+                                        for row in rows])
+
+                    counts[table.fullname] += len(rows)
+
+                result.close()
+
+            # remember the array columns so that they are decoded again
+            connection.execute("CREATE TABLE IF NOT EXISTS {0}.{1} (table_name TEXT, column_name TEXT)"
+                               .format(table.schema, MIRROR_COLUMNS))
+            for name in arrays:
+                connection.execute("INSERT INTO {0}.{1} VALUES (?, ?)".format(table.schema, MIRROR_COLUMNS),
+                                   (table.name, name))
+
+            transaction.commit()
+
+        except:
+            transaction.rollback()
+            raise
+
+        finally:
+            connection.close()
+
+    return counts
@@ -1,8 +1,13 @@
 from __future__ import absolute_import
 
+import numpy as np
 import psycopg2
+from sqlalchemy.types import Float, UserDefinedType
+from sqlalchemy.dialects.postgresql import ARRAY
 
 CUBE_OID = 16398
+FLOAT4ARRAY_OID = 1021
+FLOAT8ARRAY_OID = 1022
 
 def cast_cube(value, cursor):
     """
@@ -12,3 +17,102 @@ def cast_cube(value, cursor):
 
 CUBE = psycopg2.extensions.new_type((CUBE_OID,), "CUBE", cast_cube)
 psycopg2.extensions.register_type(CUBE)
+
+def cast_cube_ndarray(value, cursor):
+    """
+    Returns a point cube as one-dimensional NumPy float64 array and a box cube
+    as array of shape (2, dimensions) containing the two corners.
+    """
+    if value:
+        corners = value[1:-1].split('),(')
+
+        if len(corners) > 1:
+            return np.array([np.fromstring(corner, dtype=np.float64, sep=',') for corner in corners])
+
+        return np.fromstring(corners[0], dtype=np.float64, sep=',')
+
+def cast_float_array_ndarray(value, cursor):
+    """
+    Returns a one-dimensional float4[]/float8[] array as NumPy float64 array.
+    Multidimensional arrays and arrays containing NULLs are returned as lists by
+    the default caster.
+    """
+    if value is None:
+        return None
+
+    if value.startswith('{{') or 'NULL' in value:
+        return psycopg2.extensions.FLOATARRAY(value, cursor)
+
+    return np.fromstring(value[1:-1], dtype=np.float64, sep=',')
+
+def adapt_ndarray(value):
+    """
+    Adapts NumPy arrays so that they can be used as query parameters, e.g. for
+    USR moments.
+    """
+    return psycopg2.extensions.adapt(value.tolist())
+
+def adapt_numpy_float(value):
+    """
+    """
+    return psycopg2.extensions.AsIs(repr(float(value)))
+
+class NDARRAY(UserDefinedType):
+    """
+    Float array type without a result processor, i.e. the values are returned
+    exactly as decoded by the psycopg2 typecaster. Replaces the reflected float
+    arrays if the NumPy casters are enabled because the SQLAlchemy ARRAY type
+    would convert the arrays back into lists.
+    """
+    def get_col_spec(self):
+        return "float8[]"
+
+    def bind_processor(self, dialect):
+        return None
+
+    def result_processor(self, dialect, coltype):
+        return None
+
+def reflect_ndarray_column(*args):
+    """
+    Listener for the column_reflect event that replaces the type of reflected
+    float array columns with NDARRAY.
+    """
+    column_info = args[-1]
+    item_type = getattr(column_info['type'], 'item_type', None)
+
+    if isinstance(column_info['type'], ARRAY) and isinstance(item_type, Float):
+        column_info['type'] = NDARRAY()
+
+def register_numpy_casters(scope=None):
+    """
+    Registers typecasters that decode cube and float array columns (e.g. USR
+    moments, atom coordinates, centroids and normals) directly into NumPy float
+    arrays instead of lists, which avoids most of the client-side text parsing.
+    Also registers adapters so that NumPy arrays and scalars can be passed as
+    query parameters.
+
+    Parameters
+    ----------
+    scope : connection or cursor, optional
+        Only register the casters for this connection or cursor instead of
+        globally.
+
+    Notes
+    -----
+    psycopg2 only supports the text protocol for results, which is why the
+    values are parsed with numpy.fromstring() instead of being decoded from
+    binary.
+    """
+    cube = psycopg2.extensions.new_type((CUBE_OID,), "CUBE_NDARRAY",
+                                        cast_cube_ndarray)
+    floatarray = psycopg2.extensions.new_type((FLOAT4ARRAY_OID, FLOAT8ARRAY_OID),
+                                              "FLOATARRAY_NDARRAY",
+                                              cast_float_array_ndarray)
+
+    psycopg2.extensions.register_type(cube, scope)
+    psycopg2.extensions.register_type(floatarray, scope)
+
+    psycopg2.extensions.register_adapter(np.ndarray, adapt_ndarray)
+    psycopg2.extensions.register_adapter(np.float32, adapt_numpy_float)
+    psycopg2.extensions.register_adapter(np.float64, adapt_numpy_float)
@@ -1,28 +1,195 @@
 """
 This module contains convenience functions around RDKit to perform various
-cheminformatics task related to credoscript.
+cheminformatics task related to credoscript. Parsed molecules and fingerprints
+are kept in bounded LRU caches keyed by SMILES, so that repeated comparisons of
+the same molecules, e.g. Ligand.__mod__() in a loop, are dictionary lookups.
 """
 from __future__ import absolute_import
 
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
 try:
-    from rdkit.Chem import MolFromSmiles, RDKFingerprint
-    from rdkit.DataStructs import TanimotoSimilarity
+    from rdkit.Chem import MolFromSmiles, MolToSmiles, RDKFingerprint
+    from rdkit.Chem.AllChem import GetMorganFingerprintAsBitVect
+    from rdkit.Chem.MACCSkeys import GenMACCSKeys
+    from rdkit.Chem.rdMolDescriptors import (GetHashedAtomPairFingerprintAsBitVect,
+                                             GetHashedTopologicalTorsionFingerprintAsBitVect)
+    from rdkit.DataStructs import BulkTanimotoSimilarity, TanimotoSimilarity
 except ImportError:
     pass
 
 from credoscript.util import requires
 
+# maximum number of molecules and fingerprints that are kept in the caches
+CACHE_SIZE = 10000
+
+# functions creating the fingerprints of an RDKit molecule
+FINGERPRINTS = {'rdkit': lambda mol: RDKFingerprint(mol),
+                'circular': lambda mol: GetMorganFingerprintAsBitVect(mol, 2),
+                'atompair': lambda mol: GetHashedAtomPairFingerprintAsBitVect(mol),
+                'torsion': lambda mol: GetHashedTopologicalTorsionFingerprintAsBitVect(mol),
+                'maccs': lambda mol: GenMACCSKeys(mol)}
+
+class LRUCache(object):
+    """
+    Thread-safe dictionary that keeps at most maxsize items and discards the
+    least recently used item first.
+    """
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits, self.misses = 0, 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, factory):
+        """
+        Returns the cached value of the key or caches and returns factory(key).
+        """
+        with self._lock:
+            if key in self._items:
+                self.hits += 1
+
+                # move the key to the end, i.e. most recently used
+                value = self._items.pop(key)
+                self._items[key] = value
+
+                return value
+
+            self.misses += 1
+
+        value = factory(key)
+
+        with self._lock:
+            self._items[key] = value
+            while len(self._items) > self.maxsize: self._items.popitem(last=False)
+
+        return value
+
+    def clear(self):
+        """
+        Removes all items from the cache.
+        """
+        with self._lock:
+            self._items.clear()
+            self.hits, self.misses = 0, 0
+
+_mols = LRUCache()
+_fps = LRUCache()
+
+def _parse(smiles):
+    """
+    Returns the canonical SMILES and the RDKit molecule of a SMILES string or
+    None if it cannot be parsed.
+    """
+    # no Unicode here
+    mol = MolFromSmiles(str(smiles))
+
+    if mol: return MolToSmiles(mol), mol
+
+def _fingerprint(key):
+    """
+    """
+    canonical, fp = key
+
+    return FINGERPRINTS[fp](_mols.get(canonical, _parse)[1])
+
 @requires.rdkit
-def tanimoto_sml(queryism, targetism):
+def mol_from_smiles(smiles):
+    """
+    Returns the (cached) RDKit molecule of the SMILES string or None if the
+    SMILES cannot be parsed. The molecule is shared and must not be modified.
+    """
+    parsed = _mols.get(smiles, _parse)
+
+    if parsed: return parsed[1]
+
+@requires.rdkit
+def fingerprint(smiles, fp='rdkit'):
+    """
+    Returns the (cached) fingerprint of the SMILES string or None if the SMILES
+    cannot be parsed. The fingerprints are keyed by canonical SMILES, i.e.
+    different SMILES of the same molecule share one fingerprint.
+
+    Parameters
+    ----------
+    smiles : str
+        SMILES string.
+    fp : {'rdkit','circular','atompair','torsion','maccs'}
+        Fingerprint type.
+    """
+    if fp not in FINGERPRINTS:
+        raise ValueError("The fingerprint type [{0}] does not exist.".format(fp))
+
+    parsed = _mols.get(smiles, _parse)
+
+    if parsed: return _fps.get((parsed[0], fp), _fingerprint)
+
+def cache_info():
+    """
+    Returns the number of hits, misses and items of the molecule and fingerprint
+    caches.
+    """
+    return dict((name, {'hits': cache.hits, 'misses': cache.misses, 'size': len(cache)})
+                for name, cache in (('mols', _mols), ('fps', _fps)))
+
+def clear_cache():
+    """
+    Removes all molecules and fingerprints from the caches.
+    """
+    _mols.clear()
+    _fps.clear()
+
+@requires.rdkit
+def tanimoto_sml(queryism, targetism, fp='rdkit'):
     """
     Returns the Tanimoto similarity between the two molecules in SMILES format.
     """
-    # no Unicode here
-    querymol = MolFromSmiles(str(queryism))
-    targetmol = MolFromSmiles(str(targetism))
+    queryfp = fingerprint(queryism, fp=fp)
+    targetfp = fingerprint(targetism, fp=fp)
+
+    if queryfp is not None and targetfp is not None:
+        return TanimotoSimilarity(queryfp, targetfp)
+
+@requires.rdkit
+def bulk_tanimoto(query, targets, fp='rdkit'):
+    """
+    Returns the list of Tanimoto similarities between the query and every
+    target molecule in SMILES format, None for targets that cannot be parsed.
+    """
+    queryfp = fingerprint(query, fp=fp)
+    if queryfp is None: return None
+
+    targetfps = [fingerprint(target, fp=fp) for target in targets]
+    valid = [targetfp for targetfp in targetfps if targetfp is not None]
+
+    similarities = iter(BulkTanimotoSimilarity(queryfp, valid))
+
+    return [None if targetfp is None else next(similarities) for targetfp in targetfps]
+
+@requires.rdkit
+def tanimoto_matrix(smiles, fp='rdkit'):
+    """
+    Returns the symmetric matrix of the pairwise Tanimoto similarities between
+    the molecules in SMILES format. Rows and columns of molecules that cannot be
+    parsed are NaN.
+    """
+    fps = [fingerprint(smi, fp=fp) for smi in smiles]
+    matrix = np.empty((len(fps), len(fps)), dtype=np.float64)
+    matrix.fill(np.nan)
+
+    for i, queryfp in enumerate(fps):
+        if queryfp is None: continue
+
+        targets = [(j, fps[j]) for j in xrange(i, len(fps)) if fps[j] is not None]
+        similarities = BulkTanimotoSimilarity(queryfp, [targetfp for j, targetfp in targets])
 
-    if querymol and targetmol:
-        queryfp = RDKFingerprint(querymol)
-        targetfp = RDKFingerprint(targetmol)
+        for (j, targetfp), similarity in zip(targets, similarities):
+            matrix[i, j] = matrix[j, i] = similarity
 
-        return TanimotoSimilarity(queryfp, targetfp)
\ No newline at end of file
+    return matrix
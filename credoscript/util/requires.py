@@ -26,3 +26,16 @@ def rdkit_catridge(function):
             warn("The RDKit PostgreSQL cartridge is not installed on the server.", UserWarning)
 
     return wrapper
+
+def pyarrow(function):
+    """
+    """
+    def wrapper(*args, **kwargs):
+        """
+        """
+        if config['extras'].get('pyarrow'):
+            return function(*args, **kwargs)
+        else:
+            warn("The pyarrow package is not installed.", UserWarning)
+
+    return wrapper
@@ -0,0 +1,114 @@
+"""
+This module contains the functions to bind credoscript to a local SQLite mirror
+of a CREDO subset (see credoscript.util.mirror). Every schema is stored in its
+own SQLite database file that is attached under the schema name, so that the
+schema-qualified table names of the models keep working. Only adaptors that do
+not rely on PostgreSQL extensions (ptree, cube, rdkit, ...) can be used.
+"""
+from __future__ import absolute_import
+
+import json
+import os
+import sqlite3
+import weakref
+
+from sqlalchemy import Table, create_engine, event, types
+
+# table in every mirror database that lists the columns holding JSON arrays
+MIRROR_COLUMNS = 'mirror_columns'
+
+class JSONArray(types.TypeDecorator):
+    """
+    Array (or cube) column that is stored as JSON text in the mirror.
+    """
+    impl = types.Text
+
+    def process_bind_param(self, value, dialect):
+        """
+        """
+        if value is not None:
+            return json.dumps(value.tolist() if hasattr(value, 'tolist') else list(value))
+
+    def process_result_value(self, value, dialect):
+        """
+        """
+        if value is not None:
+            return json.loads(value)
+
+# array columns of every mirror engine, see create_mirror_engine()
+_arrays = weakref.WeakKeyDictionary()
+
+@event.listens_for(Table, 'column_reflect')
+def _reflect_json_array(*args):
+    """
+    Reflects the array columns of a mirror as JSONArray. The listener is
+    registered only once and looks up the array columns of the engine the table
+    is reflected with.
+    """
+    table, column_info = args[-2], args[-1]
+
+    # older SQLAlchemy versions do not pass the inspector
+    bind = args[0].bind if len(args) > 2 else table.bind
+    arrays = _arrays.get(getattr(bind, 'engine', bind), ())
+
+    if (table.fullname, column_info['name']) in arrays:
+        column_info['type'] = JSONArray()
+
+def mirror_path(directory, schema):
+    """
+    Returns the path of the SQLite database file of a schema.
+    """
+    return os.path.join(directory, '%s.db' % schema)
+
+def json_columns(directory, schemas):
+    """
+    Returns the set of (table fullname, column name) tuples of all the mirrored
+    array columns.
+    """
+    columns = set()
+
+    for schema in schemas:
+        path = mirror_path(directory, schema)
+        if not os.path.exists(path): continue
+
+        connection = sqlite3.connect(path)
+
+        try:
+            rows = connection.execute("SELECT table_name, column_name FROM %s" % MIRROR_COLUMNS)
+            columns.update(('%s.%s' % (schema, table), column) for table, column in rows)
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            connection.close()
+
+    return columns
+
+def create_mirror_engine(directory, schemas, **kwargs):
+    """
+    Returns an engine for the SQLite mirror in the given directory. The database
+    files of the schemas are attached to every new connection and the array
+    columns of the mirror are reflected as JSONArray.
+
+    Parameters
+    ----------
+    directory : str
+        Directory containing the <schema>.db files.
+    schemas : list
+        Names of the schemas that should be attached.
+    **kwargs
+        Additional keyword arguments for create_engine(), e.g. echo.
+    """
+    if not os.path.isdir(directory):
+        raise IOError("the CREDO mirror directory {0} does not exist.".format(directory))
+
+    engine = create_engine('sqlite://', **kwargs)
+
+    @event.listens_for(engine, 'connect')
+    def attach(dbapi_connection, connection_record):
+        for schema in schemas:
+            dbapi_connection.execute("ATTACH DATABASE ? AS %s" % schema,
+                                     (mirror_path(directory, schema),))
+
+    _arrays[engine] = json_columns(directory, schemas)
+
+    return engine
@@ -15,3 +15,4 @@ from .chemcompadaptortestcase import ChemCompAdaptorTestCase
 from .fragmentadaptortestcase import FragmentAdaptorTestCase
 from .siftadaptortestcase import SIFtAdaptorTestCase
 from .ligandmatchadaptortestcase import LigandMatchAdaptorTestCase
+from .waterbridgeadaptortestcase import WaterBridgeAdaptorTestCase
@@ -12,6 +12,17 @@ class AtomAdaptorTestCase(CredoAdaptorTestCase):
         self.assertSingleResult('fetch_by_atom_id',
                                 atom.atom_id, atom.biomolecule_id)
 
+    def test_fetch_atom_arrays(self):
+        """Fetch the atoms of a biomolecule as columnar arrays"""
+        atom = models.Atom.query.limit(1).first()
+        atoms = self.adaptor.fetch_atom_arrays(atom.biomolecule_id)
+
+        self.assertEqual(atoms['coords'].shape, (len(atoms), 3))
+
+        row = atoms[atoms['atom_id'] == atom.atom_id][0]
+        self.assertEqual(row['type_bm'], atom.type_bm)
+        self.assertEqual(row['residue_id'], atom.residue_id)
+
     def test_fetch_all_by_ligand_id(self):
         """Fetch all atoms that comprise a ligand by ligand_id"""
         ligand = models.Ligand.query.filter(models.Ligand.ligand_name=='STI').first()
@@ -30,6 +41,17 @@ class AtomAdaptorTestCase(CredoAdaptorTestCase):
         self.assertPaginatedResult('fetch_all_in_contact_with_ligand_id',
                                    ligand.ligand_id, ligand.biomolecule_id)
 
+    def test_fetch_all_in_contact_with_ligand_ids(self):
+        """Fetch the atoms in contact with many ligands at once."""
+        ligands = models.Ligand.query.filter(models.Ligand.ligand_name=='STI').limit(10).all()
+        result = self.adaptor.fetch_all_in_contact_with_ligand_ids(ligands)
+
+        for ligand in ligands:
+            atoms = self.adaptor.fetch_all_in_contact_with_ligand_id(ligand.ligand_id,
+                                                                     ligand.biomolecule_id)
+            self.assertEqual(sorted(atom.atom_id for atom in result[ligand.ligand_id]),
+                             sorted(atom.atom_id for atom in atoms))
+
     def test_fetch_all_water_in_contact_with_atom_id(self):
         """Fetch all (water) atoms that are interacting with the atom_id."""
         atom = models.Atom.query.limit(1).first()
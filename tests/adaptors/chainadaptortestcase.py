@@ -14,6 +14,13 @@ class ChainAdaptorTestCase(CredoAdaptorTestCase):
         """Fetch chains by structure_id"""
         self.assertPaginatedResult('fetch_all_by_structure_id', 1)
 
+    def test_chain_residues_profile(self):
+        """Fetch chains with their residues eager loaded"""
+        adaptor = adaptors.ChainAdaptor(profile='chain_residues')
+        chain = adaptor.fetch_by_chain_id(1)
+
+        self.assertIn('ResidueMap', chain.__dict__)
+
     def test_fetch_all_by_domain_id(self):
         """Fetch chains by domain_id"""
         self.assertPaginatedResult('fetch_all_by_domain_id', 1)
@@ -1,4 +1,7 @@
+import numpy as np
+
 from credoscript import adaptors, models
+from credoscript.support import fingerprint, substructure, usr
 from tests import CredoAdaptorTestCase
 
 class ChemCompAdaptorTestCase(CredoAdaptorTestCase):
@@ -62,4 +65,80 @@ class ChemCompAdaptorTestCase(CredoAdaptorTestCase):
 
         # test with ligand_id / use binary expression to fake query argument
         self.assertPaginatedSimilarityHits('fetch_all_by_usr_moments',
-                                           usr_space=conformer.usr_space, usr_moments=conformer.usr_moments)
\ No newline at end of file
+                                           usr_space=conformer.usr_space, usr_moments=conformer.usr_moments)
+
+    def test_fetch_all_by_usr_moments_local(self):
+        """Search the conformer index with a limited number of conformers"""
+        chemcomp = self.adaptor.fetch_by_het_id('STI')
+        conformer = chemcomp.Conformers.first()
+
+        hits = conformer.usrcat(local=True, max_confs=1, limit=10)
+        self.assertEqual(hits[0][0].het_id, 'STI')
+        self.assertAlmostEqual(hits[0][1], 1.0, places=5)
+
+        index = usr.chem_comp_index()
+        self.assertEqual(len(index.chem_comp_similarity(conformer.usr_moments, max_confs=1)),
+                         len(index.het_ids))
+
+        # the expressions are applied before the hits are ranked
+        hits = index.fetch_all_by_usr_moments(models.ChemComp.het_id!='STI', usr_moments=conformer.usr_moments,
+                                              threshold=0.0, limit=5)
+        self.assertEqual(len(hits), 5)
+        self.assertNotIn('STI', [chemcomp.het_id for chemcomp, sim in hits])
+
+    def test_top_k_neighbours_local(self):
+        """Build the neighbour graph of the chemical components of the conformer index"""
+        chemcomp = self.adaptor.fetch_by_het_id('STI')
+        conformer = chemcomp.Conformers.first()
+
+        index = usr.chem_comp_index()
+        het_ids = [het_id for het_id, sim in index.search(conformer.usr_moments, limit=20, threshold=0.0)]
+        index = index.subset(het_ids)
+
+        graph = index.top_k_neighbours(k=5, processes=2)
+        self.assertEqual(sorted(graph.keys()), sorted(het_ids))
+
+        for het_id, neighbours in graph.items():
+            self.assertEqual(len(neighbours), 5)
+            self.assertNotIn(het_id, [neighbour for neighbour, sim in neighbours])
+            self.assertEqual(len(set(neighbour for neighbour, sim in neighbours)), 5)
+
+        # the similarity of two chemical components is the one of their most
+        # similar pair of conformers
+        expected = np.max([index.chem_comp_similarity(moments) for moments in
+                           index.moments[index.ids == 'STI']], axis=0)
+        expected[index.het_ids == 'STI'] = -1.0
+
+        self.assertAlmostEqual(graph['STI'][0][1], expected.max(), places=5)
+
+    def test_fetch_all_by_sim_local(self):
+        """Search the fingerprint index of all chemical components"""
+        smiles = 'Cc1ccc(cc1Nc2nccc(n2)c3cccnc3)NC(=O)c4ccc(cc4)CN5CC[NH+](CC5)C'
+
+        for fptype in ('circular','atompair','torsion'):
+            index = fingerprint.chem_comp_index(fptype)
+            hits = index.fetch_all_by_sim(smiles, threshold=0.5, limit=10)
+
+            self.assertTrue(hits)
+            self.assertTrue(all(sim >= 0.5 for chemcomp, sim in hits))
+            self.assertEqual([sim for chemcomp, sim in hits],
+                             sorted([sim for chemcomp, sim in hits], reverse=True))
+
+        # the expressions are applied before the hits are limited
+        index = fingerprint.chem_comp_index('circular')
+        hits = index.fetch_all_by_sim(smiles, models.ChemComp.het_id!='STI', threshold=0.3, limit=5)
+
+        self.assertEqual(len(hits), 5)
+        self.assertNotIn('STI', [chemcomp.het_id for chemcomp, sim in hits])
+
+    def test_fetch_all_by_substruct_local(self):
+        """Screen the local substructure index of all chemical components"""
+        index = substructure.chem_comp_index()
+
+        local = index.fetch_all_by_substruct('c1cc(cnc1)c2ccncn2', processes=2)
+        self.assertEqual([c.het_id for c in local],
+                         [c.het_id for c in self.adaptor.fetch_all_by_substruct('c1cc(cnc1)c2ccncn2')])
+
+        local = index.fetch_all_by_smarts('[#8]=[C,N]-aaa[F,Cl,Br,I]', processes=2)
+        self.assertEqual([c.het_id for c in local],
+                         [c.het_id for c in self.adaptor.fetch_all_by_smarts('[#8]=[C,N]-aaa[F,Cl,Br,I]')])
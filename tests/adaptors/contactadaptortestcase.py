@@ -1,6 +1,14 @@
-from credoscript import adaptors, models
+import operator
+import os
+import shutil
+import tempfile
+
+from credoscript import adaptors, models, parallel
 from tests import CredoAdaptorTestCase
 
+def count_contacts(biomolecule_id, session):
+    return session.query(models.Contact).filter(models.Contact.biomolecule_id==biomolecule_id).count()
+
 class ContactAdaptorTestCase(CredoAdaptorTestCase):
     def setUp(self):
         self.adaptor = adaptors.ContactAdaptor()
@@ -10,6 +18,23 @@ class ContactAdaptorTestCase(CredoAdaptorTestCase):
         """Fetch a single Contact by contact_id"""
         self.assertSingleResult('fetch_by_contact_id', 1, 1)
 
+    def test_export_partitions(self):
+        """Export contact partitions with COPY"""
+        directory = tempfile.mkdtemp()
+
+        try:
+            manifest = self.adaptor.export_partitions(directory, models.Contact.is_hbond==True,
+                                                      biomolecule_ids=[1, 2])
+
+            self.assertEqual(len(manifest['partitions']), 2)
+            self.assertTrue(os.path.exists(os.path.join(directory, 'manifest.json')))
+
+            count = models.Contact.query.filter(models.Contact.biomolecule_id==1,
+                                                models.Contact.is_hbond==True).count()
+            self.assertEqual(manifest['partitions'][0]['rows'], count)
+        finally:
+            shutil.rmtree(directory)
+
     def test_fetch_all_by_atom_id(self):
         """Fetch all contacts an atom has by atom_id"""
         self.assertPaginatedResult('fetch_all_by_atom_id', 1, 1)
@@ -36,6 +61,17 @@ class ContactAdaptorTestCase(CredoAdaptorTestCase):
         self.assertPaginatedResult('fetch_all_by_interface_id',
                                    interface.interface_id, interface.biomolecule_id)
 
+    def test_map_reduce_contact_counts(self):
+        """Count the contacts of biomolecules with a partition-parallel map-reduce"""
+        biomolecules = models.Biomolecule.query.filter(models.Biomolecule.structure_id<=20).all()
+        biomolecule_ids = [biomolecule.biomolecule_id for biomolecule in biomolecules]
+
+        result = parallel.map_reduce(count_contacts, operator.add,
+                                     biomolecule_ids=biomolecule_ids, processes=2)
+
+        self.assertEqual(result, sum(count_contacts(biomolecule_id, models.Contact.query.session)
+                                     for biomolecule_id in biomolecule_ids))
+
     def test_fetch_all_by_groove_id(self):
         """Fetch all contacts a groove has by groove_id"""
         groove = models.Groove.query.get(1)
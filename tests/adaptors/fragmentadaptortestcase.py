@@ -1,4 +1,5 @@
 from credoscript import adaptors, models
+from credoscript.support import fragmenthierarchy
 from tests import CredoAdaptorTestCase
 
 class FragmentAdaptorTestCase(CredoAdaptorTestCase):
@@ -32,4 +33,16 @@ class FragmentAdaptorTestCase(CredoAdaptorTestCase):
     def test_fetch_all_leaves(self):
         """Fetch all leave children of a Fragment by fragment_id"""
         fragment = self.adaptor.fetch_all_by_het_id('STI')[-1]
-        self.assertPaginatedResult('fetch_all_leaves', fragment.fragment_id)
\ No newline at end of file
+        self.assertPaginatedResult('fetch_all_leaves', fragment.fragment_id)
+
+    def test_fragment_dag(self):
+        """Walk the in-memory fragment hierarchy"""
+        dag = fragmenthierarchy.fragment_dag()
+
+        for fragment in self.adaptor.fetch_all_by_het_id('STI'):
+            for method in ('fetch_all_children', 'fetch_all_descendants', 'fetch_all_leaves'):
+                self.assertEqual(sorted(set(f.fragment_id for f in getattr(self.adaptor, method)(fragment.fragment_id))),
+                                 [f.fragment_id for f in getattr(dag, method)(fragment.fragment_id)])
+
+            for ancestor in dag.ancestors(fragment.fragment_id):
+                self.assertIn(fragment.fragment_id, dag.descendants(ancestor))
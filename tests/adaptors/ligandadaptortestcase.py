@@ -1,4 +1,5 @@
 from credoscript import adaptors, models
+from credoscript.support import fuzcav
 from tests import CredoAdaptorTestCase
 
 class LigandAdaptorTestCase(CredoAdaptorTestCase):
@@ -14,6 +15,16 @@ class LigandAdaptorTestCase(CredoAdaptorTestCase):
         """Fetch ligands by structure_id"""
         self.assertPaginatedResult('fetch_all_by_structure_id', 1)
 
+    def test_profiles(self):
+        """Fetch ligands with all named loader profiles"""
+        for profile in adaptors.LigandAdaptor.profiles:
+            adaptor = adaptors.LigandAdaptor(profile=profile)
+            self.assertIsInstance(adaptor.fetch_by_ligand_id(1), self.expected_entity)
+
+    def test_unknown_profile(self):
+        """Unknown loader profiles raise a ValueError"""
+        self.assertRaises(ValueError, adaptors.LigandAdaptor, profile='unknown')
+
     def test_fetch_all_by_het_id(self):
         self.assertPaginatedResult('fetch_all_by_het_id', 'STI')
 
@@ -61,3 +72,21 @@ class LigandAdaptorTestCase(CredoAdaptorTestCase):
     def test_fetch_all_path_descendants(self):
         """retrieve ligands through ptree path descendants"""
         self.assertPaginatedResult('fetch_all_path_descendants', '2P33/0')
+
+    def test_fetch_all_by_fuzcav_local(self):
+        """FuzCav search against the local index of all binding sites"""
+        ligand = models.Ligand.query.filter_by(ligand_name='STI').first()
+        index = fuzcav.ligand_index('calpha')
+
+        for metric in ('fuzcavglobal', 'simpson', 'ochiai', 'kulcz'):
+            hits = index.fetch_all_by_fuzcav(ligand_id=ligand.ligand_id, metric=metric, limit=10)
+            self.assertAlmostEqual(hits[0][1], 1.0)
+            self.assertLessEqual(len(hits), 10)
+
+            # the similarities must be above the threshold, like in the adaptor
+            threshold = hits[-1][1]
+            above = index.fetch_all_by_fuzcav(ligand_id=ligand.ligand_id, metric=metric, threshold=threshold)
+            self.assertTrue(all(sim > threshold for hit, sim in above))
+
+        distances = index.subset([hit.ligand_id for hit, sim in hits]).all_vs_all()
+        self.assertEqual(len(distances), len(hits) * (len(hits) - 1) // 2)
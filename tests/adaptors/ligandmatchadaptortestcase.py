@@ -18,4 +18,34 @@ class LigandMatchAdaptorTestCase(CredoAdaptorTestCase):
         matches = self.adaptor.fetch_smarts_matches('c1cc(cnc1)c2ccncn2')
 
         for match in matches:
-            self.assertIsInstance(match, self.expected_entity)
\ No newline at end of file
+            self.assertIsInstance(match, self.expected_entity)
+
+    def test_fetch_all_pattern_matches(self):
+        """"""
+        matches = self.adaptor.fetch_all_pattern_matches(['c1cc(cnc1)c2ccncn2', 'c1ccncc1'])
+
+        for match in matches:
+            self.assertIsInstance(match, self.expected_entity)
+
+    def test_fetch_contacts(self):
+        """"""
+        matches = self.adaptor.fetch_all_pattern_matches(['c1cc(cnc1)c2ccncn2'])
+        contacts = self.adaptor.fetch_contacts(matches[:10])
+
+        for match, values in contacts.items():
+            self.assertIsInstance(match, self.expected_entity)
+
+            for contact in values:
+                self.assertIsInstance(contact, models.Contact)
+
+    def test_fetch_sifts(self):
+        """"""
+        matches = self.adaptor.fetch_all_pattern_matches(['c1cc(cnc1)c2ccncn2'])
+        sifts = self.adaptor.fetch_sifts(matches[:10])
+
+        for match, values in sifts.items():
+            self.assertIsInstance(match, self.expected_entity)
+
+            for row in values:
+                self.assertIsInstance(row[0], models.Residue)
+                self.assertEqual(len(row), 14)
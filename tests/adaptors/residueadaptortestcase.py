@@ -32,6 +32,14 @@ class ResidueAdaptorTestCase(CredoAdaptorTestCase):
         specified ligand_id."""
         self.assertPaginatedResult('fetch_all_in_contact_with_ligand_id', 123)
 
+    def test_fetch_all_in_contact_with_ligand_ids(self):
+        """Fetch the residues in contact with many ligands at once."""
+        result = self.adaptor.fetch_all_in_contact_with_ligand_ids([123, 124])
+
+        self.assertEqual(set(result), set([123, 124]))
+        self.assertEqual(sorted(residue.residue_id for residue in result[123]),
+                         sorted(residue.residue_id for residue in self.adaptor.fetch_all_in_contact_with_ligand_id(123)))
+
     def test_fetch_all_in_contact_with_ligand_fragment_id(self):
         """Returns all residues that are in contact with the ligand fragment having the specified
         identifier"""
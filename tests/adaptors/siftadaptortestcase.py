@@ -1,4 +1,7 @@
-from credoscript import adaptors, models
+import os
+import tempfile
+
+from credoscript import adaptors, batch, models, parallel
 from tests import CredoAdaptorTestCase
 
 class SIFtAdaptorTestCase(CredoAdaptorTestCase):
@@ -28,6 +31,42 @@ class SIFtAdaptorTestCase(CredoAdaptorTestCase):
 
         self._check_sift(result)
 
+    def test_parallel_fetch_by_ligand_id(self):
+        """Fetch the SIFts of many ligands in parallel"""
+        ligands = models.Ligand.query.filter_by(ligand_name='STI').limit(20).all()
+        keys = [(ligand.ligand_id, ligand.biomolecule_id) for ligand in ligands]
+
+        fetch = lambda key: [(row[0].residue_id,) + tuple(row[1:])
+                             for row in adaptors.SIFtAdaptor().fetch_by_ligand_id(*key)]
+
+        self.assertEqual(parallel.map(fetch, keys, workers=4), [fetch(key) for key in keys])
+
+    def test_parallel_propagates_exceptions(self):
+        """Exceptions in parallel workers are raised in the caller"""
+        def fail(item):
+            raise ValueError(item)
+
+        self.assertRaises(ValueError, parallel.map, fail, range(10), workers=2)
+
+    def test_batch_resumes_from_checkpoint(self):
+        """Completed ranges of a batch job are skipped when it is resumed"""
+        handle, checkpoint = tempfile.mkstemp()
+        os.close(handle)
+
+        fetch = lambda start, end: len(models.Ligand.query.filter(models.Ligand.ligand_id.between(start, end)).all())
+        ranges = batch.id_ranges(models.Ligand.ligand_id, models.Ligand.ligand_id<=1000, size=100)
+
+        try:
+            summary = batch.run(fetch, ranges[:5], checkpoint, reporter=None)
+            self.assertEqual(summary['completed'], 5)
+
+            summary = batch.run(fetch, ranges, checkpoint, reporter=None)
+            self.assertEqual(summary['skipped'], 5)
+            self.assertEqual(summary['completed'], len(ranges) - 5)
+            self.assertEqual(len(batch.read_checkpoint(checkpoint)), len(ranges))
+        finally:
+            os.remove(checkpoint)
+
     def test_fetch_by_ligand_fragment_id(self):
         """Fetch the SIFt of a ligand fragment"""
         ligand = models.Ligand.query.filter_by(path='2P33/0/A/J07`507').first()
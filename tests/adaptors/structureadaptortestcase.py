@@ -26,6 +26,22 @@ class StructureAdaptorTestCase(CredoAdaptorTestCase):
         """Fetch all structures containing polypeptides chains matching a UniProt accessions"""
         self.assertPaginatedResult('fetch_all_by_uniprot', 'P00520')
 
+    def test_prefetch_all_by_uniprot(self):
+        """Prefetch the object graph of all structures matching a UniProt accession"""
+        structures = self.adaptor.prefetch_all_by_uniprot('P00520')
+
+        self.assertTrue(structures)
+
+        for structure in structures:
+            self.assertEqual(structure.__model__, self.expected_entity)
+            self.assertRaises(AttributeError, setattr, structure, 'pdb', None)
+
+            for biomolecule in structure.Biomolecules:
+                self.assertIs(biomolecule.Structure, structure)
+
+                for ligand in biomolecule.Ligands:
+                    self.assertIsInstance(ligand.ChemComps, tuple)
+
     def test_fetch_all_by_tsquery(self):
         """Fetch all structures by abstract text search"""
         # this should return a list of tuples in the form (similarity, entity)
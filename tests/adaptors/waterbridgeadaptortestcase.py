@@ -0,0 +1,69 @@
+from itertools import combinations
+
+from credoscript import adaptors, models
+from tests import CredoAdaptorTestCase
+
+class WaterBridgeAdaptorTestCase(CredoAdaptorTestCase):
+    def setUp(self):
+        self.adaptor = adaptors.WaterBridgeAdaptor()
+
+    def _check_bridges(self, bridges, max_distance=6.1):
+        for bridge in bridges:
+            self.assertEqual(len(bridge), 7)
+            self.assertLessEqual(bridge.distance_bgn + bridge.distance_end, max_distance)
+
+    def test_fetch_all_by_ligand_id(self):
+        """Fetch the water bridges of a ligand"""
+        ligand = models.Ligand.query.filter_by(path='3EFW/1/A/AK8`404').first()
+        bridges = self.adaptor.fetch_all_by_ligand_id(ligand.ligand_id, ligand.biomolecule_id)
+
+        self._check_bridges(bridges)
+
+        ligand_atom_ids = set(atom.atom_id for atom in ligand.Atoms)
+        self.assertTrue(all(bridge.atom_bgn_id in ligand_atom_ids for bridge in bridges))
+
+    def test_fetch_all_contact_pairs_by_water_atom_ids(self):
+        """Fetch all contact pairs of the proximal water of a ligand"""
+        ligand = models.Ligand.query.filter_by(path='3EFW/1/A/AK8`404').first()
+        waters = ligand.ProximalWater.all()
+
+        pairs = self.adaptor.fetch_all_contact_pairs_by_water_atom_ids([water.atom_id for water in waters],
+                                                                       ligand.biomolecule_id)
+
+        # the pairs of contacts of every water atom, one at a time
+        expected = set()
+        for water in waters:
+            for wc1, wc2 in combinations(water.Contacts, 2):
+                if wc1.distance + wc2.distance <= 6.1:
+                    expected.add(tuple(sorted((wc1.contact_id, wc2.contact_id))))
+
+        self.assertEqual(set(tuple(pair) for pair in pairs), expected)
+
+    def test_fetch_all_by_ligand_ids(self):
+        """Fetch the water bridges of many ligands at once"""
+        ligands = models.Ligand.query.filter_by(ligand_name='STI').limit(10).all()
+        result = self.adaptor.fetch_all_by_ligand_ids(ligands)
+
+        self.assertEqual(set(result), set(ligand.ligand_id for ligand in ligands))
+
+        for ligand in ligands:
+            self._check_bridges(result[ligand.ligand_id])
+
+            bridges = self.adaptor.fetch_all_by_ligand_id(ligand.ligand_id, ligand.biomolecule_id)
+            self.assertEqual(sorted(map(tuple, result[ligand.ligand_id])), sorted(map(tuple, bridges)))
+
+    def test_fetch_all_by_interface_id(self):
+        """Fetch the water bridges of an interface"""
+        interface = models.Interface.query.limit(1).first()
+        bridges = self.adaptor.fetch_all_by_interface_id(interface.interface_id,
+                                                         interface.biomolecule_id)
+        self._check_bridges(bridges)
+
+        result = self.adaptor.fetch_all_by_interface_ids([interface])
+        self._check_bridges(result[interface.interface_id])
+        self.assertEqual(sorted(map(tuple, result[interface.interface_id])), sorted(map(tuple, bridges)))
+
+    def test_fetch_all_by_biomolecule_id(self):
+        """Fetch all water bridges of a biomolecule"""
+        bridges = self.adaptor.fetch_all_by_biomolecule_id(1, max_distance=5.5)
+        self._check_bridges(bridges, 5.5)
@@ -16,3 +16,4 @@ from .lignucinteractiontestcase import LigNucInteractionTestCase
 from .ligandmatchtestcase import LigandMatchTestCase
 from .domaintestcase import DomainTestCase, DomainPeptideCase
 from .bindingsitetestcase import BindingSiteTestCase
+from .liganduniprotsifttestcase import LigandUniProtSIFtNodeTestCase
@@ -1,3 +1,5 @@
+from StringIO import StringIO
+
 from credoscript import models
 from tests import CredoEntityTestCase
 
@@ -23,6 +25,23 @@ class BiomoleculeTestCase(CredoEntityTestCase):
 
         self.assertListEqual(a,b)
 
+    def test_write_pdb(self):
+        fh = StringIO()
+        count = self.entity.write_pdb(fh)
+
+        lines = fh.getvalue().splitlines()
+
+        self.assertEqual(count, self.entity.Atoms.count())
+        self.assertEqual(len(lines), count + 1)
+        self.assertEqual(lines[0], self.entity.Atoms.order_by(models.Atom.atom_serial).first().pdb_line.rstrip('\n'))
+
+    def test_write_mmcif(self):
+        fh = StringIO()
+        count = self.entity.write_pdb(fh, format='mmcif')
+
+        self.assertEqual(count, self.entity.Atoms.count())
+        self.assertTrue(fh.getvalue().startswith('data_'))
+
     # direct one-to-one relationship
 
     def test_has_structure(self):
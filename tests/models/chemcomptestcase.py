@@ -1,4 +1,6 @@
 from credoscript import models
+from credoscript.ext import rdkit_
+from credoscript.util import rdkit
 from tests import CredoEntityTestCase
 
 class ChemCompTestCase(CredoEntityTestCase):
@@ -19,6 +21,22 @@ class ChemCompTestCase(CredoEntityTestCase):
         "test the overloaded 2D similarity operator"
         self.assertAlmostEqual(self.chemcomp % self.chemcomp, 1.0)
 
+    def test_bulk_tanimoto(self):
+        "test the cached bulk and pairwise 2D similarities"
+        smiles = [self.chemcomp.ism, 'c1ccccc1', 'not a smiles']
+
+        similarities = rdkit.bulk_tanimoto(self.chemcomp.ism, smiles)
+        self.assertAlmostEqual(similarities[0], 1.0)
+        self.assertIsNone(similarities[2])
+
+        matrix = rdkit.tanimoto_matrix(smiles)
+        self.assertAlmostEqual(matrix[0,1], similarities[1])
+        self.assertAlmostEqual(matrix[1,0], similarities[1])
+
+        hits = rdkit.cache_info()['fps']['hits']
+        self.chemcomp % self.chemcomp
+        self.assertGreater(rdkit.cache_info()['fps']['hits'], hits)
+
     # direct one-to-one relationship
 
     def test_has_molstring(self):
@@ -27,6 +45,16 @@ class ChemCompTestCase(CredoEntityTestCase):
     def test_has_rdmol(self):
         self.assertOneToOne(self.chemcomp, 'RDMol', models.ChemCompRDMol)
 
+    def test_rdmol_is_lazy(self):
+        "the RDKit molecule is only built on first access"
+        rdmol = self.chemcomp.RDMol.rdmol
+        self.assertFalse(rdmol.loaded)
+        self.assertEqual(rdmol.GetNumHeavyAtoms(), self.chemcomp.num_hvy_atoms)
+        self.assertTrue(rdmol.loaded)
+
+        self.assertEqual(rdkit_.map_mols(lambda mol: mol.GetNumHeavyAtoms(), [rdmol.pkl], processes=2),
+                         [self.chemcomp.num_hvy_atoms])
+
     def test_has_rdfp(self):
         self.assertOneToOne(self.chemcomp, 'RDFP', models.ChemCompRDFP)
 
@@ -1,4 +1,5 @@
 from credoscript import models
+from credoscript.support import usr
 from tests import CredoEntityTestCase
 
 class LigandTestCase(CredoEntityTestCase):
@@ -17,6 +18,34 @@ class LigandTestCase(CredoEntityTestCase):
         "test the overloaded USR similarity operator"
         self.assertAlmostEqual(self.ligand | self.ligand, 1.0)
 
+    def test_usrcat_local(self):
+        "test the USRCAT search against the in-memory index"
+        hits = self.ligand.usrcat(local=True, limit=10)
+        self.assertAlmostEqual(hits[0][1], 1.0, places=5)
+        self.assertEqual([hit[1] for hit in hits], sorted((hit[1] for hit in hits), reverse=True))
+
+    def test_usrcat_all_vs_all(self):
+        "test the all-vs-all USRCAT distances against the overloaded operator"
+        ligands = models.Ligand.query.filter_by(ligand_name='STI').limit(5).all()
+        index = usr.ligand_index().subset(ligand.ligand_id for ligand in ligands)
+        ligands = sorted((ligand for ligand in ligands if ligand.ligand_id in index.ids),
+                         key=lambda ligand: ligand.ligand_id)
+
+        distances = index.all_vs_all(processes=2)
+        pairs = [(a, b) for i, a in enumerate(ligands) for b in ligands[i+1:]]
+
+        for distance, (a, b) in zip(distances, pairs):
+            self.assertAlmostEqual(1.0 - distance, a | b, places=4)
+
+    def test_usrcat_descriptors(self):
+        "test the client-side USRCAT descriptors against the stored moments"
+        atoms = [atom for atom in self.ligand.Atoms if atom.element != 'H']
+        usr_space, usr_moments = usr.usrcat_descriptors_from_atoms(atoms)
+
+        self.assertEqual(len(usr_moments), 60)
+        for computed, stored in zip(usr_moments, self.ligand.usr_moments):
+            self.assertAlmostEqual(computed, stored, places=2)
+
     def test_mod(self):
         "test the overloaded 2D similarity operator"
         self.assertAlmostEqual(self.ligand % self.ligand, 1.0)
@@ -0,0 +1,33 @@
+from StringIO import StringIO
+from xml.etree.ElementTree import fromstring, tostring
+
+from credoscript.ext.liganduniprotsift import LigandUniProtSIFtNodeAdaptor
+from tests import CredoEntityTestCase
+
+class LigandUniProtSIFtNodeTestCase(CredoEntityTestCase):
+    def setUp(self):
+        self.adaptor = LigandUniProtSIFtNodeAdaptor()
+        self.entity = self.adaptor.fetch_root_by_uniprot('P00520')
+
+    def test_phyloxml_stream(self):
+        """Test if the streamed PhyloXML tree is identical to the element tree"""
+        stream = StringIO()
+        self.assertIsNone(self.entity.phyloxml(stream=stream))
+
+        self.assertEqual(stream.getvalue(), tostring(self.entity.phyloxml()))
+
+    def test_phyloxml_counts(self):
+        """Test if the PhyloXML tree contains all nodes and leaves of the adaptor"""
+        stream = StringIO()
+        self.entity.phyloxml(stream=stream)
+
+        # the outermost clade only wraps the tree, ligand clades have a name
+        clades = list(fromstring(stream.getvalue()).iter('clade'))[1:]
+        leaves = [clade for clade in clades if clade.find('name') is not None]
+
+        nodes = [node for node in self.adaptor.fetch_all_children(self.entity.ligand_uniprot_sift_node_id)
+                 if node.is_node]
+        ligands = self.adaptor.fetch_all_leaves(self.entity.ligand_uniprot_sift_node_id)
+
+        self.assertEqual(len(clades) - len(leaves), len(nodes))
+        self.assertEqual(len(leaves), len(set(ligand.ligand_id for ligand in ligands)))
@@ -8,10 +8,11 @@ sys.path.insert(0, os.path.abspath('..'))
 
 import tests.models
 import tests.adaptors
+import tests.util
 
 testloader = unittest.TestLoader()
 
-suite = testloader.loadTestsFromNames(['models','adaptors'])
+suite = testloader.loadTestsFromNames(['models','adaptors','util'])
 
 # run unit test
 unittest.TextTestRunner(verbosity=2).run(suite)
\ No newline at end of file
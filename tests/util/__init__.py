@@ -0,0 +1,3 @@
+from .mirrortestcase import MirrorTestCase
+from .arrowtestcase import ArrowTestCase
+from .psycopg2testcase import NumPyCasterTestCase
@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from sqlalchemy.sql.expression import case, null
+
+from credoscript import adaptors, config, models
+from credoscript.util.arrow import iter_record_batches, to_arrow, to_parquet
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pass
+
+Atom = models.Atom
+
+@unittest.skipUnless(config['extras'].get('pyarrow'), "the pyarrow extra is not enabled.")
+class ArrowTestCase(unittest.TestCase):
+    def setUp(self):
+        self.ligand = models.Ligand.query.filter(models.Ligand.ligand_name=='STI').first()
+        self.adaptor = adaptors.AtomAdaptor(dynamic=True)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def query(self, ligand_id=None):
+        """
+        """
+        query = self.adaptor.fetch_all_by_ligand_id(ligand_id or self.ligand.ligand_id,
+                                                    self.ligand.biomolecule_id)
+
+        return query.with_entities(Atom.atom_id, Atom.atom_name, Atom.coords).order_by(Atom.atom_id)
+
+    def test_to_arrow(self):
+        """Export the atoms of a ligand as Arrow table"""
+        atoms = self.query().all()
+        table = to_arrow(self.query(), batch_size=10)
+
+        self.assertEqual(table.num_rows, len(atoms))
+        self.assertEqual(table.schema.names, ['atom_id', 'atom_name', 'coords'])
+        self.assertEqual(table.column('atom_id').to_pylist(), [atom.atom_id for atom in atoms])
+        self.assertEqual(len(table.column('coords').to_pylist()[0]), 3)
+
+    def test_to_arrow_empty(self):
+        """Export an empty result as empty Arrow table with the declared types"""
+        table = to_arrow(self.query(ligand_id=-1))
+
+        self.assertIsInstance(table, pa.Table)
+        self.assertEqual(table.num_rows, 0)
+        self.assertEqual(table.schema.names, ['atom_id', 'atom_name', 'coords'])
+        self.assertTrue(pa.types.is_integer(table.schema.field('atom_id').type))
+
+    def test_to_arrow_null_first(self):
+        """Infer the type of an array column whose first batch only contains NULLs"""
+        first = self.query().first()
+
+        coords = case([(Atom.atom_id==first.atom_id, null())], else_=Atom.coords).label('coords')
+        query = self.query().with_entities(Atom.atom_id, coords)
+
+        batches = list(iter_record_batches(query, batch_size=1))
+        self.assertTrue(all(batch.schema.equals(batches[0].schema) for batch in batches))
+
+        table = to_arrow(query, batch_size=1)
+        values = table.column('coords').to_pylist()
+
+        self.assertIsNone(values[0])
+        self.assertNotEqual(table.schema.field('coords').type, pa.string())
+        self.assertEqual(len(values[1]), 3)
+
+    def test_to_parquet(self):
+        """Write the atoms of a ligand to a Parquet file"""
+        path = os.path.join(self.directory, 'atoms.parquet')
+
+        count = to_parquet(self.query(), path, batch_size=10)
+        table = pq.read_table(path)
+
+        expected = to_arrow(self.query())
+
+        self.assertEqual(count, expected.num_rows)
+        self.assertEqual(table.schema.names, expected.schema.names)
+
+        for name in expected.schema.names:
+            self.assertEqual(table.column(name).to_pylist(), expected.column(name).to_pylist())
+
+    def test_to_parquet_empty(self):
+        """Write an empty result to a Parquet file without rows"""
+        path = os.path.join(self.directory, 'empty.parquet')
+
+        self.assertEqual(to_parquet(self.query(ligand_id=-1), path), 0)
+
+        table = pq.read_table(path)
+        self.assertEqual(table.num_rows, 0)
+        self.assertEqual(table.schema.names, ['atom_id', 'atom_name', 'coords'])
@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from sqlalchemy import MetaData, Table, select
+
+from credoscript import config, schema
+from credoscript.util.mirror import extract_mirror
+from credoscript.util.sqlite import JSONArray, create_mirror_engine, json_columns, mirror_path
+
+class MirrorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.schemas = [config['schema'][key]['name'] for key in config['schema']]
+        self.counts = extract_mirror(self.directory, pdbs=['2P33'])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_extract_mirror(self):
+        """Extract a single structure into a local mirror"""
+        for name in self.schemas:
+            self.assertTrue(os.path.exists(mirror_path(self.directory, name)))
+
+        self.assertEqual(self.counts['%s.structures' % schema['credo']], 1)
+        self.assertTrue(self.counts['%s.biomolecules' % schema['credo']])
+
+    def test_create_mirror_engine(self):
+        """Read the extracted structure back with the array columns decoded"""
+        engine = create_mirror_engine(self.directory, self.schemas)
+        mirror = MetaData()
+
+        structures = Table('structures', mirror, schema=schema['credo'], autoload=True,
+                           autoload_with=engine)
+        rows = engine.execute(select([structures.c.pdb])).fetchall()
+        self.assertEqual([row.pdb for row in rows], ['2P33'])
+
+        arrays = json_columns(self.directory, self.schemas)
+        self.assertTrue(arrays, "the mirror does not contain any array columns.")
+
+        for fullname, name in arrays:
+            table_schema, table_name = fullname.split('.')
+            table = Table(table_name, mirror, schema=table_schema, autoload=True,
+                          autoload_with=engine)
+
+            self.assertIsInstance(table.c[name].type, JSONArray)
+
+            value = engine.execute(select([table.c[name]]).where(table.c[name]!=None).limit(1)).scalar()
+            self.assertIsInstance(value, list)
+
+    def test_create_mirror_engine_twice(self):
+        """Every engine of the same mirror decodes the array columns"""
+        create_mirror_engine(self.directory, self.schemas)
+        engine = create_mirror_engine(self.directory, self.schemas)
+
+        for fullname, name in json_columns(self.directory, self.schemas):
+            table_schema, table_name = fullname.split('.')
+            table = Table(table_name, MetaData(), schema=table_schema, autoload=True,
+                          autoload_with=engine)
+
+            self.assertIsInstance(table.c[name].type, JSONArray)
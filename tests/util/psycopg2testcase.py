@@ -0,0 +1,46 @@
+import unittest
+
+import numpy as np
+
+from credoscript.util.psycopg2 import cast_cube_ndarray, cast_float_array_ndarray
+
+class NumPyCasterTestCase(unittest.TestCase):
+    def test_cast_cube_ndarray_null(self):
+        """Cast NULL and empty cubes to None"""
+        self.assertIsNone(cast_cube_ndarray(None, None))
+        self.assertIsNone(cast_cube_ndarray('', None))
+
+    def test_cast_cube_ndarray_point(self):
+        """Cast a point cube to a one-dimensional array"""
+        cube = cast_cube_ndarray('(1.5, -2, 3e-1)', None)
+
+        self.assertEqual(cube.dtype, np.float64)
+        self.assertEqual(cube.shape, (3,))
+        self.assertTrue(np.array_equal(cube, [1.5, -2.0, 0.3]))
+
+    def test_cast_cube_ndarray_box(self):
+        """Cast a box cube to a two-dimensional array of its corners"""
+        cube = cast_cube_ndarray('(1, 2, 3),(4, 5, 6)', None)
+
+        self.assertEqual(cube.shape, (2, 3))
+        self.assertTrue(np.array_equal(cube, [[1, 2, 3], [4, 5, 6]]))
+
+    def test_cast_float_array_ndarray_null(self):
+        """Cast NULL and empty arrays"""
+        self.assertIsNone(cast_float_array_ndarray(None, None))
+
+        array = cast_float_array_ndarray('{}', None)
+        self.assertEqual(array.dtype, np.float64)
+        self.assertEqual(array.shape, (0,))
+
+    def test_cast_float_array_ndarray_1d(self):
+        """Cast a one-dimensional array to a NumPy array"""
+        array = cast_float_array_ndarray('{1.5,-2,0.25}', None)
+
+        self.assertEqual(array.dtype, np.float64)
+        self.assertTrue(np.array_equal(array, [1.5, -2.0, 0.25]))
+
+    def test_cast_float_array_ndarray_2d(self):
+        """Multidimensional arrays and arrays with NULLs are returned as lists"""
+        self.assertEqual(cast_float_array_ndarray('{{1,2},{3,4}}', None), [[1.0, 2.0], [3.0, 4.0]])
+        self.assertEqual(cast_float_array_ndarray('{1,NULL,3}', None), [1.0, None, 3.0])